@@ -3,11 +3,14 @@ FastAPI后端 - 提供健身计划生成API
 """
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
+import json
 import logging
 import sys
 import os
+import time
 
 # 加载.env文件
 try:
@@ -20,18 +23,121 @@ except ImportError:
 os.environ["LLM_PROVIDER"] = "openrouter"
 
 # 导入本地模块 (文件现在都在backend目录中)
-from flow import create_fitness_plan_flow
+from flow import get_fitness_flow, PLAN_GENERATION_MODE
+from plan_jobs import JobQueueFull, PlanJobQueue
+from plan_stream import stream_fitness_plan
+from utils.call_llm import (
+    aclose_llm_clients,
+    get_llm_cache_stats,
+    get_llm_latency_stats,
+    get_llm_rate_limit_stats,
+    get_llm_router_status,
+    get_structured_output_stats
+)
+from utils.cache_warmer import warmer_from_env
+from utils.job_store import job_store_from_env
+from utils.plan_table import find_precomputed_key, get_plan_table
+from utils.singleflight import SingleFlight, request_key
+from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 单次请求的端到端时间预算（秒），应小于部署平台的函数超时
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "50"))
+
+# 异步任务不受HTTP请求超时限制，单个任务的时间预算（秒）
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "120"))
+
+# 流程埋点计数：重试、降级等事件按 "事件:节点" 统计，节点开始/结束事件只用于任务进度
+NODE_PROGRESS_EVENTS = ("node_start", "node_end")
+flow_event_counts = Counter()
+
+def record_flow_event(event, node, info):
+    """流程埋点钩子 - 记录节点重试和降级"""
+    if event in NODE_PROGRESS_EVENTS:
+        return
+    node_name = type(node).__name__
+    flow_event_counts[f"{event}:{node_name}"] += 1
+    if event == "retry":
+        logger.warning(f"{node_name} 第{info['attempt']}次重试，{info['delay']:.2f}秒后执行: {info['error']}")
+    elif event in ("fallback", "retry_budget_exhausted", "deadline_exceeded"):
+        logger.warning(f"{node_name} {event}: {info.get('error')}")
+
+# 相同用户数据的并发生成请求（双击、前端重试等）合并为一次流程执行
+plan_singleflight = SingleFlight()
+
+# 不调用LLM的生成方式，不需要预热缓存
+NON_LLM_MODES = ("fast", "precomputed")
+
+def new_shared(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """初始化流程的共享存储"""
+    return {
+        "user_data": user_data,
+        "validation_errors": [],
+        "data_is_valid": False,
+        "analysis_result": {},
+        "raw_plan": {},
+        "final_plan": {},
+        "generation_completed": False
+    }
+
+async def warm_plan(mode: str, user_data: Dict[str, Any]):
+    """用代表性用户运行一次生成流程，使该分桶画像的LLM响应进入缓存"""
+    shared = new_shared(user_data)
+    await get_fitness_flow(mode).run_async(
+        shared,
+        hooks=[record_flow_event],
+        deadline=time.monotonic() + REQUEST_DEADLINE
+    )
+    if not shared['raw_plan'].get('generation_success'):
+        raise RuntimeError("LLM生成失败，已降级为后备计划")
+
+# 缓存预热器，CACHE_WARMER_ENABLED=true 时启用
+cache_warmer = warmer_from_env(warm_plan)
+
+async def run_plan_job(mode: str, user_data: Dict[str, Any], hooks) -> Dict[str, Any]:
+    """异步任务的生成函数 - 运行一次流程，返回PlanResponse字典"""
+    start_time = datetime.now()
+    shared = new_shared(user_data)
+    await get_fitness_flow(mode).run_async(
+        shared,
+        hooks=[record_flow_event, *hooks],
+        deadline=time.monotonic() + JOB_DEADLINE
+    )
+    return build_plan_response(shared, mode, start_time).model_dump()
+
+# 异步计划生成任务：固定数量的worker在后台执行，状态写入任务存储（默认SQLite）
+plan_jobs = PlanJobQueue(
+    run_plan_job,
+    job_store_from_env(),
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "100")),
+    ttl=float(os.getenv("JOB_TTL", "3600"))
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期 - 启动时内存映射预计算计划表、启动任务worker并开始缓存预热，关闭时停止它们、释放进程级LLM连接池"""
+    get_plan_table()
+    plan_jobs.start()
+    if cache_warmer is not None:
+        cache_warmer.start()
+    yield
+    if cache_warmer is not None:
+        await cache_warmer.stop()
+    await plan_jobs.stop()
+    await aclose_llm_clients()
+
 # 创建FastAPI应用
 app = FastAPI(
     title="FitCoach API",
     description="个性化健身训练计划生成API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -77,6 +183,77 @@ class PlanResponse(BaseModel):
     timestamp: str
     generation_time: Optional[float] = None
 
+class JobProgress(BaseModel):
+    total_nodes: int
+    completed_nodes: List[str]
+    running_nodes: List[str]
+
+class JobResponse(BaseModel):
+    id: str
+    status: str = Field(..., description="queued / running / succeeded / failed")
+    mode: str
+    progress: JobProgress
+    created_at: float
+    updated_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[PlanResponse] = None
+    error: Optional[str] = None
+
+def to_user_data_dict(user_data: UserDataRequest) -> Dict[str, Any]:
+    """把请求模型转换为流程使用的用户数据字典"""
+    return {
+        "basic_info": user_data.basic_info.model_dump(),
+        "goals": user_data.goals.model_dump(),
+        "schedule": user_data.schedule.model_dump(),
+        "limitations": user_data.limitations.model_dump() if user_data.limitations else {"injuries": [], "restrictions": []}
+    }
+
+def resolve_mode(user_data_dict: Dict[str, Any], mode: Optional[str]) -> str:
+    """确定生成方式：未指定时，预计算计划表中有对应计划则用 precomputed，否则用 PLAN_GENERATION_MODE"""
+    if mode is None and find_precomputed_key(user_data_dict) is not None:
+        mode = "precomputed"
+    return mode or PLAN_GENERATION_MODE
+
+def plan_key(mode: str, user_data_dict: Dict[str, Any]) -> str:
+    """计划生成的请求合并标识，普通接口和流式接口使用相同的标识"""
+    return request_key({"mode": mode, "user_data": user_data_dict})
+
+def build_plan_response(shared: Dict[str, Any], mode: str, start_time: datetime) -> PlanResponse:
+    """把流程执行后的共享存储转换为接口响应"""
+    if shared.get('generation_completed', False):
+        logger.info("训练计划生成成功")
+        
+        generation_time = (datetime.now() - start_time).total_seconds()
+        
+        return PlanResponse(
+            success=True,
+            data={
+                "plan": shared['final_plan']['formatted_plan'],
+                "generation_info": {
+                    "optimization_success": shared['final_plan'].get('optimization_success', True),
+                    "validation_errors": shared.get('validation_errors', []),
+                    "generation_mode": mode
+                }
+            },
+            error=None,
+            timestamp=datetime.now().isoformat(),
+            generation_time=generation_time
+        )
+    
+    logger.warning("训练计划生成失败")
+    
+    return PlanResponse(
+        success=False,
+        data=None,
+        error="训练计划生成失败，请检查输入数据",
+        timestamp=datetime.now().isoformat()
+    )
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 # API端点
 
 @app.get("/")
@@ -97,19 +274,54 @@ async def health_check():
         "service": "FitCoach API"
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """运行指标 - LLM响应缓存命中情况等"""
+    return {
+        "llm_cache": get_llm_cache_stats(),
+        "llm": get_llm_latency_stats(),
+        "llm_rate_limits": get_llm_rate_limit_stats(),
+        "llm_structured_output": get_structured_output_stats(),
+        "flow_events": dict(flow_event_counts),
+        "singleflight": plan_singleflight.stats(),
+        "cache_warmer": cache_warmer.stats() if cache_warmer is not None else None,
+        "jobs": await plan_jobs.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/llm/status")
+async def get_llm_status():
+    """LLM提供商路由状态 - 各提供商的熔断状态、延迟和错误率"""
+    return {
+        "providers": get_llm_router_status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.post("/api/generate-plan", response_model=PlanResponse)
-async def generate_plan(user_data: UserDataRequest):
+async def generate_plan(user_data: UserDataRequest, mode: Optional[str] = None):
     """
     生成个性化训练计划
     
     Args:
         user_data: 用户输入数据
+        mode: 计划生成方式（查询参数 standard / fanout / fused / fast / precomputed）。
+            未指定时，预计算计划表中有对应计划则直接使用（precomputed），否则使用 PLAN_GENERATION_MODE 配置；
+            显式指定 standard 等方式可跳过计划表实时生成
         
     Returns:
         PlanResponse: 包含生成的训练计划或错误信息
     """
     start_time = datetime.now()
     
+    # 转换Pydantic模型为字典
+    user_data_dict = to_user_data_dict(user_data)
+    
+    mode = resolve_mode(user_data_dict, mode)
+    try:
+        flow = get_fitness_flow(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         logger.info("收到训练计划生成请求")
         
@@ -119,58 +331,28 @@ async def generate_plan(user_data: UserDataRequest):
         logger.info(f"用户提交的时间安排: {user_data.schedule}")
         logger.info(f"用户提交的限制: {user_data.limitations}")
         
-        # 转换Pydantic模型为字典
-        user_data_dict = {
-            "basic_info": user_data.basic_info.model_dump(),
-            "goals": user_data.goals.model_dump(),
-            "schedule": user_data.schedule.model_dump(),
-            "limitations": user_data.limitations.model_dump() if user_data.limitations else {"injuries": [], "restrictions": []}
-        }
+        # 记录分桶画像的分布，供空闲时预热最常见画像的缓存
+        if cache_warmer is not None and mode not in NON_LLM_MODES:
+            cache_warmer.record(mode, user_data_dict)
         
-        # 初始化共享存储
-        shared = {
-            "user_data": user_data_dict,
-            "validation_errors": [],
-            "data_is_valid": False,
-            "analysis_result": {},
-            "raw_plan": {},
-            "final_plan": {},
-            "generation_completed": False
-        }
+        async def run_flow():
+            # 初始化共享存储
+            shared = new_shared(user_data_dict)
+            
+            # 运行共享的编译后流程
+            logger.info(f"开始生成训练计划，生成方式: {mode}")
+            await flow.run_async(
+                shared,
+                hooks=[record_flow_event],
+                deadline=time.monotonic() + REQUEST_DEADLINE
+            )
+            return shared
         
-        # 创建并运行健身计划生成流程
-        logger.info("开始生成训练计划")
-        fitness_flow = create_fitness_plan_flow()
-        fitness_flow.run(shared)
+        # 相同数据的请求正在生成时直接等待它的结果
+        shared = await plan_singleflight.do(plan_key(mode, user_data_dict), run_flow)
         
         # 检查生成结果
-        if shared.get('generation_completed', False):
-            logger.info("训练计划生成成功")
-            
-            generation_time = (datetime.now() - start_time).total_seconds()
-            
-            return PlanResponse(
-                success=True,
-                data={
-                    "plan": shared['final_plan']['formatted_plan'],
-                    "generation_info": {
-                        "optimization_success": shared['final_plan'].get('optimization_success', True),
-                        "validation_errors": shared.get('validation_errors', [])
-                    }
-                },
-                error=None,
-                timestamp=datetime.now().isoformat(),
-                generation_time=generation_time
-            )
-        else:
-            logger.warning("训练计划生成失败")
-            
-            return PlanResponse(
-                success=False,
-                data=None,
-                error="训练计划生成失败，请检查输入数据",
-                timestamp=datetime.now().isoformat()
-            )
+        return build_plan_response(shared, mode, start_time)
             
     except Exception as e:
         logger.error(f"API错误: {e}")
@@ -182,6 +364,103 @@ async def generate_plan(user_data: UserDataRequest):
             timestamp=datetime.now().isoformat()
         )
 
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_plan_job(user_data: UserDataRequest, mode: Optional[str] = None):
+    """
+    提交异步计划生成任务，立即返回任务ID
+    
+    生成在服务端的worker中进行，HTTP连接不必等待整个生成过程，
+    客户端轮询 GET /api/jobs/{job_id} 获取状态、节点进度和最终的 PlanResponse。
+    
+    Args:
+        user_data: 用户输入数据
+        mode: 计划生成方式，同 /api/generate-plan
+        
+    Returns:
+        JobResponse: 新建的任务（状态为 queued）
+    """
+    user_data_dict = to_user_data_dict(user_data)
+    mode = resolve_mode(user_data_dict, mode)
+    try:
+        flow = get_fitness_flow(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if cache_warmer is not None and mode not in NON_LLM_MODES:
+        cache_warmer.record(mode, user_data_dict)
+    
+    try:
+        job = await plan_jobs.submit(mode, user_data_dict, [type(node).__name__ for node in flow.nodes])
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    logger.info(f"已提交计划生成任务 {job['id']}，生成方式: {mode}")
+    return job
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_plan_job(job_id: str):
+    """
+    查询异步计划生成任务
+    
+    Returns:
+        JobResponse: 任务状态（queued / running / succeeded / failed）、已完成和执行中的节点，
+            完成后 result 为与 /api/generate-plan 相同的 PlanResponse
+    """
+    job = await plan_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+@app.post("/api/generate-plan/stream")
+async def generate_plan_stream(user_data: UserDataRequest, mode: Optional[str] = None):
+    """
+    流式生成个性化训练计划（Server-Sent Events）
+    
+    依次推送 preview（预计算或按规则即时生成的预览计划）、overview（计划标题、概述、周安排）、day（每完成一天的训练）、
+    safety_notes（最终安全提醒）和 complete（完整计划），出错时推送 error。
+    只有 standard 方式逐日推送；与 /api/generate-plan 的相同请求共享同一次生成，合并到进行中的生成时不推送 overview / day。
+    
+    Args:
+        user_data: 用户输入数据
+        mode: 计划生成方式，同 /api/generate-plan
+        
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    logger.info("收到流式训练计划生成请求")
+    user_data_dict = to_user_data_dict(user_data)
+    mode = resolve_mode(user_data_dict, mode)
+    try:
+        get_fitness_flow(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if cache_warmer is not None and mode not in NON_LLM_MODES:
+        cache_warmer.record(mode, user_data_dict)
+    start_time = datetime.now()
+    
+    async def event_stream():
+        try:
+            async for event, data in stream_fitness_plan(
+                user_data_dict,
+                hooks=[record_flow_event],
+                deadline=time.monotonic() + REQUEST_DEADLINE,
+                mode=mode,
+                singleflight=plan_singleflight,
+                key=plan_key(mode, user_data_dict)
+            ):
+                if event == "complete":
+                    data["generation_time"] = (datetime.now() - start_time).total_seconds()
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"流式API错误: {e}")
+            yield format_sse("error", {"error": f"服务器内部错误: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/goal-options")
 async def get_goal_options():
     """获取可选的健身目标"""
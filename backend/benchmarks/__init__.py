@@ -0,0 +1,3 @@
+"""
+性能基准脚本 - 在backend目录下运行，例如: python -m benchmarks.bench_llm_clients
+"""
@@ -0,0 +1,93 @@
+"""
+动作目录查询基准 - 对比嵌套字典逐层线性扫描与索引化动作目录在大规模动作库上的加载和查询耗时
+
+动作库为按部位、水平、器械和肌群随机组合生成的合成数据，写入临时JSON文件后加载。
+
+运行: python -m benchmarks.bench_exercise_catalog [动作数] [查询次数]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from utils.exercise_catalog import load_catalog
+
+AREAS = ["chest", "back", "legs", "shoulders", "arms", "core", "cardio", "glutes", "calves", "forearms", "neck", "mobility"]
+LEVELS = {"beginner": "初级", "intermediate": "中级", "advanced": "高级"}
+EQUIPMENT = ["无器械", "哑铃", "杠铃", "壶铃", "弹力带", "器械", "单杠", "跳绳"]
+MUSCLES = [f"肌群{i}" for i in range(40)]
+STRESSES = ["knee", "lower_back", "shoulder", "overhead", "elbow", "wrist", "ankle", "high_impact", "spinal_load", "valsalva"]
+
+def _synthetic_exercises(n):
+    rng = random.Random(42)
+    exercises = []
+    for i in range(n):
+        level = rng.choice(list(LEVELS))
+        exercises.append({
+            "id": f"ex{i}",
+            "area": rng.choice(AREAS),
+            "level": level,
+            "name": f"动作{i}",
+            "equipment": rng.choice(EQUIPMENT),
+            "difficulty": LEVELS[level],
+            "primary_muscles": rng.sample(MUSCLES, rng.randint(1, 3)),
+            "stresses": rng.sample(STRESSES, rng.randint(0, 2)),
+            "description": "合成动作"
+        })
+    return exercises
+
+def _scan(database, area, difficulties):
+    """旧实现：在 部位 -> 水平 -> 动作列表 中逐层扫描并按难度过滤"""
+    result = []
+    for level_name, exercise_list in database.get(area, {}).items():
+        for exercise in exercise_list:
+            if exercise["difficulty"] in difficulties:
+                result.append(exercise)
+    return result
+
+def _per_query_us(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+def main(n=10000, n_queries=20000):
+    exercises = _synthetic_exercises(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "exercises.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "exercises": exercises}, f, ensure_ascii=False)
+        start = time.perf_counter()
+        catalog = load_catalog(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    database = {}
+    for exercise in exercises:
+        database.setdefault(exercise["area"], {}).setdefault(exercise["level"], []).append(exercise)
+
+    rng = random.Random(7)
+    difficulty_sets = [["初级"], ["初级", "中级"], ["初级", "中级", "高级"]]
+    queries = [(rng.choice(AREAS), rng.choice(difficulty_sets)) for _ in range(n_queries)]
+    lookups = [(f"ex{rng.randrange(n)}",) for _ in range(n_queries)]
+    triples = [(rng.choice(AREAS), rng.choice(EQUIPMENT), rng.choice(MUSCLES)) for _ in range(n_queries)]
+
+    scan_us = _per_query_us(lambda area, difficulties: _scan(database, area, difficulties), queries)
+    indexed_us = _per_query_us(lambda area, difficulties: catalog.find(area=area, difficulty=difficulties), queries)
+    area_us = _per_query_us(lambda area, _: catalog.find(area=area), queries)
+    id_us = _per_query_us(catalog.get, lookups)
+    triple_us = _per_query_us(lambda area, equipment, muscle: catalog.find(area=area, equipment=equipment, muscle=muscle), triples)
+
+    print(f"{n}个动作，每项 {n_queries} 次查询")
+    print(f"加载并建立索引       {load_ms:9.1f} ms")
+    print(f"部位+难度 线性扫描   {scan_us:9.2f} µs/次")
+    print(f"部位+难度 索引查询   {indexed_us:9.2f} µs/次")
+    print(f"单部位 索引查询      {area_us:9.2f} µs/次")
+    print(f"按ID查找             {id_us:9.2f} µs/次")
+    print(f"部位+器械+肌群 组合  {triple_us:9.2f} µs/次")
+
+if __name__ == "__main__":
+    n_arg = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    queries_arg = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    main(n_arg, queries_arg)
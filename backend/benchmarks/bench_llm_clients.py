@@ -0,0 +1,67 @@
+"""
+LLM客户端开销基准 - 对比每次调用新建客户端与进程级连接池客户端的单次调用耗时
+
+运行: python -m benchmarks.bench_llm_clients [调用次数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.stub_llm_server import StubLLMServer
+
+def _per_call_ms(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) * 1000 / n
+
+def main(n: int = 200):
+    with StubLLMServer() as server:
+        os.environ["OPENAI_API_KEY"] = "stub-key"
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["LLM_PROVIDER"] = "openai"
+
+        from openai import OpenAI, AsyncOpenAI
+        from utils.call_llm import call_llm_with_system, call_llm_with_system_async, close_llm_clients, aclose_llm_clients
+
+        messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+        def fresh_client_call():
+            # 旧实现：每次调用都重新创建客户端和连接池
+            with OpenAI(api_key="stub-key", base_url=server.base_url) as client:
+                client.chat.completions.create(model="stub", messages=messages)
+
+        def pooled_call():
+            call_llm_with_system("sys", "hi")
+
+        async def async_bench():
+            async def fresh():
+                async with AsyncOpenAI(api_key="stub-key", base_url=server.base_url) as client:
+                    await client.chat.completions.create(model="stub", messages=messages)
+
+            start = time.perf_counter()
+            for _ in range(n):
+                await fresh()
+            fresh_ms = (time.perf_counter() - start) * 1000 / n
+
+            await call_llm_with_system_async("sys", "warmup")
+            start = time.perf_counter()
+            for _ in range(n):
+                await call_llm_with_system_async("sys", "hi")
+            pooled_ms = (time.perf_counter() - start) * 1000 / n
+            await aclose_llm_clients()
+            return fresh_ms, pooled_ms
+
+        pooled_call()  # 预热，建立连接
+        sync_fresh = _per_call_ms(fresh_client_call, n)
+        sync_pooled = _per_call_ms(pooled_call, n)
+        close_llm_clients()
+        async_fresh, async_pooled = asyncio.run(async_bench())
+
+    print(f"调用次数: {n}")
+    print(f"同步  新建客户端: {sync_fresh:.2f} ms/次   连接池: {sync_pooled:.2f} ms/次   节省 {sync_fresh - sync_pooled:.2f} ms")
+    print(f"异步  新建客户端: {async_fresh:.2f} ms/次   连接池: {async_pooled:.2f} ms/次   节省 {async_fresh - async_pooled:.2f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,111 @@
+"""
+计划生成方式基准 - 对比不同生成方式在不同每周训练天数下的端到端耗时和LLM调用次数
+
+模式为 flow.PLAN_FLOWS 中的 standard / fanout / fused / fast，以及 sequential（目标分析和计划生成依次调用的AsyncFlow）。
+测试桩按回复长度模拟解码耗时，回复内容根据请求中的JSON Schema生成
+
+运行: python -m benchmarks.bench_plan_generation [每周天数,...] [模式,...]
+例如: python -m benchmarks.bench_plan_generation 2,4,6 sequential,standard,fused
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from benchmarks.stub_llm_server import StubLLMServer
+
+# 每次请求的固定延迟（秒）和每个输出字符的解码延迟（秒）
+REQUEST_LATENCY = 0.3
+CHAR_DELAY = 0.0005
+
+def _sample(schema):
+    """按JSON Schema生成一份合法的示例数据，数组长度取 minItems（未限制上限时至少4项）"""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        if not properties:
+            return {f"week{i}": "本周训练要点与注意事项说明" for i in range(1, 5)}
+        return {name: _sample(sub) for name, sub in properties.items()}
+    if kind == "array":
+        count = schema.get("minItems", 1) if "maxItems" in schema else max(schema.get("minItems", 0), 4)
+        return [_sample(schema.get("items", {})) for _ in range(count)]
+    if kind == "integer":
+        return max(schema.get("minimum", 0), 3)
+    return "训练内容说明文字示例"
+
+def _reply(request):
+    response_format = request.get("response_format") or {}
+    schema = response_format.get("json_schema", {}).get("schema")
+    if schema is None:
+        return "{}"
+    data = _sample(schema)
+    plan = data.get("plan", data)
+    for index, day in enumerate(plan.get("daily_workouts", [])):
+        day["day"] = index + 1
+    return json.dumps(data, ensure_ascii=False)
+
+def _user_data(days_per_week):
+    return {
+        "basic_info": {"age": 28, "gender": "男", "height": 175, "weight": 72, "experience": "intermediate"},
+        "goals": {"primary_goal": "muscle_gain", "target_areas": ["chest", "back", "legs"]},
+        "schedule": {"days_per_week": days_per_week, "time_per_session": 60},
+        "limitations": {"injuries": [], "restrictions": []}
+    }
+
+async def _run_once(flow, days_per_week):
+    shared = {
+        "user_data": _user_data(days_per_week),
+        "validation_errors": [],
+        "data_is_valid": False,
+        "analysis_result": {},
+        "raw_plan": {},
+        "final_plan": {},
+        "generation_completed": False
+    }
+    start = time.perf_counter()
+    await flow.run_async(shared)
+    elapsed = time.perf_counter() - start
+    workouts = shared['final_plan']['formatted_plan']['daily_workouts']
+    assert len(workouts) == days_per_week, f"生成了{len(workouts)}天，预期{days_per_week}天"
+    return elapsed
+
+def _flow(mode):
+    from flow import get_fitness_flow, create_async_fitness_plan_flow
+    if mode == "sequential":
+        return create_async_fitness_plan_flow()
+    return get_fitness_flow(mode)
+
+def main(days_list=(2, 3, 4, 5, 6), modes=("sequential", "standard", "fanout", "fused", "fast")):
+    with StubLLMServer(latency=REQUEST_LATENCY, reply=_reply, char_delay=CHAR_DELAY) as server:
+        os.environ["OPENAI_API_KEY"] = "stub-key"
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["LLM_PROVIDER"] = "openai"
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+
+        from utils.call_llm import aclose_llm_clients
+
+        async def bench():
+            await _run_once(_flow(modes[0]), days_list[0])  # 预热，建立连接
+            results = {}
+            for mode in modes:
+                flow = _flow(mode)
+                for days in days_list:
+                    calls = server.request_count
+                    results[(mode, days)] = (await _run_once(flow, days), server.request_count - calls)
+            await aclose_llm_clients()
+            return results
+
+        results = asyncio.run(bench())
+
+    print(f"请求固定延迟 {REQUEST_LATENCY * 1000:.0f} ms，解码 {CHAR_DELAY * 1000:.1f} ms/字符")
+    for mode in modes:
+        row = "   ".join(f"{days}天 {results[(mode, days)][0]:.2f}s/{results[(mode, days)][1]}次" for days in days_list)
+        print(f"{mode:<12}{row}")
+
+if __name__ == "__main__":
+    days_arg = [int(d) for d in sys.argv[1].split(",")] if len(sys.argv) > 1 else (2, 3, 4, 5, 6)
+    modes_arg = sys.argv[2].split(",") if len(sys.argv) > 2 else ("sequential", "standard", "fanout", "fused", "fast")
+    main(days_arg, modes_arg)
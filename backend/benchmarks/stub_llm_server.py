@@ -0,0 +1,137 @@
+"""
+本地LLM测试桩 - 提供OpenAI兼容的 /chat/completions 接口，用于离线基准测试
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 才能保持长连接
+    protocol_version = "HTTP/1.1"
+    # 头部和正文分两次写入，关闭Nagle避免长连接上的40ms延迟确认
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.request_count += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status = self.server.status(request)
+        if status != 200:
+            body = json.dumps({"error": {"message": f"stub error {status}", "code": status}}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if request.get("stream"):
+            self._stream(request)
+            return
+
+        content = self.server.reply(request)
+        if self.server.char_delay:
+            # 模拟逐token解码：回复越长耗时越长
+            time.sleep(len(content) * self.server.char_delay)
+
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+        }).encode("utf-8")
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端超时或请求被取消（例如对冲请求中落败的一方）
+            self.close_connection = True
+
+    def _stream(self, request):
+        """以SSE分块返回回复，每块之间间隔 chunk_delay 秒"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        text = self.server.reply(request)
+        size = self.server.chunk_size
+        for i in range(0, len(text), size):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": text[i:i + size]}, "finish_reason": None}]
+            }
+            try:
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端超时或提前结束读取
+                return
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class StubLLMServer:
+    """
+    在后台线程中运行的OpenAI兼容测试桩
+
+    Args:
+        latency (float): 每次请求的模拟延迟（秒）
+        reply (callable): 根据请求体返回回复文本的函数
+        status (callable): 根据请求体返回HTTP状态码的函数，用于模拟限流和服务端错误
+        chunk_size (int): 流式请求（stream=True）每块的字符数
+        chunk_delay (float): 流式请求每块之间的延迟（秒）
+        char_delay (float): 非流式请求按回复长度追加的延迟（秒/字符），模拟输出越长生成越慢
+    """
+
+    def __init__(self, latency: float = 0.0, reply=None, status=None, chunk_size: int = 64, chunk_delay: float = 0.0,
+                 char_delay: float = 0.0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.latency = latency
+        self._server.reply = reply or (lambda request: "ok")
+        self._server.status = status or (lambda request: 200)
+        self._server.chunk_size = chunk_size
+        self._server.chunk_delay = chunk_delay
+        self._server.char_delay = char_delay
+        self._server.request_count = 0
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def request_count(self) -> int:
+        return self._server.request_count
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,127 @@
+"""
+构建预计算计划表 - 为每个 (目标, 水平, 每周天数, 时长分段) 组合生成计划，校验后写入计划表文件
+
+运行: python build_plan_table.py [--engine llm|rule] [--mode standard] [--concurrency 8] [--output data/plan_table.bin]
+
+--engine llm 通过现有流程调用LLM生成（需要配置LLM环境变量），生成失败或未通过结构校验的组合会重试，
+仍失败的组合不写入计划表，线上请求未命中时实时生成；--engine rule 用规则引擎生成，不调用LLM。
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.plan_formatter import generate_rule_based_plan
+from utils.plan_schemas import plan_schema
+from utils.plan_table import DEFAULT_PLAN_TABLE_PATH, iter_table_combinations, table_key, write_plan_table
+from utils.structured_output import validate_json
+
+logger = logging.getLogger("build_plan_table")
+
+def representative_user(goal: str, level: str, days: int, minutes: int):
+    """
+    组合的代表性用户：无身体限制、不指定目标部位，身体数据取中等值
+
+    身高体重只影响个性化优化，实际请求时由 PlanOptimizationNode 按用户数据调整
+    """
+    return {
+        "basic_info": {"age": 30, "gender": "男", "height": 170, "weight": 65, "experience": level},
+        "goals": {"primary_goal": goal, "target_areas": [], "timeline": "4周"},
+        "schedule": {"days_per_week": days, "time_per_session": minutes},
+        "limitations": {"injuries": [], "restrictions": []}
+    }
+
+def validate_plan(plan, days: int):
+    """按计划结构和训练天数校验，返回错误列表"""
+    if not isinstance(plan, dict):
+        return ["计划不是JSON对象"]
+    return validate_json(plan, plan_schema(days))
+
+async def generate_with_flow(flow, user_data):
+    """通过流程生成计划，LLM失败降级为后备计划时视为生成失败"""
+    shared = {
+        "user_data": user_data,
+        "validation_errors": [],
+        "data_is_valid": False,
+        "analysis_result": {},
+        "raw_plan": {},
+        "final_plan": {},
+        "generation_completed": False
+    }
+    await flow.run_async(shared)
+    raw_plan = shared['raw_plan']
+    if not raw_plan.get('generation_success'):
+        return None
+    return raw_plan.get('plan_data')
+
+async def build(engine: str, mode: str, concurrency: int, retries: int):
+    """生成全部组合的计划，返回 (计划表, 失败的组合)"""
+    flow = None
+    if engine == "llm":
+        from flow import get_fitness_flow
+        flow = get_fitness_flow(mode)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    plans = {}
+    failed = []
+
+    async def build_one(goal, level, days, minutes):
+        key = table_key(goal, level, days, minutes)
+        user_data = representative_user(goal, level, days, minutes)
+        async with semaphore:
+            for attempt in range(1, retries + 2):
+                if flow is None:
+                    plan = generate_rule_based_plan(user_data)
+                else:
+                    plan = await generate_with_flow(flow, user_data)
+                errors = validate_plan(plan, days) if plan is not None else ["LLM生成失败"]
+                if not errors:
+                    plans[key] = plan
+                    return
+                logger.warning(f"{key} 第{attempt}次生成未通过校验: {errors[:3]}")
+        failed.append(key)
+
+    await asyncio.gather(*(build_one(*combination) for combination in iter_table_combinations()))
+
+    if flow is not None:
+        from utils.call_llm import aclose_llm_clients
+        await aclose_llm_clients()
+    return plans, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="构建预计算计划表")
+    parser.add_argument("--engine", choices=("llm", "rule"), default="llm", help="计划生成方式")
+    parser.add_argument("--mode", default="standard", help="LLM生成时使用的流程（flow.PLAN_FLOWS 中的名称）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时生成的组合数")
+    parser.add_argument("--retries", type=int, default=1, help="未通过校验时的重试次数")
+    parser.add_argument("--output", default=os.getenv("PLAN_TABLE_PATH", DEFAULT_PLAN_TABLE_PATH), help="输出文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    start = time.perf_counter()
+    plans, failed = asyncio.run(build(args.engine, args.mode, args.concurrency, args.retries))
+    elapsed = time.perf_counter() - start
+
+    meta = {
+        "engine": args.engine,
+        "mode": args.mode if args.engine == "llm" else None,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "entries": len(plans)
+    }
+    write_plan_table(args.output, plans, meta)
+
+    total = len(plans) + len(failed)
+    print(f"生成 {len(plans)}/{total} 条计划，用时 {elapsed:.1f}s，写入 {args.output}（{os.path.getsize(args.output) / 1024:.0f} KB）")
+    if failed:
+        print(f"未通过校验的组合（线上实时生成）: {', '.join(sorted(failed))}")
+    return 0 if plans else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
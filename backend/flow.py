@@ -1,9 +1,19 @@
-from macore import Flow
+import os
+from macore import Flow, AsyncFlow, AsyncDagFlow
 from nodes import (
     DataValidationNode, 
     GoalAnalysisNode, 
     PlanGenerationNode, 
-    PlanOptimizationNode
+    PlanOptimizationNode,
+    RuleBasedPlanNode,
+    PrecomputedPlanNode,
+    AsyncDataValidationNode,
+    AsyncGoalAnalysisNode,
+    AsyncPlanGenerationNode,
+    AsyncPlanOptimizationNode,
+    AsyncPlanSkeletonNode,
+    AsyncDayWorkoutNode,
+    AsyncFusedPlanNode
 )
 
 def create_fitness_plan_flow():
@@ -22,5 +32,116 @@ def create_fitness_plan_flow():
     # 创建以数据验证节点开始的流程
     return Flow(start=data_validation)
 
-# 创建健身计划生成流程实例
-fitness_flow = create_fitness_plan_flow()
\ No newline at end of file
+def create_async_fitness_plan_flow():
+    """创建异步健身计划生成流程，LLM调用期间不阻塞事件循环"""
+    data_validation = AsyncDataValidationNode()
+    goal_analysis = AsyncGoalAnalysisNode()
+    plan_generation = AsyncPlanGenerationNode()
+    plan_optimization = AsyncPlanOptimizationNode()
+    
+    data_validation - "goal_analysis" >> goal_analysis
+    goal_analysis - "plan_generation" >> plan_generation
+    plan_generation - "plan_optimization" >> plan_optimization
+    
+    return AsyncFlow(start=data_validation)
+
+def create_concurrent_fitness_plan_flow():
+    """
+    创建并发健身计划生成流程
+    
+    节点通过reads/writes声明依赖：数据验证完成后，目标分析和计划生成两个LLM调用并发执行，
+    二者都完成后再进入计划优化
+    """
+    return AsyncDagFlow([
+        AsyncDataValidationNode(),
+        AsyncGoalAnalysisNode(),
+        AsyncPlanGenerationNode(),
+        AsyncPlanOptimizationNode()
+    ])
+
+def create_fanout_fitness_plan_flow():
+    """
+    创建逐日并发生成的健身计划流程
+    
+    先用一次LLM调用生成计划骨架（每天的标题和训练重点），再为每个训练日并发调用一次LLM生成具体动作，
+    耗时基本不随每周训练天数增长；目标分析与骨架、逐日生成并发执行
+    """
+    return AsyncDagFlow([
+        AsyncDataValidationNode(),
+        AsyncGoalAnalysisNode(),
+        AsyncPlanSkeletonNode(),
+        AsyncDayWorkoutNode(),
+        AsyncPlanOptimizationNode()
+    ])
+
+def create_fused_fitness_plan_flow():
+    """
+    创建合并生成的健身计划流程
+    
+    目标分析和训练计划由一次LLM调用同时生成，适合对延迟和调用次数敏感的流量
+    """
+    return AsyncDagFlow([
+        AsyncDataValidationNode(),
+        AsyncFusedPlanNode(),
+        AsyncPlanOptimizationNode()
+    ])
+
+def create_fast_fitness_plan_flow():
+    """
+    创建规则生成的健身计划流程
+    
+    不调用LLM，用动作库和规则生成计划，毫秒级返回；规则计划节点是同步节点，在DAG中直接执行
+    """
+    return AsyncDagFlow([
+        AsyncDataValidationNode(),
+        RuleBasedPlanNode(),
+        AsyncPlanOptimizationNode()
+    ])
+
+def create_precomputed_fitness_plan_flow():
+    """
+    创建读取预计算计划表的健身计划流程
+    
+    不调用LLM，计划来自离线构建的计划表（见 build_plan_table.py），只做个性化优化；未命中时按规则生成
+    """
+    return AsyncDagFlow([
+        AsyncDataValidationNode(),
+        PrecomputedPlanNode(),
+        AsyncPlanOptimizationNode()
+    ])
+
+# 每次运行所有节点合计最多重试的次数，避免提供商故障时重试放大流量
+FLOW_RETRY_BUDGET = int(os.getenv("FLOW_RETRY_BUDGET", "3"))
+
+# 编译后的流程实例：节点无状态、运行状态保存在RunContext中，所有并发请求共享同一个对象
+fitness_flow = create_concurrent_fitness_plan_flow().compile(retry_budget=FLOW_RETRY_BUDGET)
+fanout_fitness_flow = create_fanout_fitness_plan_flow().compile(retry_budget=FLOW_RETRY_BUDGET)
+fused_fitness_flow = create_fused_fitness_plan_flow().compile(retry_budget=FLOW_RETRY_BUDGET)
+fast_fitness_flow = create_fast_fitness_plan_flow().compile()
+precomputed_fitness_flow = create_precomputed_fitness_plan_flow().compile()
+
+# 计划生成方式：standard 目标分析与计划生成两次LLM调用并发；fanout 骨架 + 逐日并发生成；
+# fused 一次LLM调用同时生成目标分析和计划；fast 不调用LLM，按规则生成；precomputed 读取预计算计划表
+PLAN_FLOWS = {
+    "standard": fitness_flow,
+    "fanout": fanout_fitness_flow,
+    "fused": fused_fitness_flow,
+    "fast": fast_fitness_flow,
+    "precomputed": precomputed_fitness_flow
+}
+PLAN_GENERATION_MODE = os.getenv("PLAN_GENERATION_MODE", "standard").lower()
+
+def get_fitness_flow(mode=None):
+    """
+    按生成方式获取编译后的流程
+    
+    Args:
+        mode (str): 生成方式，为空时使用 PLAN_GENERATION_MODE 配置
+        
+    Returns:
+        CompiledDagFlow: 编译后的流程
+    """
+    mode = mode or PLAN_GENERATION_MODE
+    if mode not in PLAN_FLOWS:
+        raise ValueError(f"未知的计划生成方式: {mode}")
+    return PLAN_FLOWS[mode]
\ No newline at end of file
@@ -3,9 +3,65 @@
 MACore Framework - MACore Application Framework
 A lightweight framework for building LLM applications with nodes and flows.
 """
-import asyncio, warnings, copy, time
+import asyncio, warnings, copy, time, random, contextvars
+from contextlib import contextmanager
+from types import MappingProxyType
+
+class RetryPolicy:
+    """Exponential backoff with full jitter. retry_on(exc) -> bool limits which errors are retried."""
+    def __init__(self,max_attempts=1,base_delay=0,max_delay=30,multiplier=2,jitter=True,retry_on=None):
+        self.max_attempts,self.base_delay,self.max_delay,self.multiplier,self.jitter,self.retry_on=max_attempts,base_delay,max_delay,multiplier,jitter,retry_on
+    def should_retry(self,exc,attempt): return attempt+1<self.max_attempts and (self.retry_on is None or self.retry_on(exc))
+    def delay(self,attempt):
+        d=min(self.max_delay,self.base_delay*self.multiplier**attempt)
+        return random.uniform(0,d) if self.jitter else d
+
+class RetryBudget:
+    """Caps the number of retries all nodes of one flow run may spend together."""
+    def __init__(self,max_retries): self.remaining=max_retries
+    def try_acquire(self):
+        if self.remaining<=0: return False
+        self.remaining-=1; return True
+
+class DeadlineExceeded(TimeoutError):
+    """Raised (and handed to exec_fallback) when a node has no time budget left."""
+
+class RunContext:
+    """Per-run state of a compiled flow, so shared node instances stay stateless.
+    hooks are called as hook(event,node,info) for instrumentation events such as 'retry' and 'fallback',
+    and 'node_start'/'node_end' around every node of a DAG flow.
+    deadline is an absolute time.monotonic() timestamp for the whole run."""
+    def __init__(self,params=None,retry_budget=None,hooks=(),deadline=None):
+        self.params,self.retry_budget,self.hooks,self.deadline=dict(params or {}),retry_budget,tuple(hooks),deadline
+    def remaining(self): return None if self.deadline is None else max(0.0,self.deadline-time.monotonic())
+    def emit(self,event,node,**info):
+        for hook in self.hooks: hook(event,node,info)
+
+_current_run=contextvars.ContextVar("macore_run",default=None)
+_retry_attempt=contextvars.ContextVar("macore_retry_attempt",default=0)
+def current_run(): return _current_run.get()
+
+@contextmanager
+def _run_context(params,retry_budget=None,hooks=(),deadline=None):
+    token=_current_run.set(RunContext(params,RetryBudget(retry_budget) if retry_budget is not None else None,hooks,deadline))
+    try: yield _current_run.get()
+    finally: _current_run.reset(token)
+
+def _emit(event,node,**info):
+    ctx=_current_run.get()
+    if ctx: ctx.emit(event,node,**info)
+
+def _retry_delay(node,exc,attempt):
+    """Backoff before the next attempt, or None to give up and fall back."""
+    if not node.retry.should_retry(exc,attempt): return None
+    d,budget=node.retry.delay(attempt),node.time_budget()
+    if budget is not None and d>=budget: _emit("deadline_exceeded",node,attempt=attempt,error=exc); return None
+    ctx=_current_run.get()
+    if ctx and ctx.retry_budget and not ctx.retry_budget.try_acquire(): _emit("retry_budget_exhausted",node,attempt=attempt,error=exc); return None
+    return d
 
 class BaseNode:
+    reads,writes=(),()  # shared-store keys the node reads/writes, used by AsyncDagFlow
     def __init__(self): 
         self.params = {}
         self.successors = {}
@@ -31,14 +87,38 @@ class _ConditionalTransition:
     def __rshift__(self,tgt): return self.src.next(tgt,self.action)
 
 class Node(BaseNode):
-    def __init__(self,max_retries=1,wait=0): super().__init__(); self.max_retries,self.wait=max_retries,wait
+    """timeout (seconds) opts the node into deadline handling: each attempt gets min(timeout, run deadline),
+    and once no budget is left exec_fallback receives DeadlineExceeded. Nodes without a timeout always run.
+    AsyncNode cancels an attempt that overruns its budget. A sync exec cannot be interrupted: it must pass
+    self.time_budget() as the timeout of its blocking calls, and the budget is only checked between attempts."""
+    def __init__(self,max_retries=1,wait=0,retry=None,timeout=None):
+        super().__init__(); self.max_retries,self.wait,self.timeout=max_retries,wait,timeout
+        self.retry=retry or RetryPolicy(max_attempts=max_retries,base_delay=wait,multiplier=1,jitter=False)
+    @property
+    def retry_attempt(self): return _retry_attempt.get()  # per-run (context-local), safe when nodes are shared
+    def time_budget(self):
+        if self.timeout is None: return None
+        ctx=_current_run.get(); rem=ctx.remaining() if ctx else None
+        budget=self.timeout if rem is None else min(self.timeout,rem)
+        return None if budget==float("inf") else budget
+    def _out_of_time(self,attempt):
+        budget=self.time_budget()
+        if budget is None or budget>0: return None
+        _emit("deadline_exceeded",self,attempt=attempt); return DeadlineExceeded(f"{type(self).__name__} has no time budget left")
     def exec_fallback(self,prep_res,exc): raise exc
     def _exec(self,prep_res):
-        for self.retry_attempt in range(self.max_retries):
+        attempt=0
+        while True:
+            _retry_attempt.set(attempt)
+            expired=self._out_of_time(attempt)
+            if expired: return self.exec_fallback(prep_res,expired)
             try: return self.exec(prep_res)
             except Exception as e:
-                if self.retry_attempt==self.max_retries-1: return self.exec_fallback(prep_res,e)
-                if self.wait>0: time.sleep(self.wait)
+                d=_retry_delay(self,e,attempt)
+                if d is None: _emit("fallback",self,attempt=attempt,error=e); return self.exec_fallback(prep_res,e)
+                _emit("retry",self,attempt=attempt+1,delay=d,error=e)
+                if d>0: time.sleep(d)
+                attempt+=1
 
 class BatchNode(Node):
     def _exec(self,items): return [super(BatchNode,self)._exec(i) for i in (items or [])]
@@ -55,7 +135,11 @@ class Flow(BaseNode):
         while curr: curr.set_params(p); last_action=curr._run(shared); curr=copy.copy(self.get_next_node(curr,last_action))
         return last_action
     def _run(self,shared): p=self.prep(shared); o=self._orch(shared); return self.post(shared,p,o)
+    def run(self,shared,deadline=None):
+        if deadline is None: return super().run(shared)
+        with _run_context(self.params,deadline=deadline): return super().run(shared)
     def post(self,shared,prep_res,exec_res): return exec_res
+    def compile(self,retry_budget=None,hooks=()): return CompiledFlow(self,retry_budget,hooks)
 
 class BatchFlow(Flow):
     def _run(self,shared):
@@ -69,11 +153,19 @@ class AsyncNode(Node):
     async def exec_fallback_async(self,prep_res,exc): raise exc
     async def post_async(self,shared,prep_res,exec_res): pass
     async def _exec(self,prep_res): 
-        for self.retry_attempt in range(self.max_retries):
-            try: return await self.exec_async(prep_res)
+        attempt=0
+        while True:
+            _retry_attempt.set(attempt)
+            expired=self._out_of_time(attempt)
+            if expired: return await self.exec_fallback_async(prep_res,expired)
+            budget=self.time_budget()
+            try: return await (self.exec_async(prep_res) if budget is None else asyncio.wait_for(self.exec_async(prep_res),budget))
             except Exception as e:
-                if self.retry_attempt==self.max_retries-1: return await self.exec_fallback_async(prep_res,e)
-                if self.wait>0: await asyncio.sleep(self.wait)
+                d=_retry_delay(self,e,attempt)
+                if d is None: _emit("fallback",self,attempt=attempt,error=e); return await self.exec_fallback_async(prep_res,e)
+                _emit("retry",self,attempt=attempt+1,delay=d,error=e)
+                if d>0: await asyncio.sleep(d)
+                attempt+=1
     async def run_async(self,shared): 
         if self.successors: warnings.warn("Node won't run successors. Use AsyncFlow.")  
         return await self._run_async(shared)
@@ -100,8 +192,44 @@ class AsyncFlow(Flow,AsyncNode):
         while curr: curr.set_params(p); last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else curr._run(shared); curr=copy.copy(self.get_next_node(curr,last_action))
         return last_action
     async def _run_async(self,shared): p=await self.prep_async(shared); o=await self._orch_async(shared); return await self.post_async(shared,p,o)
+    async def run_async(self,shared,deadline=None):
+        if deadline is None: return await super().run_async(shared)
+        with _run_context(self.params,deadline=deadline): return await super().run_async(shared)
     async def post_async(self,shared,prep_res,exec_res): return exec_res
 
+class AsyncDagFlow(AsyncFlow):
+    """Runs nodes concurrently, each one starting once the earlier nodes it conflicts with (by reads/writes) are done."""
+    def __init__(self,nodes=()):
+        super().__init__(); self.nodes=[]
+        for n in nodes: self.add(n)
+    def add(self,node):
+        if node in self.nodes: raise ValueError("Node already added to DAG")
+        self.nodes.append(node); return node
+    def dependencies(self):
+        deps={}
+        for i,n in enumerate(self.nodes):
+            r,w=set(n.reads),set(n.writes)
+            deps[n]=[m for m in self.nodes[:i] if set(m.writes)&(r|w) or set(m.reads)&w]
+        return deps
+    async def _orch_async(self,shared,params=None): return await _run_dag(self.nodes,self.dependencies(),shared,params or {**self.params})
+    def compile(self,retry_budget=None,hooks=()): return CompiledDagFlow(self,retry_budget,hooks)
+
+async def _run_dag(nodes,deps,shared,params=None):
+    tasks={}
+    async def run(node):
+        if deps[node]: await asyncio.gather(*(tasks[d] for d in deps[node]))
+        _emit("node_start",node)
+        n=node
+        if params is not None: n=copy.copy(node); n.set_params(params)
+        r=await n._run_async(shared) if isinstance(n,AsyncNode) else n._run(shared)
+        _emit("node_end",node); return r
+    for n in nodes: tasks[n]=asyncio.ensure_future(run(n))
+    try: results=await asyncio.gather(*tasks.values())
+    except BaseException:
+        for t in tasks.values(): t.cancel()
+        raise
+    return results[-1] if results else None
+
 class AsyncBatchFlow(AsyncFlow,BatchFlow):
     async def _run_async(self,shared):
         pr=await self.prep_async(shared) or []
@@ -113,10 +241,59 @@ class AsyncParallelBatchFlow(AsyncFlow,BatchFlow):
         pr=await self.prep_async(shared) or []
         await asyncio.gather(*(self._orch_async(shared,{**self.params,**bp}) for bp in pr))
         return await self.post_async(shared,pr,None)
-    
+
+class CompiledFlow:
+    """Immutable snapshot of a flow graph, safe to share across threads and concurrent runs.
+    Nodes are never copied or mutated; per-run params live in current_run().params.
+    retry_budget caps retries per run; hooks receive instrumentation events of every run."""
+    def __init__(self,flow,retry_budget=None,hooks=()):
+        table,todo={},[flow.start_node]
+        while todo:
+            n=todo.pop()
+            if n is None or n in table: continue
+            table[n]=MappingProxyType(dict(n.successors)); todo.extend(n.successors.values())
+        self.flow,self.start_node,self.transitions=flow,flow.start_node,MappingProxyType(table)
+        self.retry_budget,self.hooks=retry_budget,tuple(hooks)
+        self._frozen=True
+    def __setattr__(self,name,value):
+        if getattr(self,"_frozen",False): raise AttributeError("CompiledFlow is immutable")
+        object.__setattr__(self,name,value)
+    def get_next_node(self,curr,action):
+        succ=self.transitions[curr]; nxt=succ.get(action or "default")
+        if not nxt and succ: warnings.warn(f"Flow ends: '{action}' not found in {list(succ)}")
+        return nxt
+    def _orch(self,shared):
+        curr,last_action=self.start_node,None
+        while curr: last_action=curr._run(shared); curr=self.get_next_node(curr,last_action)
+        return last_action
+    async def _orch_async(self,shared):
+        curr,last_action=self.start_node,None
+        while curr: last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else curr._run(shared); curr=self.get_next_node(curr,last_action)
+        return last_action
+    def _context(self,params,hooks,deadline): return _run_context({**self.flow.params,**(params or {})},self.retry_budget,self.hooks+tuple(hooks),deadline)
+    def run(self,shared,params=None,hooks=(),deadline=None):
+        if isinstance(self.flow,AsyncNode): raise RuntimeError("Use run_async.")
+        with self._context(params,hooks,deadline): p=self.flow.prep(shared); return self.flow.post(shared,p,self._orch(shared))
+    async def run_async(self,shared,params=None,hooks=(),deadline=None):
+        with self._context(params,hooks,deadline):
+            if not isinstance(self.flow,AsyncNode): p=self.flow.prep(shared); return self.flow.post(shared,p,self._orch(shared))
+            p=await self.flow.prep_async(shared); return await self.flow.post_async(shared,p,await self._orch_async(shared))
+
+class CompiledDagFlow(CompiledFlow):
+    """Compiled AsyncDagFlow: the dependency graph is computed once at compile time."""
+    def __init__(self,flow,retry_budget=None,hooks=()):
+        deps=flow.dependencies()
+        self.flow,self.start_node,self.transitions=flow,None,MappingProxyType({})
+        self.nodes,self.deps=tuple(flow.nodes),MappingProxyType({n:tuple(d) for n,d in deps.items()})
+        self.retry_budget,self.hooks=retry_budget,tuple(hooks)
+        self._frozen=True
+    async def _orch_async(self,shared): return await _run_dag(self.nodes,self.deps,shared)
+
 __version__ = "0.2.1"
 __all__ = [
     'BaseNode', 'Node', 'BatchNode', 'Flow', 'BatchFlow',
     'AsyncNode', 'AsyncBatchNode', 'AsyncParallelBatchNode', 
-    'AsyncFlow', 'AsyncBatchFlow', 'AsyncParallelBatchFlow'
+    'AsyncFlow', 'AsyncDagFlow', 'AsyncBatchFlow', 'AsyncParallelBatchFlow',
+    'CompiledFlow', 'CompiledDagFlow', 'RunContext', 'current_run',
+    'RetryPolicy', 'RetryBudget', 'DeadlineExceeded'
 ]
\ No newline at end of file
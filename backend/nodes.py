@@ -1,17 +1,55 @@
-from macore import Node
-from utils.call_llm import call_llm, call_llm_with_system
-from utils.fitness_knowledge import get_exercises_by_goal_and_level, get_safety_guidelines
-from utils.plan_formatter import format_complete_plan
+import os
+from macore import Node, AsyncNode, AsyncParallelBatchNode, RetryPolicy
+from utils.call_llm import call_llm, call_llm_with_system, call_llm_with_system_async, is_transient_llm_error
+from utils.fitness_knowledge import (
+    get_exercise_database,
+    get_exercises_by_goal_and_level,
+    get_safety_guidelines,
+    get_user_limitations,
+    format_exercise_catalog
+)
+from utils.plan_formatter import format_complete_plan, expand_compact_plan, expand_compact_workout, generate_rule_based_plan
+from utils.plan_schemas import (
+    ANALYSIS_SCHEMA,
+    WORKOUT_SCHEMA,
+    plan_schema,
+    compact_plan_schema,
+    compact_workout_schema,
+    plan_skeleton_schema,
+    fused_plan_schema
+)
+from utils.plan_table import get_plan_table, plan_table_key
+from utils.profile_buckets import canonicalize_profile
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# LLM节点的重试策略：只重试限流、超时等临时错误，指数退避加抖动
+LLM_RETRY_POLICY = RetryPolicy(
+    max_attempts=3,
+    base_delay=1.0,
+    max_delay=8.0,
+    retry_on=is_transient_llm_error
+)
+
+# LLM节点的单节点超时（秒），实际预算还会受请求截止时间限制
+ANALYSIS_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT", "20"))
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "45"))
+SKELETON_TIMEOUT = float(os.getenv("SKELETON_TIMEOUT", "20"))
+DAY_GENERATION_TIMEOUT = float(os.getenv("DAY_GENERATION_TIMEOUT", "25"))
+
+# 计划输出格式：full 由LLM写出完整动作信息；compact 只输出动作ID和训练参数，由服务端展开
+PLAN_OUTPUT_SCHEMA = os.getenv("PLAN_OUTPUT_SCHEMA", "full").lower()
+
 class DataValidationNode(Node):
     """
     数据验证节点 - 验证和标准化用户输入的身体数据和健身目标
     """
     
+    reads = ('user_data',)
+    writes = ('user_data', 'validation_errors', 'data_is_valid')
+    
     def prep(self, shared):
         """从shared store读取用户数据"""
         return shared.get('user_data', {})
@@ -132,6 +170,12 @@ class GoalAnalysisNode(Node):
     目标分析节点 - 基于用户数据分析最适合的训练类型和强度
     """
     
+    reads = ('user_data', 'data_is_valid')
+    writes = ('analysis_result',)
+    
+    def __init__(self):
+        super().__init__(retry=LLM_RETRY_POLICY, timeout=ANALYSIS_TIMEOUT)
+    
     def prep(self, shared):
         """读取验证后的用户数据"""
         user_data = shared.get('user_data', {})
@@ -148,15 +192,23 @@ class GoalAnalysisNode(Node):
         
         logger.info("开始分析用户目标和制定训练策略")
         
-        # 构建分析提示
-        basic_info = user_data['basic_info']
-        goals = user_data['goals']
-        schedule = user_data['schedule']
-        limitations = user_data['limitations']
-        
-        # 计算BMI
-        height_m = basic_info['height'] / 100
-        bmi = round(basic_info['weight'] / (height_m ** 2), 1)
+        system_prompt, user_prompt = self._build_prompts(user_data)
+        analysis = call_llm_with_system(
+            system_prompt, user_prompt,
+            timeout=self.time_budget(),
+            response_schema=ANALYSIS_SCHEMA
+        )
+        return self._finalize_analysis(analysis)
+    
+    def exec_fallback(self, inputs, exc):
+        """重试用尽、时间预算耗尽或遇到不可重试的错误时使用默认分析结果"""
+        logger.error(f"目标分析出错: {exc}")
+        return self._get_default_analysis()
+    
+    def _build_prompts(self, user_data):
+        """构建目标分析的系统提示和用户提示"""
+        # 使用分桶画像而非精确数据，相近用户的提示词完全相同，可以命中LLM缓存
+        profile = canonicalize_profile(user_data)
         
         system_prompt = """你是一位专业的健身教练和运动科学专家。请基于用户的身体数据和目标，分析最适合的训练策略。
 
@@ -172,43 +224,27 @@ class GoalAnalysisNode(Node):
         
         user_prompt = f"""
 用户信息：
-- 基础信息：{basic_info['age']}岁，{basic_info['gender']}性，身高{basic_info['height']}cm，体重{basic_info['weight']}kg
-- BMI: {bmi}
-- 运动经验：{basic_info['experience']}
-- 主要目标：{goals['primary_goal']}
-- 目标部位：{goals.get('target_areas', [])}
-- 训练频率：每周{schedule['days_per_week']}次，每次{schedule['time_per_session']}分钟
-- 身体限制：{limitations.get('restrictions', [])}
-- 伤病史：{limitations.get('injuries', [])}
+- 基础信息：{profile['age_band']}，{profile['gender']}性，体重{profile['weight_band']}
+- BMI分类: {profile['bmi_class']}
+- 运动经验：{profile['experience']}
+- 主要目标：{profile['primary_goal']}
+- 目标部位：{profile['target_areas']}
+- 训练频率：每周{profile['days_per_week']}次，每次{profile['time_per_session']}分钟
+- 身体限制：{profile['restrictions']}
+- 伤病史：{profile['injuries']}
 
 请分析这位用户的情况，给出专业的训练策略建议。
 """
-        
-        try:
-            response = call_llm_with_system(system_prompt, user_prompt)
-            
-            # 尝试解析JSON响应
-            if '```json' in response:
-                json_str = response.split('```json')[1].split('```')[0].strip()
-            elif '{' in response:
-                json_str = response[response.find('{'):response.rfind('}')+1]
-            else:
-                json_str = response
-            
-            analysis_result = json.loads(json_str)
-            
-            # 验证必要字段
-            required_fields = ['fitness_level', 'recommended_intensity', 'suitable_exercise_types', 'risk_factors']
-            for field in required_fields:
-                if field not in analysis_result:
-                    analysis_result[field] = self._get_default_value(field)
-            
-            logger.info("目标分析完成")
-            return analysis_result
-            
-        except Exception as e:
-            logger.error(f"目标分析出错: {e}")
-            return self._get_default_analysis()
+        return system_prompt, user_prompt
+    
+    def _finalize_analysis(self, analysis):
+        """补全分析结果的可选字段（结构化输出已按ANALYSIS_SCHEMA校验过必要字段）"""
+        analysis_result = dict(analysis)
+        for field in ('training_focus', 'weekly_structure'):
+            analysis_result.setdefault(field, self._get_default_analysis()[field])
+        
+        logger.info("目标分析完成")
+        return analysis_result
     
     def _get_default_analysis(self):
         """获取默认分析结果"""
@@ -221,16 +257,6 @@ class GoalAnalysisNode(Node):
             "weekly_structure": "每周3次全身训练"
         }
     
-    def _get_default_value(self, field):
-        """获取字段默认值"""
-        defaults = {
-            'fitness_level': '初级',
-            'recommended_intensity': '中等强度',
-            'suitable_exercise_types': ['自重训练'],
-            'risk_factors': ['注意循序渐进']
-        }
-        return defaults.get(field, '')
-    
     def post(self, shared, prep_result, exec_result):
         """写入分析结果到shared store"""
         shared['analysis_result'] = exec_result
@@ -239,36 +265,68 @@ class GoalAnalysisNode(Node):
 
 class PlanGenerationNode(Node):
     """
-    计划生成节点 - 根据分析结果生成具体的训练计划
+    计划生成节点 - 根据用户数据生成具体的训练计划
+    
+    生成提示词不依赖目标分析结果，因此在AsyncDagFlow中可以与GoalAnalysisNode并发执行
+    
+    compact模式下提示词附带带ID的动作目录，LLM只返回动作ID、组数、次数和休息时间，
+    动作名称、说明和技巧由服务端从动作库展开，输出token大幅减少
     """
     
+    reads = ('user_data',)
+    writes = ('raw_plan',)
+    
+    def __init__(self, compact=None):
+        super().__init__(retry=LLM_RETRY_POLICY, timeout=GENERATION_TIMEOUT)
+        self.compact = PLAN_OUTPUT_SCHEMA == "compact" if compact is None else compact
+    
     def prep(self, shared):
-        """读取用户数据和分析结果"""
-        user_data = shared.get('user_data', {})
-        analysis_result = shared.get('analysis_result', {})
-        return user_data, analysis_result
+        """读取用户数据"""
+        return shared.get('user_data', {})
     
-    def exec(self, inputs):
+    def exec(self, user_data):
         """调用LLM和健身知识库生成详细训练计划"""
-        user_data, analysis_result = inputs
-        
         logger.info("开始生成详细训练计划")
         
-        # 获取适合的训练动作
+        exercises, safety_guidelines, system_prompt, user_prompt = self._prepare_generation(user_data)
+        plan = call_llm_with_system(
+            system_prompt, user_prompt,
+            timeout=self.time_budget(),
+            response_schema=self._response_schema(user_data)
+        )
+        logger.info("训练计划生成完成")
+        return self._build_result(self._expand_plan(plan, user_data), exercises, safety_guidelines, True)
+    
+    def exec_fallback(self, user_data, exc):
+        """重试用尽、时间预算耗尽或遇到不可重试的错误时生成基础计划作为后备（不调用LLM）"""
+        logger.error(f"计划生成出错: {exc}")
+        
+        exercises, safety_guidelines, _, _ = self._prepare_generation(user_data)
+        backup_plan = self._generate_backup_plan(user_data)
+        return self._build_result(backup_plan, exercises, safety_guidelines, False)
+    
+    def _prepare_generation(self, user_data):
+        """获取候选动作和安全指南，并构建计划生成提示"""
         goal = user_data['goals']['primary_goal']
         level = user_data['basic_info']['experience']
-        target_areas = user_data['goals'].get('target_areas', [])
         
-        exercises = get_exercises_by_goal_and_level(goal, level, target_areas)
+        # 获取适合的训练动作
+        exercises = self._candidate_exercises(user_data)
         safety_guidelines = get_safety_guidelines()
         
         # 构建计划生成提示
-        system_prompt = f"""你是专业健身教练。生成训练计划必须严格遵守：
+        if self.compact:
+            system_prompt = self._compact_system_prompt(user_data, exercises)
+        else:
+            system_prompt = f"""你是专业健身教练。生成训练计划必须严格遵守：
 - 每周{user_data['schedule']['days_per_week']}次训练
 - 每次{user_data['schedule']['time_per_session']}分钟
 - 适合{level}水平
 - 目标：{goal}
 
+优先从以下动作中选择，已排除与用户身体限制冲突的动作（格式：名称 | 目标肌群 | 器械）：
+{format_exercise_catalog(exercises, with_ids=False)}
+
 必须返回严格的JSON格式，结构如下：
 {{
   "plan_title": "计划标题",
@@ -323,86 +381,114 @@ class PlanGenerationNode(Node):
         logger.info(f"用户选择的训练频率: 每周{user_data['schedule']['days_per_week']}次")
         logger.info(f"用户选择的训练时长: 每次{user_data['schedule']['time_per_session']}分钟")
         
-        user_prompt = f"""用户信息：
-- 年龄：{user_data['basic_info']['age']}岁
-- 性别：{user_data['basic_info']['gender']}
-- 身高：{user_data['basic_info']['height']}cm
-- 体重：{user_data['basic_info']['weight']}kg
-- 经验：{user_data['basic_info']['experience']}
-- 目标：{user_data['goals']['primary_goal']}
-- 限制：{user_data['limitations'].get('restrictions', [])}
+        return exercises, safety_guidelines, system_prompt, self._user_prompt(user_data)
+    
+    def _user_prompt(self, user_data):
+        """用户提示：只包含分桶画像，精确的身高体重在PlanOptimizationNode中做个性化"""
+        profile = canonicalize_profile(user_data)
+        return f"""用户信息：
+- 年龄段：{profile['age_band']}
+- 性别：{profile['gender']}
+- 体型：BMI{profile['bmi_class']}，体重{profile['weight_band']}
+- 经验：{profile['experience']}
+- 目标：{profile['primary_goal']}
+- 限制：{profile['restrictions']}
 
 请生成符合以上JSON格式的训练计划。"""
-        
-        try:
-            raw_plan = call_llm_with_system(system_prompt, user_prompt)
-            logger.info("训练计划生成完成")
-            
-            return {
-                'raw_plan_text': raw_plan,
-                'available_exercises': exercises,
-                'safety_guidelines': safety_guidelines,
-                'generation_success': True
-            }
-            
-        except Exception as e:
-            logger.error(f"计划生成出错: {e}")
-            
-            # 生成基础计划作为后备
-            backup_plan = self._generate_backup_plan(user_data, analysis_result)
-            return {
-                'raw_plan_text': backup_plan,
-                'available_exercises': exercises,
-                'safety_guidelines': safety_guidelines,
-                'generation_success': False
-            }
     
-    def _generate_backup_plan(self, user_data, analysis_result):
-        """生成基础后备计划"""
+    def _candidate_exercises(self, user_data):
+        """
+        按目标、水平和目标部位筛选候选动作，并排除与身体限制冲突的动作
+        
+        目标部位没有可用动作时按训练目标选择，仍然没有时从全部部位中选择。
+        目标部位取分桶画像中排序后的列表，同一画像的候选动作（和提示词）顺序完全一致
+        """
         goal = user_data['goals']['primary_goal']
         level = user_data['basic_info']['experience']
-        frequency = user_data['schedule']['days_per_week']
-        session_time = user_data['schedule']['time_per_session']
-        
-        goal_names = {
-            'weight_loss': '减脂塑形',
-            'muscle_gain': '增肌塑体',
-            'strength': '力量提升',
-            'endurance': '耐力增强',
-            'toning': '身体塑形'
-        }
-        
-        logger.warning(f"使用后备计划：每周{frequency}次，每次{session_time}分钟")
-        
-        plan_text = f"""
-# {goal_names.get(goal, '健身')}训练计划
-
-## 计划概述
-这是一份为{level}水平制定的{goal_names.get(goal, '健身')}计划，每周训练{frequency}次，每次{session_time}分钟。
-
-**重要提醒：这是后备简化计划，建议稍后重试以获得更详细的个性化计划。**
-
-## 训练原则
-1. 循序渐进，重视动作质量
-2. 合理安排休息，避免过度训练
-3. 注意饮食和睡眠配合
-4. 有问题及时调整
+        target_areas = canonicalize_profile(user_data)['target_areas']
+        limitations = get_user_limitations(user_data)
+        
+        exercises = get_exercises_by_goal_and_level(goal, level, target_areas, limitations)
+        if not any(exercises.values()):
+            exercises = get_exercises_by_goal_and_level(goal, level, limitations=limitations)
+        if not any(exercises.values()):
+            exercises = get_exercises_by_goal_and_level(goal, level, list(get_exercise_database()), limitations)
+        return exercises
+    
+    def _compact_system_prompt(self, user_data, exercises):
+        """紧凑模式的系统提示：附带动作目录，动作只用ID引用"""
+        days = user_data['schedule']['days_per_week']
+        return f"""你是专业健身教练。生成训练计划必须严格遵守：
+- 每周{days}次训练
+- 每次{user_data['schedule']['time_per_session']}分钟
+- 适合{user_data['basic_info']['experience']}水平
+- 目标：{user_data['goals']['primary_goal']}
 
-## 周训练安排
-根据您选择的每周{frequency}次、每次{session_time}分钟的时间安排：
-- 训练频率：每周{frequency}天
-- 每次时长：{session_time}分钟
-- 训练强度：适合{level}水平
+动作只能从以下目录中选择（格式：ID 名称 | 目标肌群 | 器械）：
+{format_exercise_catalog(exercises)}
 
-## 注意事项
-- 请遵循您设定的时间安排：每周{frequency}次，每次{session_time}分钟
-- 建议稍后重试以获得更详细的个性化训练计划
-- 如需专业指导，请咨询健身教练
+必须返回严格的JSON格式，动作只写ID和训练参数，不要写动作名称、说明或技巧：
+{{
+  "plan_title": "计划标题",
+  "overview": {{"description": "计划概述", "principles": ["训练原则1", "训练原则2"]}},
+  "weekly_plan": {{"total_days": {days}, "session_duration": {user_data['schedule']['time_per_session']}, "rest_days": "休息日安排"}},
+  "daily_workouts": [
+    {{"day": 1, "title": "训练日标题", "focus": "训练重点", "exercises": [{{"id": "动作ID", "sets": 3, "reps": "8-12", "rest": "60秒"}}]}}
+  ],
+  "progression": {{"week1": "第一周要点", "week2": "第二周要点", "week3": "第三周要点", "week4": "第四周要点"}},
+  "nutrition_tips": ["营养建议1", "营养建议2"],
+  "safety_reminders": ["安全提醒1", "安全提醒2"]
+}}
 
-训练内容将包含适合您水平的动作，确保安全有效。
-"""
+只返回有效的JSON，不要有任何其他文字说明。"""
+    
+    def _response_schema(self, user_data):
+        """计划的JSON Schema，daily_workouts 天数必须与用户选择的训练频率一致"""
+        days = user_data['schedule']['days_per_week']
+        if self.compact:
+            return compact_plan_schema(days, self._candidate_ids(user_data))
+        return plan_schema(days)
+    
+    def _candidate_ids(self, user_data):
+        """候选动作的ID列表"""
+        return [
+            exercise['id']
+            for exercise_list in self._candidate_exercises(user_data).values()
+            for exercise in exercise_list
+        ]
+    
+    def _expand_plan(self, plan, user_data):
+        """紧凑模式下把LLM返回的计划展开为完整计划结构"""
+        if self.compact and isinstance(plan, dict):
+            return expand_compact_plan(plan, user_data['basic_info']['experience'])
+        return plan
+    
+    def _expand_workout(self, workout, user_data):
+        """紧凑模式下把流式解析出的单日训练展开为完整结构"""
+        if self.compact:
+            return expand_compact_workout(workout, user_data['basic_info']['experience'])
+        return workout
+    
+    def _build_result(self, raw_plan, exercises, safety_guidelines, success):
+        """组装计划生成结果，raw_plan 是结构化输出的计划数据或计划文本"""
+        plan_data = raw_plan if isinstance(raw_plan, dict) else None
+        return {
+            'raw_plan_text': json.dumps(plan_data, ensure_ascii=False) if plan_data is not None else raw_plan,
+            'plan_data': plan_data,
+            'available_exercises': exercises,
+            'safety_guidelines': safety_guidelines,
+            'generation_success': success
+        }
+    
+    def _generate_backup_plan(self, user_data):
+        """生成基础后备计划：用动作库和规则生成，结构与LLM生成的计划相同"""
+        frequency = user_data['schedule']['days_per_week']
+        session_time = user_data['schedule']['time_per_session']
+        logger.warning(f"使用后备计划：每周{frequency}次，每次{session_time}分钟")
         
-        return plan_text
+        plan = generate_rule_based_plan(user_data)
+        plan['overview']['description'] += "（重要提醒：这是后备简化计划，建议稍后重试以获得更详细的个性化计划。）"
+        return plan
     
     def post(self, shared, prep_result, exec_result):
         """写入生成的计划到shared store"""
@@ -415,27 +501,32 @@ class PlanOptimizationNode(Node):
     计划优化节点 - 对生成的计划进行安全性检查、个性化调整和格式化
     """
     
+    reads = ('raw_plan', 'user_data', 'analysis_result')
+    writes = ('final_plan', 'generation_completed')
+    
     def prep(self, shared):
-        """读取原始计划和用户数据"""
+        """读取原始计划、用户数据和目标分析结果"""
         raw_plan = shared.get('raw_plan', {})
         user_data = shared.get('user_data', {})
-        return raw_plan, user_data
+        analysis_result = shared.get('analysis_result', {})
+        return raw_plan, user_data, analysis_result
     
     def exec(self, inputs):
         """调用plan_formatter优化计划，添加安全提醒和免责声明"""
-        raw_plan, user_data = inputs
+        raw_plan, user_data, analysis_result = inputs
         
         logger.info("开始优化和格式化训练计划")
         
         try:
             # 格式化完整计划
+            # 结构化输出的计划数据直接使用，否则解析计划文本
             formatted_plan = format_complete_plan(
-                raw_plan.get('raw_plan_text', ''), 
+                raw_plan.get('plan_data') or raw_plan.get('raw_plan_text', ''),
                 user_data
             )
             
             # 添加额外的安全检查
-            safety_notes = self._add_safety_checks(user_data, formatted_plan)
+            safety_notes = self._add_safety_checks(user_data, formatted_plan, analysis_result)
             formatted_plan['safety_notes'].extend(safety_notes)
             
             # 添加个性化建议
@@ -461,7 +552,7 @@ class PlanOptimizationNode(Node):
                 'final_status': 'completed_with_errors'
             }
     
-    def _add_safety_checks(self, user_data, plan):
+    def _add_safety_checks(self, user_data, plan, analysis_result=None):
         """添加针对性安全检查"""
         safety_notes = []
         
@@ -487,6 +578,12 @@ class PlanOptimizationNode(Node):
         if frequency > 5:
             safety_notes.append("⚠️ 训练频率较高，务必保证充足恢复时间")
         
+        # 目标分析给出的风险因素
+        for risk in (analysis_result or {}).get('risk_factors', []):
+            note = f"⚠️ {risk}"
+            if note not in safety_notes:
+                safety_notes.append(note)
+        
         return safety_notes
     
     def _generate_personal_tips(self, user_data):
@@ -533,4 +630,385 @@ class PlanOptimizationNode(Node):
         shared['generation_completed'] = True
         
         logger.info("训练计划生成流程全部完成")
-        return None  # 流程结束
\ No newline at end of file
+        return None  # 流程结束
+
+class RuleBasedPlanNode(PlanGenerationNode):
+    """
+    规则计划节点 - 不调用LLM，用动作库和规则直接生成计划，毫秒级完成
+    
+    写入与PlanGenerationNode相同的 raw_plan，不写入目标分析结果
+    """
+    
+    def __init__(self):
+        # 确定性的本地计算：不沿用LLM节点的重试策略和超时，不消耗流程的重试预算
+        Node.__init__(self)
+        self.compact = False
+    
+    def exec(self, user_data):
+        """用动作库和规则生成训练计划"""
+        logger.info("开始按规则生成训练计划")
+        plan = generate_rule_based_plan(user_data)
+        return self._build_result(plan, self._candidate_exercises(user_data), get_safety_guidelines(), True)
+
+class PrecomputedPlanNode(RuleBasedPlanNode):
+    """
+    预计算计划节点 - 从离线构建的计划表中读取用户所属组合的计划，不调用LLM
+    
+    计划表未加载、用户不适用计划表（填写了身体限制等）或未命中时按规则生成；
+    身高体重等个性化调整由后续的 PlanOptimizationNode 完成
+    """
+    
+    def exec(self, user_data):
+        """读取预计算计划，未命中时按规则生成"""
+        table = get_plan_table()
+        key = plan_table_key(user_data)
+        plan = table.get(key) if table is not None and key is not None else None
+        if plan is None:
+            logger.info(f"预计算计划表未命中（{key}），按规则生成训练计划")
+            plan = generate_rule_based_plan(user_data)
+        else:
+            logger.info(f"使用预计算计划: {key}")
+        return self._build_result(plan, self._candidate_exercises(user_data), get_safety_guidelines(), True)
+
+class FusedPlanNode(PlanGenerationNode):
+    """
+    合并生成节点 - 一次LLM调用同时返回目标分析和训练计划，省去一次LLM往返
+    
+    写入与GoalAnalysisNode、PlanGenerationNode相同的 analysis_result 和 raw_plan，
+    PlanOptimizationNode 和 API 无需改动
+    """
+    
+    reads = ('user_data', 'data_is_valid')
+    writes = ('analysis_result', 'raw_plan')
+    
+    # 复用目标分析节点的提示词和结果处理
+    _build_prompts = GoalAnalysisNode._build_prompts
+    _finalize_analysis = GoalAnalysisNode._finalize_analysis
+    _get_default_analysis = GoalAnalysisNode._get_default_analysis
+    
+    def prep(self, shared):
+        """读取验证后的用户数据"""
+        return shared.get('user_data', {}), shared.get('data_is_valid', True)
+    
+    def exec(self, inputs):
+        """调用LLM一次生成目标分析和详细训练计划"""
+        user_data, is_valid = inputs
+        logger.info("开始合并生成目标分析和训练计划")
+        
+        exercises, safety_guidelines, system_prompt, user_prompt = self._prepare_fused(user_data)
+        result = call_llm_with_system(
+            system_prompt, user_prompt,
+            timeout=self.time_budget(),
+            response_schema=fused_plan_schema(self._response_schema(user_data))
+        )
+        logger.info("合并生成完成")
+        return self._split_result(result, user_data, is_valid, exercises, safety_guidelines)
+    
+    def exec_fallback(self, inputs, exc):
+        """出错时使用默认分析结果和基础后备计划（不调用LLM）"""
+        user_data, _ = inputs
+        logger.error(f"合并生成出错: {exc}")
+        
+        exercises, safety_guidelines, _, _ = self._prepare_generation(user_data)
+        return {
+            'analysis_result': self._get_default_analysis(),
+            'raw_plan': self._build_result(self._generate_backup_plan(user_data), exercises, safety_guidelines, False)
+        }
+    
+    def _prepare_fused(self, user_data):
+        """在计划生成提示的基础上要求先输出目标分析，用户提示使用目标分析的完整画像"""
+        exercises, safety_guidelines, plan_prompt, _ = self._prepare_generation(user_data)
+        analysis_system_prompt, analysis_user_prompt = self._build_prompts(user_data)
+        analysis_format = analysis_system_prompt[analysis_system_prompt.index('{'):]
+        
+        system_prompt = f"""{plan_prompt}
+
+同时请先评估用户情况。最终返回一个JSON对象，只包含两个字段：
+- "analysis"：目标分析，结构如下：
+{analysis_format}
+- "plan"：上面结构的训练计划
+先写 analysis，再根据分析结果写 plan。"""
+        user_prompt = analysis_user_prompt.replace(
+            "请分析这位用户的情况，给出专业的训练策略建议。",
+            "请先分析这位用户的情况，再生成符合以上JSON格式的训练计划。"
+        )
+        return exercises, safety_guidelines, system_prompt, user_prompt
+    
+    def _split_result(self, result, user_data, is_valid, exercises, safety_guidelines):
+        """拆分为目标分析和原始计划；数据验证未通过时与GoalAnalysisNode一致使用默认分析结果"""
+        if is_valid:
+            analysis = self._finalize_analysis(result['analysis'])
+        else:
+            logger.warning("数据验证未通过，使用默认分析结果")
+            analysis = self._get_default_analysis()
+        return {
+            'analysis_result': analysis,
+            'raw_plan': self._build_result(self._expand_plan(result['plan'], user_data), exercises, safety_guidelines, True)
+        }
+    
+    def post(self, shared, prep_result, exec_result):
+        """写入分析结果和生成的计划到shared store"""
+        shared['analysis_result'] = exec_result['analysis_result']
+        shared['raw_plan'] = exec_result['raw_plan']
+        logger.info("合并生成节点完成，进入计划优化阶段")
+        return "plan_optimization"
+
+class _AsyncNodeAdapter(AsyncNode):
+    """
+    异步节点适配 - 复用同步节点的prep/exec/post逻辑，只有调用LLM的步骤需要重写exec_async
+    """
+    
+    async def prep_async(self, shared):
+        return self.prep(shared)
+    
+    async def exec_async(self, prep_res):
+        return self.exec(prep_res)
+    
+    async def exec_fallback_async(self, prep_res, exc):
+        return self.exec_fallback(prep_res, exc)
+    
+    async def post_async(self, shared, prep_res, exec_res):
+        return self.post(shared, prep_res, exec_res)
+
+class AsyncDataValidationNode(_AsyncNodeAdapter, DataValidationNode):
+    """
+    异步数据验证节点 - 纯计算，直接复用同步验证逻辑
+    """
+
+class AsyncGoalAnalysisNode(_AsyncNodeAdapter, GoalAnalysisNode):
+    """
+    异步目标分析节点 - LLM调用不阻塞事件循环
+    """
+    
+    async def exec_async(self, inputs):
+        """异步调用LLM分析用户的健身水平和需求"""
+        user_data, is_valid = inputs
+        
+        if not is_valid:
+            logger.warning("数据验证未通过，使用默认分析结果")
+            return self._get_default_analysis()
+        
+        logger.info("开始分析用户目标和制定训练策略")
+        
+        system_prompt, user_prompt = self._build_prompts(user_data)
+        analysis = await call_llm_with_system_async(
+            system_prompt, user_prompt,
+            timeout=self.time_budget(),
+            response_schema=ANALYSIS_SCHEMA
+        )
+        return self._finalize_analysis(analysis)
+
+class AsyncPlanGenerationNode(_AsyncNodeAdapter, PlanGenerationNode):
+    """
+    异步计划生成节点 - LLM调用不阻塞事件循环
+    """
+    
+    async def exec_async(self, user_data):
+        """异步调用LLM生成详细训练计划"""
+        logger.info("开始生成详细训练计划")
+        
+        exercises, safety_guidelines, system_prompt, user_prompt = self._prepare_generation(user_data)
+        plan = await call_llm_with_system_async(
+            system_prompt, user_prompt,
+            timeout=self.time_budget(),
+            response_schema=self._response_schema(user_data)
+        )
+        logger.info("训练计划生成完成")
+        return self._build_result(self._expand_plan(plan, user_data), exercises, safety_guidelines, True)
+
+class AsyncPlanOptimizationNode(_AsyncNodeAdapter, PlanOptimizationNode):
+    """
+    异步计划优化节点 - 纯计算，直接复用同步优化逻辑
+    """
+
+class AsyncPlanSkeletonNode(_AsyncNodeAdapter, PlanGenerationNode):
+    """
+    计划骨架节点 - 逐日并发生成的第一步，只生成计划概述、进阶安排和每天的标题与训练重点
+    
+    骨架输出很短，耗时不随训练天数明显增长；每天的具体动作由AsyncDayWorkoutNode并发生成
+    """
+    
+    reads = ('user_data',)
+    writes = ('plan_skeleton',)
+    
+    def __init__(self, compact=None):
+        super().__init__(compact)
+        self.timeout = SKELETON_TIMEOUT
+    
+    async def exec_async(self, user_data):
+        """异步调用LLM生成计划骨架"""
+        logger.info("开始生成计划骨架")
+        
+        days = user_data['schedule']['days_per_week']
+        skeleton = await call_llm_with_system_async(
+            self._skeleton_system_prompt(user_data), self._user_prompt(user_data),
+            timeout=self.time_budget(),
+            response_schema=plan_skeleton_schema(days)
+        )
+        logger.info("计划骨架生成完成")
+        return skeleton
+    
+    def exec_fallback(self, user_data, exc):
+        """骨架生成失败时不再逐日生成，由AsyncDayWorkoutNode使用基础后备计划"""
+        logger.error(f"计划骨架生成出错: {exc}")
+        return None
+    
+    def _skeleton_system_prompt(self, user_data):
+        days = user_data['schedule']['days_per_week']
+        return f"""你是专业健身教练。先为训练计划制定整体框架，必须严格遵守：
+- 每周{days}次训练
+- 每次{user_data['schedule']['time_per_session']}分钟
+- 适合{user_data['basic_info']['experience']}水平
+- 目标：{user_data['goals']['primary_goal']}
+
+daily_workouts 中每天只写标题和训练重点，各天的训练重点要互相配合，具体动作稍后逐日安排。
+必须返回严格的JSON格式，结构如下：
+{{
+  "plan_title": "计划标题",
+  "overview": {{"description": "计划概述", "principles": ["训练原则1", "训练原则2"]}},
+  "weekly_plan": {{"total_days": {days}, "session_duration": {user_data['schedule']['time_per_session']}, "rest_days": "休息日安排"}},
+  "daily_workouts": [{{"day": 1, "title": "训练日标题", "focus": "训练重点"}}],
+  "progression": {{"week1": "第一周要点", "week2": "第二周要点", "week3": "第三周要点", "week4": "第四周要点"}},
+  "nutrition_tips": ["营养建议1", "营养建议2"],
+  "safety_reminders": ["安全提醒1", "安全提醒2"]
+}}
+
+只返回有效的JSON，不要有任何其他文字说明。"""
+    
+    def post(self, shared, prep_result, exec_result):
+        """写入计划骨架到shared store"""
+        shared['plan_skeleton'] = exec_result
+        return "day_workouts"
+
+class AsyncDayWorkoutNode(AsyncParallelBatchNode, PlanGenerationNode):
+    """
+    逐日训练节点 - 按计划骨架为每个训练日并发调用一次LLM，合并为与PlanGenerationNode相同的raw_plan
+    
+    每次调用只输出一天的动作，整体耗时约等于最慢的一天，基本不随每周训练天数增长。
+    单日调用失败时该天使用候选动作组成的基础训练，不影响其他天
+    """
+    
+    reads = ('user_data', 'plan_skeleton')
+    writes = ('raw_plan',)
+    
+    def __init__(self, compact=None):
+        super().__init__(compact)
+        self.timeout = DAY_GENERATION_TIMEOUT
+    
+    async def prep_async(self, shared):
+        """每个训练日一个批处理项；没有骨架时不生成"""
+        user_data = shared.get('user_data', {})
+        skeleton = shared.get('plan_skeleton')
+        if not skeleton:
+            return []
+        return [(user_data, skeleton, day) for day in skeleton['daily_workouts']]
+    
+    async def exec_async(self, item):
+        """异步调用LLM生成一天的训练内容"""
+        user_data, skeleton, day = item
+        logger.info(f"开始生成第{day['day']}天训练")
+        
+        if self.compact:
+            schema = compact_workout_schema(self._candidate_ids(user_data))
+        else:
+            schema = WORKOUT_SCHEMA
+        workout = await call_llm_with_system_async(
+            self._day_system_prompt(user_data, skeleton, day), self._user_prompt(user_data),
+            timeout=self.time_budget(),
+            response_schema=schema
+        )
+        return self._merge_day(self._expand_workout(workout, user_data), day)
+    
+    async def exec_fallback_async(self, item, exc):
+        """单日生成失败时从候选动作中轮换选取，组成基础训练"""
+        user_data, _, day = item
+        logger.error(f"第{day['day']}天训练生成出错: {exc}")
+        
+        exercise_ids = self._candidate_ids(user_data)
+        start = (day['day'] - 1) * 4
+        picked = [exercise_ids[(start + i) % len(exercise_ids)] for i in range(min(4, len(exercise_ids)))]
+        workout = {
+            "day": day['day'],
+            "exercises": [{"id": exercise_id, "sets": 3, "reps": "10-12", "rest": "60秒"} for exercise_id in picked]
+        }
+        return self._merge_day(expand_compact_workout(workout, user_data['basic_info']['experience']), day)
+    
+    def _merge_day(self, workout, day):
+        """日序号、标题和训练重点以骨架为准"""
+        return {**workout, 'day': day['day'], 'title': day['title'], 'focus': day['focus']}
+    
+    def _day_system_prompt(self, user_data, skeleton, day):
+        level = user_data['basic_info']['experience']
+        other_days = "；".join(
+            f"第{other['day']}天 {other['focus']}"
+            for other in skeleton['daily_workouts'] if other['day'] != day['day']
+        ) or "无"
+        header = f"""你是专业健身教练。请为训练计划「{skeleton['plan_title']}」安排其中一天的具体训练：
+- 第{day['day']}天：{day['title']}，训练重点：{day['focus']}
+- 本周其他训练日：{other_days}
+- 每次{user_data['schedule']['time_per_session']}分钟
+- 适合{level}水平
+- 目标：{user_data['goals']['primary_goal']}
+"""
+        if self.compact:
+            return header + f"""
+动作只能从以下目录中选择（格式：ID 名称 | 目标肌群 | 器械）：
+{format_exercise_catalog(self._candidate_exercises(user_data))}
+
+必须返回严格的JSON格式，动作只写ID和训练参数，不要写动作名称、说明或技巧：
+{{"day": {day['day']}, "title": "训练日标题", "focus": "训练重点", "exercises": [{{"id": "动作ID", "sets": 3, "reps": "8-12", "rest": "60秒"}}]}}
+
+只返回有效的JSON，不要有任何其他文字说明。"""
+        return header + f"""
+必须返回严格的JSON格式，结构如下：
+{{
+  "day": {day['day']},
+  "title": "训练日标题",
+  "focus": "训练重点",
+  "warm_up": {{"duration": 5, "exercises": ["热身动作1", "热身动作2"]}},
+  "main_exercises": [
+    {{
+      "name": "动作名称",
+      "target_muscles": ["目标肌群1", "目标肌群2"],
+      "sets": 3,
+      "reps": "8-12",
+      "rest": "60秒",
+      "description": "动作要领",
+      "tips": ["技巧1", "技巧2"]
+    }}
+  ],
+  "cool_down": {{"duration": 5, "exercises": ["拉伸动作1", "拉伸动作2"]}}
+}}
+
+只返回有效的JSON，不要有任何其他文字说明。"""
+    
+    async def post_async(self, shared, prep_res, exec_res):
+        """把骨架和逐日训练合并为原始计划；骨架生成失败时使用基础后备计划"""
+        user_data = shared.get('user_data', {})
+        skeleton = shared.get('plan_skeleton')
+        if not skeleton:
+            shared['raw_plan'] = self.exec_fallback(user_data, RuntimeError("计划骨架生成失败"))
+        else:
+            plan = {**skeleton, 'daily_workouts': exec_res}
+            shared['raw_plan'] = self._build_result(plan, self._candidate_exercises(user_data), get_safety_guidelines(), True)
+            logger.info("逐日训练生成完成")
+        return "plan_optimization"
+
+class AsyncFusedPlanNode(_AsyncNodeAdapter, FusedPlanNode):
+    """
+    异步合并生成节点 - LLM调用不阻塞事件循环
+    """
+    
+    async def exec_async(self, inputs):
+        """异步调用LLM一次生成目标分析和详细训练计划"""
+        user_data, is_valid = inputs
+        logger.info("开始合并生成目标分析和训练计划")
+        
+        exercises, safety_guidelines, system_prompt, user_prompt = self._prepare_fused(user_data)
+        result = await call_llm_with_system_async(
+            system_prompt, user_prompt,
+            timeout=self.time_budget(),
+            response_schema=fused_plan_schema(self._response_schema(user_data))
+        )
+        logger.info("合并生成完成")
+        return self._split_result(result, user_data, is_valid, exercises, safety_guidelines)
@@ -0,0 +1,206 @@
+"""
+异步计划生成任务 - 请求只负责入队并立即返回任务ID，进程内的固定数量worker执行生成流程，
+任务状态、节点进度和结果写入任务存储供客户端轮询
+
+任务存储（默认SQLite）的读写都在线程池中执行，不阻塞事件循环上的其他请求。
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+from utils.job_store import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobStore
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFull(Exception):
+    """等待中的任务数达到上限"""
+
+class PlanJobQueue:
+    """
+    有界的计划生成任务队列和worker池
+
+    Args:
+        run: 异步函数 run(mode, user_data, hooks)，执行一次生成并返回可JSON序列化的结果（PlanResponse字典），
+            结果中 success 为False时任务记为失败
+        store (JobStore): 任务存储
+        workers (int): 同时执行的任务数
+        max_pending (int): 最多等待执行的任务数，超出时 submit 抛出 JobQueueFull
+        ttl (float): 任务在存储中的保留时长（秒）
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str, Dict, Sequence], Awaitable[Dict[str, Any]]],
+        store: JobStore,
+        workers: int = 4,
+        max_pending: int = 100,
+        ttl: float = 3600
+    ):
+        self.run = run
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._running = set()
+        self._stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    def start(self):
+        """在当前事件循环中启动worker"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """停止worker，未完成的任务记为失败"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            job_id, _, _, _ = self._queue.get_nowait()
+            await self._fail(job_id, "服务重启，任务已取消")
+
+    async def submit(self, mode: str, user_data: Dict, node_names: Sequence[str] = ()) -> Dict:
+        """
+        提交生成任务
+
+        用户数据只保存在内存队列中，不写入任务存储。
+
+        Args:
+            mode (str): 生成方式
+            user_data (Dict): 用户数据
+            node_names (Sequence[str]): 流程的节点名，用于计算进度
+
+        Returns:
+            Dict: 新建的任务
+
+        Raises:
+            JobQueueFull: 等待中的任务数达到上限
+        """
+        if self._queue is None:
+            raise RuntimeError("任务队列尚未启动")
+        if self._queue.full():
+            self._stats["rejected"] += 1
+            raise JobQueueFull(f"等待中的任务已达上限（{self.max_pending}）")
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "mode": mode,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"total_nodes": len(node_names), "completed_nodes": [], "running_nodes": []},
+            "result": None,
+            "error": None
+        }
+        # 入队在写入存储之前完成，等待写入期间队列容量不会被其他请求占满；
+        # worker 等到任务写入存储后才开始执行，否则会找不到任务而把它丢弃
+        created = asyncio.Event()
+        self._queue.put_nowait((job["id"], mode, user_data, created))
+        self._stats["submitted"] += 1
+        try:
+            await asyncio.to_thread(self._create, job, now - self.ttl)
+        finally:
+            created.set()
+        return job
+
+    def _create(self, job: Dict, expired_before: float):
+        self.store.purge(expired_before)
+        self.store.create(job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """读取任务，不存在或已过期时返回None"""
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _progress_hook(self, progress: Dict, changed: asyncio.Event):
+        """记录流程的节点开始/结束事件，由 _write_progress 合并写入存储"""
+        def hook(event, node, info):
+            node_name = type(node).__name__
+            if event == "node_start":
+                progress["running_nodes"].append(node_name)
+            elif event == "node_end":
+                if node_name in progress["running_nodes"]:
+                    progress["running_nodes"].remove(node_name)
+                progress["completed_nodes"].append(node_name)
+            else:
+                return
+            changed.set()
+        return hook
+
+    async def _write_progress(self, job_id: str, progress: Dict, changed: asyncio.Event):
+        """进度变化时写入存储；写入期间到达的多个事件合并为下一次写入，任务结束后退出"""
+        while True:
+            await changed.wait()
+            changed.clear()
+            if job_id not in self._running:
+                return
+            snapshot = {key: list(value) if isinstance(value, list) else value for key, value in progress.items()}
+            await asyncio.to_thread(self.store.update, job_id, progress=snapshot)
+
+    async def _worker(self):
+        while True:
+            job_id, mode, user_data, created = await self._queue.get()
+            try:
+                await created.wait()
+                await self._execute(job_id, mode, user_data)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str, mode: str, user_data: Dict):
+        job = await asyncio.to_thread(self.store.update, job_id, status=JOB_RUNNING, started_at=time.time())
+        if job is None:
+            return
+        progress = job["progress"]
+        changed = asyncio.Event()
+        writer = asyncio.create_task(self._write_progress(job_id, progress, changed))
+        self._running.add(job_id)
+        try:
+            result = await self.run(mode, user_data, [self._progress_hook(progress, changed)])
+        except asyncio.CancelledError:
+            await self._finish_progress(job_id, writer, changed)
+            await self._fail(job_id, "服务重启，任务已取消", progress)
+            raise
+        except Exception as e:
+            await self._finish_progress(job_id, writer, changed)
+            logger.error(f"计划生成任务 {job_id} 失败: {e}")
+            await self._fail(job_id, f"服务器内部错误: {str(e)}", progress)
+            return
+        await self._finish_progress(job_id, writer, changed)
+
+        status = JOB_SUCCEEDED if result.get("success") else JOB_FAILED
+        self._stats[status] += 1
+        await asyncio.to_thread(
+            self.store.update, job_id,
+            status=status, finished_at=time.time(), progress=progress, result=result, error=result.get("error")
+        )
+
+    async def _finish_progress(self, job_id: str, writer: asyncio.Task, changed: asyncio.Event):
+        """等待进行中的进度写入完成后再写最终状态，避免旧的进度覆盖最终结果"""
+        self._running.discard(job_id)
+        changed.set()
+        await asyncio.gather(writer, return_exceptions=True)
+
+    async def _fail(self, job_id: str, error: str, progress: Optional[Dict] = None):
+        self._stats["failed"] += 1
+        fields = {"status": JOB_FAILED, "finished_at": time.time(), "error": error}
+        if progress is not None:
+            fields["progress"] = progress
+        await asyncio.to_thread(self.store.update, job_id, **fields)
+
+    async def stats(self) -> Dict:
+        """提交、拒绝、成功、失败计数，以及等待和执行中的任务数"""
+        return {
+            **self._stats,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "workers": len(self._tasks),
+            "stored": await asyncio.to_thread(self.store.stats)
+        }
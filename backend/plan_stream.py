@@ -0,0 +1,187 @@
+"""
+流式计划生成 - 边生成边推送概述、每日训练和安全提醒，缩短首字节时间
+"""
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from macore import AsyncDagFlow, DeadlineExceeded
+from nodes import (
+    AsyncDataValidationNode,
+    AsyncGoalAnalysisNode,
+    AsyncPlanOptimizationNode,
+    PlanGenerationNode,
+    PrecomputedPlanNode,
+    GENERATION_TIMEOUT
+)
+from flow import FLOW_RETRY_BUDGET, get_fitness_flow
+from utils.call_llm import stream_llm_with_system_async
+from utils.json_stream import IncrementalJSONParser
+from utils.structured_output import check_output
+
+logger = logging.getLogger(__name__)
+
+# 计划开头的概述类字段，解析完成后立即推送
+OVERVIEW_FIELDS = ('plan_title', 'overview', 'weekly_plan')
+
+# 流式生成前后的步骤复用普通节点，各自编译为只含一个节点的流程
+_validation_flow = AsyncDagFlow([AsyncDataValidationNode()]).compile()
+_analysis_flow = AsyncDagFlow([AsyncGoalAnalysisNode()]).compile(retry_budget=FLOW_RETRY_BUDGET)
+_optimization_flow = AsyncDagFlow([AsyncPlanOptimizationNode()]).compile()
+# 预览计划不调用LLM，优先读取预计算计划表，未命中时按规则生成，验证后毫秒级推送
+_preview_flow = AsyncDagFlow([PrecomputedPlanNode(), AsyncPlanOptimizationNode()]).compile()
+_generation_node = PlanGenerationNode()
+
+def _emit_hooks(hooks, event, node, **info):
+    for hook in hooks:
+        hook(event, node, info)
+
+async def _stream_raw_plan(shared, deadline, hooks):
+    """
+    流式生成原始计划，逐个产出 (事件名, 数据)
+    
+    LLM输出过程中每完成一个概述字段或一天的训练就产出一次，结束后把生成结果写入shared['raw_plan']。
+    出错或超时时降级为基础后备计划。
+    """
+    user_data = shared['user_data']
+    exercises, safety_guidelines, system_prompt, user_prompt = _generation_node._prepare_generation(user_data)
+    schema = _generation_node._response_schema(user_data)
+    
+    stream_deadline = time.monotonic() + GENERATION_TIMEOUT
+    if deadline is not None:
+        stream_deadline = min(stream_deadline, deadline)
+    
+    parser = IncrementalJSONParser(watch_arrays=('daily_workouts',))
+    try:
+        timeout = stream_deadline - time.monotonic()
+        if timeout <= 0:
+            raise DeadlineExceeded("计划生成时间预算已耗尽")
+        deltas = stream_llm_with_system_async(system_prompt, user_prompt, timeout=timeout, response_schema=schema)
+        async with aclosing(deltas):
+            async for delta in deltas:
+                for event in parser.feed(delta):
+                    if event[0] == 'item':
+                        _, _, index, workout = event
+                        yield 'day', {'index': index, 'workout': _generation_node._expand_workout(workout, user_data)}
+                    elif event[1] in OVERVIEW_FIELDS:
+                        yield 'overview', {'field': event[1], 'value': event[2]}
+                if time.monotonic() > stream_deadline:
+                    raise DeadlineExceeded("计划生成超时")
+        # 通过校验的计划直接作为结构化数据，否则交给格式化时解析文本
+        plan, errors = check_output(parser.text, schema)
+        if errors:
+            logger.warning(f"流式计划未通过结构校验: {errors[:3]}")
+            plan = parser.text
+        plan = _generation_node._expand_plan(plan, user_data)
+        shared['raw_plan'] = _generation_node._build_result(plan, exercises, safety_guidelines, True)
+    except Exception as e:
+        logger.error(f"流式计划生成出错: {e}")
+        _emit_hooks(hooks, "fallback", _generation_node, error=e)
+        shared['raw_plan'] = _generation_node.exec_fallback(user_data, e)
+        yield 'fallback', {'plan_text': shared['raw_plan']['raw_plan_text']}
+
+async def _generate_streaming(shared, emit, hooks, deadline):
+    """
+    standard 方式的流式生成：目标分析在后台并发执行，计划生成边解析边通过 emit 推送事件，
+    最后等待分析结果完成计划优化
+    
+    Returns:
+        Dict: 完成优化后的共享数据
+    """
+    # 目标分析只写 analysis_result，与流式生成互不影响
+    analysis_task = asyncio.create_task(_analysis_flow.run_async(shared, hooks=hooks, deadline=deadline))
+    try:
+        async for event in _stream_raw_plan(shared, deadline, hooks):
+            emit(event)
+        await analysis_task
+    finally:
+        if not analysis_task.done():
+            analysis_task.cancel()
+    
+    await _optimization_flow.run_async(shared, hooks=hooks, deadline=deadline)
+    return shared
+
+async def stream_fitness_plan(user_data_dict, hooks=(), deadline=None, mode="standard", singleflight=None, key=None):
+    """
+    流式生成个性化训练计划
+    
+    数据验证后先推送预计算或按规则生成的预览计划，用户无需等待LLM即可看到可用的计划；
+    standard 方式随后目标分析在后台并发执行，计划生成通过流式LLM调用边解析边产出，
+    最后等待分析结果完成计划优化，complete 事件中的个性化计划替换预览计划。
+    其他生成方式不支持逐日推送，运行对应的流程后直接推送 complete。
+    
+    传入 singleflight 时，预览之后的生成在其中以 key 合并：相同请求正在生成时（包括非流式接口发起的生成）
+    不再重复调用LLM，等待它的结果后推送 complete，此时不推送 overview / day 事件。
+    生成在独立的任务中进行，客户端断开连接不会中断其他等待者的生成。
+    
+    Args:
+        user_data_dict (Dict): 用户输入数据
+        hooks: 流程埋点钩子
+        deadline (float): time.monotonic() 表示的截止时间
+        mode (str): 计划生成方式，同 get_fitness_flow
+        singleflight (SingleFlight): 请求合并器，为空时不合并
+        key (str): 请求合并的标识，与非流式接口使用相同的标识
+    
+    Yields:
+        Tuple[str, Dict]: (事件名, 数据)，事件依次为 preview / overview / day / fallback（可选）/ safety_notes / complete
+    """
+    shared = {
+        "user_data": user_data_dict,
+        "validation_errors": [],
+        "data_is_valid": False,
+        "analysis_result": {},
+        "raw_plan": {},
+        "final_plan": {},
+        "generation_completed": False
+    }
+    
+    await _validation_flow.run_async(shared, hooks=hooks, deadline=deadline)
+    
+    # 预览使用独立的共享数据，不影响后续LLM生成和优化
+    preview = {
+        "user_data": shared['user_data'],
+        "data_is_valid": shared['data_is_valid'],
+        "analysis_result": {},
+        "raw_plan": {},
+        "final_plan": {}
+    }
+    await _preview_flow.run_async(preview, hooks=hooks)
+    yield 'preview', {
+        "plan": preview['final_plan']['formatted_plan'],
+        "generation_info": {
+            "preview": True,
+            "validation_errors": shared.get('validation_errors', [])
+        }
+    }
+    
+    events = asyncio.Queue()
+    if mode == "standard":
+        async def generate():
+            return await _generate_streaming(shared, events.put_nowait, hooks, deadline)
+    else:
+        flow = get_fitness_flow(mode)
+        
+        async def generate():
+            await flow.run_async(shared, hooks=hooks, deadline=deadline)
+            return shared
+    
+    task = asyncio.ensure_future(singleflight.do(key, generate) if singleflight is not None else generate())
+    # 生成结束（包括合并到其他请求时）后用 None 结束事件队列
+    task.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        result = await task
+    finally:
+        task.cancel()
+    
+    final_plan = result['final_plan']
+    yield 'safety_notes', {'safety_notes': final_plan['formatted_plan'].get('safety_notes', [])}
+    yield 'complete', {
+        "plan": final_plan['formatted_plan'],
+        "generation_info": {
+            "optimization_success": final_plan.get('optimization_success', True),
+            "validation_errors": result.get('validation_errors', []),
+            "generation_mode": mode
+        }
+    }
@@ -0,0 +1,9 @@
+"""
+测试配置 - 把 backend 目录加入导入路径，在仓库任意位置运行 pytest 都能导入后端模块
+
+运行: cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,146 @@
+"""缓存预热：直方图只记录匿名代表性用户、按次数取前top_n个画像、每日预算、重复预热间隔和持久化"""
+import asyncio
+import json
+
+import pytest
+
+from utils import cache_warmer
+from utils.cache_warmer import CacheWarmer
+from utils.profile_buckets import canonicalize_profile
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_warmer, "time", clock)
+    return clock
+
+def run(coro):
+    return asyncio.run(coro)
+
+def _user(days=3, goal="muscle_gain", age=25, weight=70, injuries=()):
+    return {
+        "basic_info": {"age": age, "gender": "男", "height": 175, "weight": weight, "experience": "beginner"},
+        "goals": {"primary_goal": goal, "target_areas": ["chest"]},
+        "schedule": {"days_per_week": days, "time_per_session": 45},
+        "limitations": {"injuries": list(injuries), "restrictions": []}
+    }
+
+class Recorder:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    async def __call__(self, mode, user_data):
+        self.calls.append((mode, user_data["schedule"]["days_per_week"]))
+        if user_data["schedule"]["days_per_week"] in self.fail:
+            raise RuntimeError("LLM down")
+
+def _warmer(generate, **kwargs):
+    settings = {"top_n": 2, "concurrency": 2, "budget": 10}
+    settings.update(kwargs)
+    return CacheWarmer(generate, **settings)
+
+def test_histogram_stores_anonymous_representatives(clock):
+    warmer = _warmer(Recorder())
+    warmer.record("standard", _user(age=27, weight=71.3))
+    warmer.record("standard", _user(age=29, weight=70.2))
+    warmer.record("standard", _user(injuries=["右膝旧伤"]))
+
+    [entry] = warmer.top_entries()
+    assert entry["count"] == 2
+    assert entry["user_data"]["basic_info"]["age"] != 27 and entry["user_data"]["basic_info"]["weight"] != 71.3
+    assert canonicalize_profile(entry["user_data"]) == canonicalize_profile(_user(age=27, weight=71.3))
+    assert warmer.stats()["recorded"] == 2 and warmer.stats()["skipped"] == 1
+
+def test_modes_are_counted_separately(clock):
+    warmer = _warmer(Recorder())
+    warmer.record("standard", _user())
+    warmer.record("fused", _user())
+    assert sorted(entry["mode"] for entry in warmer.top_entries()) == ["fused", "standard"]
+
+def test_warm_generates_the_top_n_profiles(clock):
+    generate = Recorder()
+    warmer = _warmer(generate, top_n=2)
+    for days, count in ((2, 1), (3, 5), (4, 3)):
+        for _ in range(count):
+            warmer.record("standard", _user(days=days))
+
+    assert [entry["user_data"]["schedule"]["days_per_week"] for entry in warmer.top_entries()] == [3, 4]
+    assert run(warmer.warm()) == 2
+    assert sorted(generate.calls) == [("standard", 3), ("standard", 4)]
+    assert warmer.stats()["warm_profiles"] == 2
+
+def test_warmed_profiles_are_skipped_until_rewarm_after(clock):
+    generate = Recorder()
+    warmer = _warmer(generate, top_n=1, rewarm_after=100)
+    warmer.record("standard", _user())
+    assert run(warmer.warm()) == 1
+    clock.now += 50
+    assert run(warmer.warm()) == 0
+    clock.now += 50
+    assert run(warmer.warm()) == 1
+    assert len(generate.calls) == 2
+
+def test_daily_budget_caps_generations(clock):
+    generate = Recorder()
+    warmer = _warmer(generate, top_n=5, budget=3, budget_window=86400, rewarm_after=10)
+    for days in range(2, 7):
+        warmer.record("standard", _user(days=days))
+
+    assert run(warmer.warm()) == 3
+    assert warmer.remaining_budget() == 0 and warmer.stats()["budget_exhausted"] == 1
+    clock.now += 3600
+    assert run(warmer.warm()) == 0
+    # 预算窗口过去后重新可用
+    clock.now += 86400
+    assert warmer.remaining_budget() == 3
+    assert run(warmer.warm()) == 3
+    assert len(generate.calls) == 6
+
+def test_failed_generations_spend_budget_but_are_retried(clock):
+    generate = Recorder(fail={3})
+    warmer = _warmer(generate, top_n=2, budget=10)
+    warmer.record("standard", _user(days=3))
+    warmer.record("standard", _user(days=4))
+    assert run(warmer.warm()) == 1
+    assert warmer.stats()["warm_errors"] == 1 and warmer.remaining_budget() == 8
+    generate.fail.clear()
+    assert run(warmer.warm()) == 1
+    assert generate.calls.count(("standard", 3)) == 2
+
+def test_histogram_is_bounded(clock):
+    warmer = _warmer(Recorder(), max_entries=2)
+    warmer.record("standard", _user(days=2))
+    warmer.record("standard", _user(days=3))
+    warmer.record("standard", _user(days=3))
+    warmer.record("standard", _user(days=4))
+    counts = sorted((entry["user_data"]["schedule"]["days_per_week"], entry["count"]) for entry in warmer.top_entries(10))
+    assert counts == [(3, 2), (4, 1)]
+
+def test_histogram_persists_across_restarts(clock, tmp_path):
+    path = str(tmp_path / "warmer.json")
+    warmer = _warmer(Recorder(), state_path=path)
+    warmer.record("standard", _user(age=27, weight=71.3))
+    warmer.save()
+    saved = json.load(open(path, encoding="utf-8"))
+    assert [entry["user_data"]["basic_info"]["weight"] for entry in saved["entries"].values()] == [75.0]
+
+    restored = _warmer(Recorder(), state_path=path)
+    assert restored.top_entries() == warmer.top_entries()
+    # 预热记录只在内存中，重启后需要重新预热
+    assert restored.stats()["warm_profiles"] == 0
+
+def test_corrupt_state_file_starts_empty(clock, tmp_path):
+    path = tmp_path / "warmer.json"
+    path.write_text("{broken", encoding="utf-8")
+    assert _warmer(Recorder(), state_path=str(path)).top_entries() == []
@@ -0,0 +1,152 @@
+"""编译后的流程：DAG依赖顺序、编译结果不可变、并发运行之间的参数隔离"""
+import asyncio
+import threading
+
+import pytest
+
+from macore import AsyncDagFlow, AsyncNode, Flow, Node, current_run
+
+def run(coro):
+    return asyncio.run(coro)
+
+class Step(AsyncNode):
+    """记录开始和结束顺序的DAG节点"""
+
+    def __init__(self, name, log, reads=(), writes=(), delay=0.01):
+        super().__init__()
+        self.name, self.log, self.reads, self.writes, self.delay = name, log, reads, writes, delay
+
+    async def exec_async(self, prep_res):
+        self.log.append(f"{self.name}:start")
+        await asyncio.sleep(self.delay)
+        self.log.append(f"{self.name}:end")
+        return self.name
+
+    async def post_async(self, shared, prep_res, exec_res):
+        for key in self.writes:
+            shared[key] = exec_res
+        return exec_res
+
+def _dag(log):
+    return AsyncDagFlow([
+        Step("validate", log, reads=("user_data",), writes=("user_data",)),
+        Step("analysis", log, reads=("user_data",), writes=("analysis",), delay=0.03),
+        Step("plan", log, reads=("user_data",), writes=("plan",)),
+        Step("optimize", log, reads=("analysis", "plan"), writes=("final",))
+    ])
+
+def test_dag_dependencies_follow_reads_and_writes():
+    flow = _dag([])
+    validate, analysis, plan, optimize = flow.nodes
+    deps = flow.dependencies()
+    assert deps[validate] == []
+    assert deps[analysis] == [validate]
+    assert deps[plan] == [validate]
+    assert deps[optimize] == [analysis, plan]
+
+def test_dag_runs_independent_nodes_concurrently_and_waits_for_dependencies():
+    for compiled in (False, True):
+        log = []
+        flow = _dag(log)
+        runner = flow.compile() if compiled else flow
+        shared = {"user_data": {}}
+        result = run(runner.run_async(shared))
+
+        assert result == "optimize" and shared["final"] == "optimize"
+        assert log[:2] == ["validate:start", "validate:end"]
+        # 目标分析和计划生成在数据验证之后同时开始，计划优化等二者都结束
+        assert set(log[2:4]) == {"analysis:start", "plan:start"}
+        assert log.index("optimize:start") > max(log.index("analysis:end"), log.index("plan:end"))
+
+def test_dag_failure_cancels_the_remaining_nodes():
+    log = []
+
+    class Boom(Step):
+        async def exec_async(self, prep_res):
+            raise RuntimeError("boom")
+
+    flow = AsyncDagFlow([
+        Boom("validate", log, writes=("user_data",)),
+        Step("plan", log, reads=("user_data",), writes=("plan",))
+    ]).compile()
+    with pytest.raises(RuntimeError, match="boom"):
+        run(flow.run_async({}))
+    assert "plan:start" not in log
+
+def test_dag_rejects_duplicate_nodes():
+    flow = AsyncDagFlow()
+    node = flow.add(Step("a", []))
+    with pytest.raises(ValueError):
+        flow.add(node)
+
+def test_compiled_flow_is_immutable_and_snapshots_transitions():
+    first, second, third = Node(), Node(), Node()
+    first - "next" >> second
+    flow = Flow(start=first)
+    compiled = flow.compile()
+
+    with pytest.raises(AttributeError):
+        compiled.start_node = second
+    with pytest.raises(TypeError):
+        compiled.transitions[first]["next"] = third
+    # 编译后修改原始图不影响编译结果
+    first - "other" >> third
+    assert dict(compiled.transitions[first]) == {"next": second}
+    assert third not in compiled.transitions
+
+class ParamNode(Node):
+    """把运行参数写入共享存储，并记录运行时是否被复制"""
+
+    instances = set()
+
+    def prep(self, shared):
+        ParamNode.instances.add(id(self))
+        return current_run().params["user"]
+
+    def exec(self, prep_res):
+        return prep_res
+
+    def post(self, shared, prep_res, exec_res):
+        shared["user"] = exec_res
+
+def test_compiled_runs_isolate_params_across_threads():
+    ParamNode.instances = set()
+    node = ParamNode()
+    compiled = Flow(start=node).compile()
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def worker(i):
+        barrier.wait()
+        shared = {}
+        compiled.run(shared, params={"user": i})
+        results[i] = shared["user"]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i for i in range(8)}
+    # 节点不被复制，运行状态只保存在RunContext中
+    assert ParamNode.instances == {id(node)}
+    assert node.params == {}
+    assert current_run() is None
+
+def test_compiled_runs_isolate_params_across_tasks():
+    seen = []
+
+    class Slow(AsyncNode):
+        async def exec_async(self, prep_res):
+            user = current_run().params["user"]
+            await asyncio.sleep(0.01)
+            seen.append((user, current_run().params["user"]))
+
+    compiled = AsyncDagFlow([Slow()]).compile()
+
+    async def main():
+        await asyncio.gather(*(compiled.run_async({}, params={"user": i}) for i in range(5)))
+
+    run(main())
+    assert sorted(seen) == [(i, i) for i in range(5)]
@@ -0,0 +1,129 @@
+"""请求截止时间：time_budget 计算、超时取消、DeadlineExceeded 交给 exec_fallback、重试不越过截止时间，以及同步节点把预算交给阻塞调用"""
+import asyncio
+import time
+
+from macore import AsyncDagFlow, AsyncNode, DeadlineExceeded, Flow, Node, RetryPolicy, current_run
+
+def run(coro):
+    return asyncio.run(coro)
+
+class Sleeper(AsyncNode):
+    """执行sleep秒，记录每次尝试时的预算和最终交给 exec_fallback 的异常"""
+
+    def __init__(self, sleep, **kwargs):
+        super().__init__(**kwargs)
+        self.sleep, self.budgets, self.errors, self.calls = sleep, [], [], 0
+
+    async def exec_async(self, prep_res):
+        self.calls += 1
+        self.budgets.append(self.time_budget())
+        await asyncio.sleep(self.sleep)
+        return "ok"
+
+    async def exec_fallback_async(self, prep_res, exc):
+        self.errors.append(exc)
+        return "fallback"
+
+    async def post_async(self, shared, prep_res, exec_res):
+        return exec_res
+
+def _recorder(events):
+    def hook(event, node, info):
+        if event in ("retry", "fallback", "deadline_exceeded"):
+            events.append(event)
+    return hook
+
+def _run(node, deadline=None, hooks=()):
+    return run(AsyncDagFlow([node]).compile(hooks=hooks).run_async({}, deadline=deadline))
+
+def test_time_budget_without_timeout_or_run_is_none():
+    node = Sleeper(0)
+    assert node.time_budget() is None
+    assert Sleeper(0, timeout=5).time_budget() == 5
+    assert _run(node, deadline=time.monotonic() + 10) == "ok"
+    assert node.budgets == [None]
+
+def test_time_budget_is_the_smaller_of_timeout_and_deadline():
+    short = Sleeper(0, timeout=0.5)
+    assert _run(short, deadline=time.monotonic() + 10) == "ok"
+    assert short.budgets == [0.5]
+
+    long = Sleeper(0, timeout=10)
+    assert _run(long, deadline=time.monotonic() + 0.5) == "ok"
+    assert 0.4 < long.budgets[0] <= 0.5
+
+def test_run_context_exposes_the_remaining_time():
+    remaining = []
+
+    class Probe(Sleeper):
+        async def exec_async(self, prep_res):
+            remaining.append(current_run().remaining())
+            return "ok"
+
+    _run(Probe(0), deadline=time.monotonic() + 1)
+    assert 0.9 < remaining[0] <= 1
+
+def test_slow_attempt_is_cancelled_at_the_timeout():
+    node = Sleeper(1, timeout=0.05)
+    started = time.monotonic()
+    assert _run(node) == "fallback"
+    assert time.monotonic() - started < 0.5
+    assert isinstance(node.errors[0], asyncio.TimeoutError)
+
+def test_expired_deadline_hands_deadline_exceeded_to_fallback():
+    events = []
+    node = Sleeper(0, timeout=10)
+    assert _run(node, deadline=time.monotonic() - 1, hooks=[_recorder(events)]) == "fallback"
+    assert node.calls == 0
+    assert isinstance(node.errors[0], DeadlineExceeded) and isinstance(node.errors[0], TimeoutError)
+    assert events == ["deadline_exceeded"]
+
+def test_nodes_without_timeout_run_past_the_deadline():
+    node = Sleeper(0)
+    assert _run(node, deadline=time.monotonic() - 1) == "ok"
+
+def test_retry_does_not_sleep_past_the_budget():
+    events = []
+    node = Sleeper(1, timeout=0.1, retry=RetryPolicy(max_attempts=3, base_delay=5, jitter=False))
+    started = time.monotonic()
+    assert _run(node, hooks=[_recorder(events)]) == "fallback"
+    assert time.monotonic() - started < 0.5
+    assert node.calls == 1
+    assert events == ["deadline_exceeded", "fallback"]
+
+def test_retries_stop_once_the_deadline_passes():
+    node = Sleeper(1, timeout=10, retry=RetryPolicy(max_attempts=10, base_delay=0.01, jitter=False))
+    started = time.monotonic()
+    assert _run(node, deadline=time.monotonic() + 0.1) == "fallback"
+    assert time.monotonic() - started < 0.5
+    assert node.calls >= 1
+    assert isinstance(node.errors[0], (asyncio.TimeoutError, DeadlineExceeded))
+
+class Blocking(Node):
+    """同步节点无法被取消，把剩余预算作为阻塞调用的超时，超时后抛出 TimeoutError"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.timeouts = []
+
+    def exec(self, prep_res):
+        budget = self.time_budget()
+        self.timeouts.append(budget)
+        time.sleep(budget)
+        raise TimeoutError("blocking call timed out")
+
+    def exec_fallback(self, prep_res, exc):
+        return type(exc).__name__
+
+    def post(self, shared, prep_res, exec_res):
+        shared["result"] = exec_res
+
+def test_sync_node_hands_its_budget_to_blocking_calls():
+    node = Blocking(timeout=10, retry=RetryPolicy(max_attempts=3))
+    shared = {}
+    started = time.monotonic()
+    Flow(start=node).run(shared, deadline=time.monotonic() + 0.05)
+    assert time.monotonic() - started < 0.5
+    assert 0.04 < node.timeouts[0] <= 0.05
+    # 阻塞调用超时后预算已耗尽，不再重试
+    assert shared["result"] == "TimeoutError" and len(node.timeouts) == 1
@@ -0,0 +1,87 @@
+"""动作目录：单字段和组合查询的索引、多值并集、禁忌标签排除、查询缓存、旧版数据库格式和数据文件加载"""
+import pytest
+
+from utils import exercise_catalog
+from utils.exercise_catalog import ExerciseCatalog, get_exercise_catalog
+
+EXERCISES = [
+    {"id": "squat", "area": "legs", "level": "beginner", "name": "深蹲", "difficulty": "初级", "equipment": "无器械", "primary_muscles": ["股四头肌", "臀大肌"], "stresses": ["knee"]},
+    {"id": "lunge", "area": "legs", "level": "intermediate", "name": "弓步蹲", "difficulty": "中级", "equipment": "哑铃", "primary_muscles": ["股四头肌"], "stresses": ["knee", "high_impact"]},
+    {"id": "pushup", "area": "chest", "level": "beginner", "name": "俯卧撑", "difficulty": "初级", "equipment": "无器械", "primary_muscles": ["胸大肌", "肱三头肌"], "stresses": ["wrist"]},
+    {"id": "bench", "area": "chest", "level": "advanced", "name": "卧推", "difficulty": "高级", "equipment": "杠铃", "primary_muscles": ["胸大肌"], "stresses": ["shoulder", "valsalva"]},
+    {"id": "dip", "area": "arms", "level": "intermediate", "name": "双杠臂屈伸", "difficulty": "中级", "equipment": "双杠", "primary_muscles": ["肱三头肌"], "stresses": ["shoulder", "elbow"]}
+]
+
+@pytest.fixture
+def catalog():
+    return ExerciseCatalog(EXERCISES)
+
+def _ids(exercises):
+    return [exercise["id"] for exercise in exercises]
+
+def test_lookup_by_id_and_catalog_order(catalog):
+    assert len(catalog) == 5
+    assert _ids(catalog) == ["squat", "lunge", "pushup", "bench", "dip"]
+    assert catalog.get("bench")["name"] == "卧推"
+    assert catalog.get("missing") is None
+    assert catalog.areas == ("legs", "chest", "arms")
+    assert catalog.values("equipment") == ("无器械", "哑铃", "杠铃", "双杠")
+
+def test_single_field_queries_use_the_prebuilt_index(catalog):
+    legs = catalog.find(area="legs")
+    assert _ids(legs) == ["squat", "lunge"]
+    assert catalog.find(area="legs") is legs
+    assert _ids(catalog.find(muscle="肱三头肌")) == ["pushup", "dip"]
+    assert catalog.find(area="back") == ()
+    assert catalog.find() is catalog.find(area=None)
+    assert len(catalog.find()) == 5
+
+def test_combined_queries_intersect_fields_and_union_values(catalog):
+    assert _ids(catalog.find(area="chest", difficulty="初级")) == ["pushup"]
+    assert _ids(catalog.find(area=["legs", "chest"], difficulty=["初级", "中级"])) == ["squat", "lunge", "pushup"]
+    assert _ids(catalog.find(equipment="无器械", muscle=["胸大肌", "股四头肌"])) == ["squat", "pushup"]
+    assert catalog.find(area="arms", level="beginner") == ()
+
+def test_avoid_excludes_exercises_with_any_contraindication(catalog):
+    assert _ids(catalog.find(avoid=["knee"])) == ["pushup", "bench", "dip"]
+    assert _ids(catalog.find(area="chest", avoid={"shoulder", "wrist"})) == []
+    assert _ids(catalog.find(area=["legs", "arms"], avoid="high_impact")) == ["squat", "dip"]
+    assert _ids(catalog.find(stress="shoulder")) == ["bench", "dip"]
+    assert catalog.find(avoid=["knee"]) is catalog.find(avoid=("knee", "knee"))
+
+def test_combined_queries_are_cached(catalog):
+    first = catalog.find(area=["legs", "chest"], difficulty="初级")
+    # 条件的书写顺序不影响缓存键
+    assert catalog.find(difficulty="初级", area=["legs", "chest"]) is first
+    assert len(catalog._query_cache) == 1
+
+def test_query_cache_is_bounded(catalog, monkeypatch):
+    monkeypatch.setattr(exercise_catalog, "QUERY_CACHE_SIZE", 2)
+    catalog.find(area="legs", difficulty="初级")
+    catalog.find(area="legs", difficulty="中级")
+    catalog.find(area="chest", difficulty="初级")
+    assert len(catalog._query_cache) == 1
+
+def test_unknown_fields_and_duplicate_ids_are_rejected(catalog):
+    with pytest.raises(TypeError):
+        catalog.find(colour="red")
+    with pytest.raises(ValueError):
+        ExerciseCatalog(EXERCISES + [EXERCISES[0]])
+
+def test_records_are_shared_and_muscles_frozen(catalog):
+    assert catalog.find(area="legs")[0] is catalog.get("squat")
+    assert catalog.get("squat")["primary_muscles"] == ("股四头肌", "臀大肌")
+    assert catalog.get("squat")["stresses"] == ("knee",)
+    assert EXERCISES[0]["primary_muscles"] == ["股四头肌", "臀大肌"]
+
+def test_as_database_groups_by_area_and_level(catalog):
+    database = catalog.as_database()
+    assert _ids(database["legs"]["beginner"]) == ["squat"]
+    assert _ids(database["chest"]["advanced"]) == ["bench"]
+    assert catalog.as_database() is database
+
+def test_bundled_data_file_loads():
+    catalog = get_exercise_catalog()
+    assert len(catalog) > 0
+    assert all(catalog.find(area=area) for area in catalog.areas)
+    assert catalog.get(next(iter(catalog))["id"]) is next(iter(catalog))
@@ -0,0 +1,95 @@
+"""动作评分：特征矩阵打分、批量评分与逐个评分一致、top_k / rank_areas 排除禁忌和难度不符的动作"""
+import numpy as np
+import pytest
+
+from utils.exercise_catalog import ExerciseCatalog, get_exercise_catalog
+from utils.exercise_scoring import EXCLUDED_SCORE, GOAL_COMPOUND_WEIGHT, ExerciseScorer
+
+EXERCISES = [
+    {"id": "squat", "area": "legs", "level": "beginner", "name": "深蹲", "difficulty": "初级", "equipment": "无器械", "primary_muscles": ["股四头肌", "臀大肌"], "stresses": ["knee"]},
+    {"id": "jump", "area": "legs", "level": "intermediate", "name": "跳箱", "difficulty": "中级", "equipment": "跳箱", "primary_muscles": ["股四头肌"], "stresses": ["knee", "high_impact"]},
+    {"id": "bridge", "area": "legs", "level": "beginner", "name": "臀桥", "difficulty": "初级", "equipment": "无器械", "primary_muscles": ["臀大肌"], "stresses": []},
+    {"id": "pushup", "area": "chest", "level": "beginner", "name": "俯卧撑", "difficulty": "初级", "equipment": "无器械", "primary_muscles": ["胸大肌", "肱三头肌"], "stresses": ["wrist"]},
+    {"id": "bench", "area": "chest", "level": "advanced", "name": "卧推", "difficulty": "高级", "equipment": "杠铃", "primary_muscles": ["胸大肌", "肱三头肌", "三角肌前束"], "stresses": ["shoulder", "valsalva"]},
+    {"id": "curl", "area": "arms", "level": "beginner", "name": "哑铃弯举", "difficulty": "初级", "equipment": "哑铃", "primary_muscles": ["肱二头肌"], "stresses": ["elbow"]},
+    {"id": "dip", "area": "arms", "level": "intermediate", "name": "双杠臂屈伸", "difficulty": "中级", "equipment": "双杠", "primary_muscles": ["肱三头肌"], "stresses": ["shoulder", "elbow"]}
+]
+
+@pytest.fixture
+def scorer():
+    return ExerciseScorer(ExerciseCatalog(EXERCISES))
+
+def _user(goal="muscle_gain", level="beginner", target_areas=(), injuries=()):
+    return {
+        "basic_info": {"experience": level},
+        "goals": {"primary_goal": goal, "target_areas": list(target_areas)},
+        "limitations": {"injuries": list(injuries), "restrictions": []}
+    }
+
+def _ids(scorer, rows):
+    return [scorer.exercises[i]["id"] for i in rows]
+
+def test_off_level_difficulties_are_excluded(scorer):
+    beginner = scorer.score(_user(level="beginner"))
+    assert _ids(scorer, np.flatnonzero(beginner < EXCLUDED_SCORE / 2)) == ["jump", "bench", "dip"]
+    advanced = scorer.score(_user(level="advanced"))
+    assert (advanced > EXCLUDED_SCORE / 2).all()
+
+def test_contraindicated_exercises_are_excluded(scorer):
+    scores = scorer.score(_user(level="advanced", injuries=["膝盖问题"]))
+    excluded = _ids(scorer, np.flatnonzero(scores < EXCLUDED_SCORE / 2))
+    assert excluded == ["squat", "jump"]
+
+def test_target_areas_and_compound_movements_score_higher(scorer):
+    plain = scorer.score(_user(level="advanced"))
+    targeted = scorer.score(_user(level="advanced", target_areas=["Arms"]))
+    curl, bench = scorer.position("curl"), scorer.position("bench")
+    assert targeted[curl] - plain[curl] == pytest.approx(0.5)
+    assert targeted[bench] == pytest.approx(plain[bench])
+    # 主要肌群越多的复合动作得分越高
+    assert plain[scorer.position("squat")] - plain[scorer.position("bridge")] == pytest.approx(GOAL_COMPOUND_WEIGHT["muscle_gain"])
+
+def test_batch_scores_match_single_scores(scorer):
+    users = [_user(), _user("weight_loss", "intermediate", ["legs"]), _user("strength", "advanced", injuries=["右肩旧伤"])]
+    batch = scorer.score_batch(users)
+    assert batch.shape == (3, len(EXERCISES))
+    for row, user in zip(batch, users):
+        np.testing.assert_allclose(row, scorer.score(user), rtol=1e-5)
+
+def test_top_k_orders_by_score_and_drops_excluded(scorer):
+    scores = scorer.score(_user(level="beginner"))
+    top = scorer.top_k(scores, 10)
+    assert len(top) == 4
+    assert list(scores[top]) == sorted(scores[top], reverse=True)
+    assert set(_ids(scorer, top)) == {"squat", "bridge", "pushup", "curl"}
+    assert len(scorer.top_k(scores, 2)) == 2
+    assert _ids(scorer, scorer.top_k(scores, 2)) == _ids(scorer, top[:2])
+    assert len(scorer.top_k(scores, 0)) == 0
+
+def test_top_k_limits_areas_and_handles_batches(scorer):
+    users = [_user(level="beginner"), _user(level="advanced", injuries=["肩部问题"])]
+    batch = scorer.score_batch(users)
+    legs_only = scorer.top_k(batch, 3, areas=["legs"])
+    assert set(_ids(scorer, legs_only[0])) == {"squat", "bridge"}
+    assert set(_ids(scorer, legs_only[1])) == {"squat", "jump", "bridge"}
+    everything = scorer.top_k(batch, len(EXERCISES))
+    assert "bench" not in _ids(scorer, everything[1]) and "dip" not in _ids(scorer, everything[1])
+    for row, user in zip(everything, users):
+        assert list(row) == list(scorer.top_k(scorer.score(user), len(EXERCISES)))
+
+def test_rank_areas_returns_top_exercises_per_area(scorer):
+    scores = scorer.score(_user(level="intermediate", injuries=["肘关节疼痛"]))
+    ranked = scorer.rank_areas(scores, ["legs", "arms", "back"], 2)
+    assert list(ranked) == ["legs", "arms", "back"]
+    assert len(ranked["legs"]) == 2 and all(exercise["area"] == "legs" for exercise in ranked["legs"])
+    # 肘部禁忌排除了全部手臂动作，动作库中没有背部动作
+    assert ranked["arms"] == [] and ranked["back"] == []
+
+def test_area_mask_selects_rows_of_the_given_areas(scorer):
+    assert _ids(scorer, np.flatnonzero(scorer.area_mask(["arms", "unknown"]))) == ["curl", "dip"]
+
+def test_bundled_catalog_scores_every_user_without_crashing():
+    scorer = ExerciseScorer(get_exercise_catalog())
+    for level in ("beginner", "intermediate", "advanced"):
+        ranked = scorer.rank_areas(scorer.score(_user(level=level)), scorer.areas, 3)
+        assert all(ranked[area] for area in scorer.areas)
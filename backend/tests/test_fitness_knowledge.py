@@ -0,0 +1,39 @@
+"""伤病史关键词：常见写法匹配到禁忌标签，日常用语和否定描述不误匹配"""
+import pytest
+
+from utils.fitness_knowledge import get_contraindications
+
+@pytest.mark.parametrize("limitation, tags", [
+    ("膝盖问题", {"knee", "high_impact"}),
+    ("右膝旧伤", {"knee", "high_impact"}),
+    ("腰椎间盘突出", {"lower_back", "spinal_load"}),
+    ("长期背痛", {"lower_back", "spinal_load"}),
+    ("右肩旧伤", {"shoulder", "overhead"}),
+    ("肘关节疼痛", {"elbow"}),
+    ("手腕扭伤过", {"wrist"}),
+    ("上个月崴脚", {"ankle", "high_impact"}),
+    ("颈椎不好", {"neck", "overhead"}),
+    ("有心脏病史", {"high_intensity", "high_impact", "valsalva"}),
+    ("血压偏高", {"high_intensity", "valsalva", "isometric"})
+])
+def test_common_descriptions_match_their_tags(limitation, tags):
+    assert get_contraindications([limitation]) == tags
+
+@pytest.mark.parametrize("limitation", [
+    "担心做错动作",
+    "有信心坚持",
+    "背着孩子上下楼没问题",
+    "想减腰围",
+    "没有心脏病",
+    "无膝盖问题",
+    "否认心血管疾病史"
+])
+def test_everyday_words_and_negations_do_not_match(limitation):
+    assert get_contraindications([limitation]) == set()
+
+def test_negation_only_covers_the_following_keyword():
+    assert get_contraindications(["没有心脏病，右膝旧伤"]) == {"knee", "high_impact"}
+    assert get_contraindications(["无膝盖问题但膝盖偶尔会痛"]) == {"knee", "high_impact"}
+
+def test_checkbox_limitations_use_the_exact_mapping():
+    assert get_contraindications(["腰部问题", "糖尿病"]) == {"lower_back", "spinal_load"}
@@ -0,0 +1,84 @@
+"""增量JSON解析器：分块输入、转义字符串和嵌套结构"""
+import json
+
+import pytest
+
+from utils.json_stream import IncrementalJSONParser
+
+PLAN = {
+    "plan_title": "增肌计划",
+    "overview": {"description": "说明, 含{括号}和[方括号]", "principles": ["渐进", "恢复"]},
+    "daily_workouts": [
+        {"day": 1, "title": "胸", "exercises": [{"name": "卧推", "reps": "8-10"}]},
+        {"day": 2, "title": "背\"部\\", "exercises": []},
+        {"day": 3, "title": "腿, 臀]", "note": "含 } 的字符串"}
+    ],
+    "safety_reminders": ["热身", "注意\n呼吸"]
+}
+
+def _feed_all(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+def _expected_events(plan):
+    events = []
+    for key, value in plan.items():
+        if key == "daily_workouts":
+            events.extend(("item", key, index, item) for index, item in enumerate(value))
+        events.append(("field", key, value))
+    return events
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_split_chunks_yield_same_events(size):
+    text = json.dumps(PLAN, ensure_ascii=False)
+    parser = IncrementalJSONParser()
+    assert _feed_all(parser, text, size) == _expected_events(PLAN)
+    assert parser.done
+
+def test_escaped_quotes_and_backslashes_split_across_chunks():
+    text = json.dumps({"title": 'a\\"b\\\\', "daily_workouts": [{"t": "x\\"}]}, ensure_ascii=False)
+    # 在每个反斜杠之后切分，转义状态必须跨越分块保留
+    chunks = text.split("\\")
+    parser = IncrementalJSONParser()
+    events = []
+    for i, chunk in enumerate(chunks):
+        events.extend(parser.feed(chunk + ("\\" if i < len(chunks) - 1 else "")))
+    assert events == [
+        ("field", "title", 'a\\"b\\\\'),
+        ("item", "daily_workouts", 0, {"t": "x\\"}),
+        ("field", "daily_workouts", [{"t": "x\\"}])
+    ]
+
+def test_ignores_code_fence_and_trailing_text():
+    text = "```json\n" + json.dumps({"a": 1, "b": [1, 2]}) + "\n```\n多余内容 {\"c\": 3}"
+    parser = IncrementalJSONParser(watch_arrays=())
+    assert _feed_all(parser, text, 5) == [("field", "a", 1), ("field", "b", [1, 2])]
+    assert parser.feed('{"d": 4}') == []
+
+def test_item_events_arrive_before_the_object_is_complete():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"plan_title": "t", "daily_workouts": [{"day": 1}, {"da')
+    assert events == [("field", "plan_title", "t"), ("item", "daily_workouts", 0, {"day": 1})]
+    assert not parser.done
+    assert parser.feed('y": 2}]}') == [
+        ("item", "daily_workouts", 1, {"day": 2}),
+        ("field", "daily_workouts", [{"day": 1}, {"day": 2}])
+    ]
+
+def test_unwatched_arrays_are_only_reported_as_fields():
+    parser = IncrementalJSONParser(watch_arrays=("daily_workouts",))
+    assert parser.feed('{"safety_reminders": ["a", "b"]}') == [("field", "safety_reminders", ["a", "b"])]
+
+def test_malformed_item_is_skipped_and_index_advances():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"daily_workouts": [{"day": 1}, {"day": tru}, {"day": 3}]}')
+    items = [event for event in events if event[0] == "item"]
+    assert items == [("item", "daily_workouts", 0, {"day": 1}), ("item", "daily_workouts", 2, {"day": 3})]
+
+def test_text_accumulates_all_chunks():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a"')
+    parser.feed(': 1}')
+    assert parser.text == '{"a": 1}'
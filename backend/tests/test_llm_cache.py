@@ -0,0 +1,76 @@
+"""LLM响应缓存：响应记在实际作答的提供商名下（路由故障转移、对冲胜出），磁盘命中提升到内存时不延长过期时间"""
+import asyncio
+
+import pytest
+
+from utils import call_llm, llm_cache
+from utils.llm_cache import ResponseCache
+from utils.llm_hedging import Hedger
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "生成计划"}]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(call_llm, "_cache", cache)
+    monkeypatch.setattr(call_llm, "_hedger", None)
+    return cache
+
+def _answer(provider):
+    return f"来自{provider}的回复"
+
+def test_failover_response_is_cached_under_the_answering_provider(cache, monkeypatch):
+    monkeypatch.setattr(call_llm._router, "route", lambda provider: "deepseek")
+    monkeypatch.setattr(call_llm, "_tracked_complete", lambda messages, provider, timeout=None, schema=None: _answer(provider))
+
+    assert call_llm._chat(MESSAGES, "openai") == _answer("deepseek")
+    assert cache.get(call_llm._cache_key("openai", MESSAGES)) is None
+    assert cache.get(call_llm._cache_key("deepseek", MESSAGES)) == _answer("deepseek")
+
+def test_unrouted_response_is_cached_under_the_requested_provider(cache, monkeypatch):
+    monkeypatch.setattr(call_llm._router, "route", lambda provider: provider)
+
+    async def complete(messages, provider, timeout=None, schema=None):
+        return _answer(provider)
+
+    monkeypatch.setattr(call_llm, "_tracked_complete_async", complete)
+    assert run(call_llm._chat_async(MESSAGES, "openai")) == _answer("openai")
+    assert cache.get(call_llm._cache_key("openai", MESSAGES)) == _answer("openai")
+
+def test_hedged_win_is_cached_under_the_backup_provider(cache, monkeypatch):
+    monkeypatch.setattr(call_llm._router, "route", lambda provider: provider)
+    monkeypatch.setattr(call_llm._router, "available", lambda provider: True)
+    monkeypatch.setattr(call_llm, "_hedger", Hedger("deepseek", min_delay=0.01))
+
+    async def complete(messages, provider, timeout=None, schema=None):
+        if provider == "openai":
+            await asyncio.sleep(1)
+        return _answer(provider)
+
+    monkeypatch.setattr(call_llm, "_tracked_complete_async", complete)
+    assert run(call_llm._chat_async(MESSAGES, "openai")) == _answer("deepseek")
+    assert cache.get(call_llm._cache_key("openai", MESSAGES)) is None
+    assert cache.get(call_llm._cache_key("deepseek", MESSAGES)) == _answer("deepseek")
+
+def test_disk_hit_keeps_its_original_expiry(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    path = str(tmp_path / "cache.db")
+    ResponseCache(ttl=100, db_path=path).set("k", "v")
+
+    # 另一个进程在条目写入90秒后从磁盘读到它，提升到内存时沿用原来的过期时间
+    clock.now += 90
+    other = ResponseCache(ttl=100, db_path=path)
+    assert other.get("k") == "v" and other.stats()["disk_hits"] == 1
+    clock.now += 20
+    assert other.get("k") is None
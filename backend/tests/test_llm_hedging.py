@@ -0,0 +1,28 @@
+"""请求对冲：慢的主调用被备用提供商超越，被取消的主调用记录下界延迟样本"""
+import asyncio
+
+from utils.llm_hedging import Hedger
+
+def run(coro):
+    return asyncio.run(coro)
+
+def _send(delays):
+    async def send(provider, timeout):
+        await asyncio.sleep(delays[provider])
+        return f"来自{provider}的回复"
+    return send
+
+def test_fast_primary_wins_without_hedging():
+    hedger = Hedger("backup", min_delay=0.05)
+    assert run(hedger.call("primary", "plan", _send({"primary": 0, "backup": 0}))) == ("来自primary的回复", "primary")
+    assert hedger.stats()["hedged"] == 0
+    assert hedger.latency.count("primary:plan") == 1
+
+def test_cancelled_primary_records_a_lower_bound_sample():
+    hedger = Hedger("backup", min_delay=0.02)
+    text, provider = run(hedger.call("primary", "plan", _send({"primary": 1, "backup": 0.03})))
+    assert (text, provider) == ("来自backup的回复", "backup")
+    assert hedger.stats()["hedge_wins"] == 1
+    # 主调用在备用调用胜出时被取消，它至少已经运行了对冲延迟加备用调用的时间
+    assert hedger.latency.count("primary:plan") == 1
+    assert 0.05 <= hedger.latency.percentile("primary:plan", 0.5) < 1
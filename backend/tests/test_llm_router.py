@@ -0,0 +1,118 @@
+"""熔断器状态转换：CLOSED → OPEN → HALF_OPEN → CLOSED / OPEN，以及按健康度路由"""
+import pytest
+
+from utils import llm_router
+from utils.llm_router import CLOSED, HALF_OPEN, OPEN, ProviderRouter, ProviderUnavailableError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_router, "time", clock)
+    return clock
+
+def _router(**kwargs):
+    settings = {"failure_threshold": 3, "min_calls": 100, "cooldown": 30.0}
+    settings.update(kwargs)
+    return ProviderRouter(["a", "b"], model_for=lambda provider: "m", **settings)
+
+def _state(router, provider):
+    return router.status()[f"{provider}/m"]["state"]
+
+def _trip(router, provider, times=3):
+    for _ in range(times):
+        router.record_failure(provider, RuntimeError("boom"))
+
+def test_consecutive_failures_open_the_breaker(clock):
+    router = _router()
+    _trip(router, "a", 2)
+    assert _state(router, "a") == CLOSED
+    _trip(router, "a", 1)
+    assert _state(router, "a") == OPEN
+    assert not router.available("a")
+    assert router.route("a") == "b"
+
+def test_success_resets_consecutive_failures(clock):
+    router = _router()
+    _trip(router, "a", 2)
+    router.record_success("a", 0.1)
+    _trip(router, "a", 2)
+    assert _state(router, "a") == CLOSED
+
+def test_error_rate_opens_the_breaker_after_min_calls(clock):
+    router = _router(failure_threshold=100, min_calls=4, error_rate_threshold=0.5)
+    router.record_success("a", 0.1)
+    # alpha=0.2：连续3次失败后错误率 1-0.8^3≈0.49，第4次失败后≈0.59
+    _trip(router, "a", 3)
+    assert _state(router, "a") == CLOSED
+    _trip(router, "a", 1)
+    assert _state(router, "a") == OPEN
+
+def test_cooldown_lets_exactly_one_half_open_probe_through(clock):
+    router = _router()
+    _trip(router, "a")
+    clock.now += 29.9
+    assert router.route("a") == "b"
+    clock.now += 0.2
+    assert router.route("a") == "a"
+    assert _state(router, "a") == HALF_OPEN
+    # 探测进行中，其余调用继续走其他提供商
+    assert not router.available("a")
+    assert router.route("a") == "b"
+
+def test_successful_probe_closes_the_breaker(clock):
+    router = _router()
+    _trip(router, "a")
+    clock.now += 30
+    assert router.route("a") == "a"
+    router.record_success("a", 0.2)
+    assert _state(router, "a") == CLOSED
+    assert router.status()["a/m"]["error_rate"] == 0.0
+    assert router.route("a") == "a"
+
+def test_failed_probe_reopens_the_breaker_and_restarts_cooldown(clock):
+    router = _router()
+    _trip(router, "a")
+    clock.now += 30
+    assert router.route("a") == "a"
+    router.record_failure("a", RuntimeError("still down"))
+    assert _state(router, "a") == OPEN
+    clock.now += 29
+    assert router.route("a") == "b"
+    clock.now += 1
+    assert router.route("a") == "a"
+
+def test_cancelled_probe_is_released(clock):
+    router = _router()
+    _trip(router, "a")
+    clock.now += 30
+    assert router.route("a") == "a"
+    router.release("a")
+    assert router.available("a")
+    assert router.route("a") == "a"
+
+def test_ignored_errors_do_not_count(clock):
+    router = _router(is_failure=lambda exc: not isinstance(exc, ValueError))
+    for _ in range(5):
+        router.record_failure("a", ValueError("bad request"))
+    assert _state(router, "a") == CLOSED
+
+def test_all_breakers_open_raises(clock):
+    router = _router()
+    _trip(router, "a")
+    _trip(router, "b")
+    with pytest.raises(ProviderUnavailableError):
+        router.route("a")
+
+def test_fallback_picks_the_healthiest_candidate(clock):
+    router = ProviderRouter(["a", "b", "c"], model_for=lambda provider: "m", failure_threshold=1)
+    router.record_success("b", 2.0)
+    router.record_success("c", 0.5)
+    router.record_failure("a", RuntimeError("boom"))
+    assert router.route("a") == "c"
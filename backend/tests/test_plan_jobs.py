@@ -0,0 +1,175 @@
+"""异步生成任务：队列上限、任务生命周期、节点进度、stop 时取消，以及进度写入不覆盖最终状态"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from plan_jobs import JobQueueFull, PlanJobQueue
+from utils.job_store import JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, JobStore, MemoryJobStore, SQLiteJobStore
+
+def run(coro):
+    return asyncio.run(coro)
+
+class Node:
+    pass
+
+class Validate(Node):
+    pass
+
+class Plan(Node):
+    pass
+
+async def _generate(mode, user_data, hooks):
+    """模拟两个节点的生成流程，按 hook(event, node, info) 上报节点事件"""
+    for node in (Validate(), Plan()):
+        for hook in hooks:
+            hook("node_start", node, {})
+        await asyncio.sleep(0.01)
+        for hook in hooks:
+            hook("node_end", node, {})
+    if user_data.get("fail"):
+        raise RuntimeError("LLM down")
+    return {"success": not user_data.get("invalid"), "mode": mode, "error": "数据无效" if user_data.get("invalid") else None}
+
+async def _wait(queue, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await queue.get(job_id)
+        if job["status"] in (JOB_SUCCEEDED, JOB_FAILED):
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"任务 {job_id} 未在 {timeout}s 内结束")
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return MemoryJobStore() if request.param == "memory" else SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+def test_job_store_requires_every_method():
+    class Partial(JobStore):
+        def create(self, job):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_job_runs_to_success_with_node_progress(store):
+    async def main():
+        queue = PlanJobQueue(_generate, store, workers=1)
+        queue.start()
+        job = await queue.submit("fast", {}, ["Validate", "Plan"])
+        assert job["status"] == JOB_QUEUED and job["progress"]["total_nodes"] == 2
+        done = await _wait(queue, job["id"])
+        stats = await queue.stats()
+        await queue.stop()
+        return done, stats
+
+    done, stats = run(main())
+    assert done["status"] == JOB_SUCCEEDED
+    assert done["result"] == {"success": True, "mode": "fast", "error": None}
+    assert done["progress"] == {"total_nodes": 2, "completed_nodes": ["Validate", "Plan"], "running_nodes": []}
+    assert done["started_at"] is not None and done["finished_at"] >= done["started_at"]
+    assert stats["submitted"] == 1 and stats["succeeded"] == 1 and stats["stored"] == {JOB_SUCCEEDED: 1}
+
+def test_failed_generation_and_unsuccessful_results_mark_the_job_failed(store):
+    async def main():
+        # 两个worker时第二个任务在写入存储期间就可能被取走
+        queue = PlanJobQueue(_generate, store, workers=2)
+        queue.start()
+        crashed = await queue.submit("standard", {"fail": True})
+        invalid = await queue.submit("standard", {"invalid": True})
+        results = await _wait(queue, crashed["id"]), await _wait(queue, invalid["id"])
+        await queue.stop()
+        return results
+
+    crashed, invalid = run(main())
+    assert crashed["status"] == JOB_FAILED and crashed["error"] == "服务器内部错误: LLM down"
+    assert crashed["progress"]["completed_nodes"] == ["Validate", "Plan"]
+    assert invalid["status"] == JOB_FAILED and invalid["error"] == "数据无效"
+
+def test_full_queue_rejects_new_jobs():
+    async def main():
+        queue = PlanJobQueue(_generate, MemoryJobStore(), workers=1, max_pending=2)
+        # 不启动worker时任务只入队不执行
+        queue._queue = asyncio.Queue(maxsize=queue.max_pending)
+        await queue.submit("fast", {})
+        await queue.submit("fast", {})
+        with pytest.raises(JobQueueFull):
+            await queue.submit("fast", {})
+        return await queue.stats()
+
+    stats = run(main())
+    assert stats["submitted"] == 2 and stats["rejected"] == 1 and stats["pending"] == 2
+
+def test_submit_before_start_raises():
+    with pytest.raises(RuntimeError):
+        run(PlanJobQueue(_generate, MemoryJobStore()).submit("fast", {}))
+
+def test_stop_fails_running_and_queued_jobs():
+    async def main():
+        started = asyncio.Event()
+
+        async def slow(mode, user_data, hooks):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue = PlanJobQueue(slow, MemoryJobStore(), workers=1)
+        queue.start()
+        running = await queue.submit("standard", {})
+        queued = await queue.submit("standard", {})
+        await started.wait()
+        await queue.stop()
+        return await queue.get(running["id"]), await queue.get(queued["id"]), await queue.stats()
+
+    running, queued, stats = run(main())
+    assert running["status"] == JOB_FAILED and running["error"] == "服务重启，任务已取消"
+    assert queued["status"] == JOB_FAILED and queued["error"] == "服务重启，任务已取消"
+    assert stats["failed"] == 2 and stats["workers"] == 0 and stats["running"] == 0
+
+class SlowProgressStore(MemoryJobStore):
+    """进度写入很慢的存储，用于检查进度写入不会在最终状态之后落盘"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+        self.threads = set()
+
+    def update(self, job_id, **fields):
+        self.threads.add(threading.get_ident())
+        if set(fields) == {"progress"}:
+            time.sleep(0.05)
+        job = super().update(job_id, **fields)
+        self.writes.append(fields.get("status", "progress"))
+        return job
+
+def test_progress_writes_never_overwrite_the_final_status():
+    store = SlowProgressStore()
+
+    async def main():
+        queue = PlanJobQueue(_generate, store, workers=1)
+        queue.start()
+        job = await queue.submit("fast", {}, ["Validate", "Plan"])
+        done = await _wait(queue, job["id"])
+        await queue.stop()
+        return done
+
+    done = run(main())
+    assert done["status"] == JOB_SUCCEEDED
+    assert done["progress"]["completed_nodes"] == ["Validate", "Plan"]
+    assert store.writes[-1] == JOB_SUCCEEDED
+    # 多个节点事件合并写入，存储读写不在事件循环线程上执行
+    assert store.writes.count("progress") < 4
+    assert threading.get_ident() not in store.threads
+
+def test_expired_jobs_are_purged_on_submit():
+    store = MemoryJobStore()
+
+    async def main():
+        queue = PlanJobQueue(_generate, store, workers=1, ttl=0.05)
+        queue._queue = asyncio.Queue()
+        old = await queue.submit("fast", {})
+        await asyncio.sleep(0.1)
+        await queue.submit("fast", {})
+        return await queue.get(old["id"])
+
+    assert run(main()) is None
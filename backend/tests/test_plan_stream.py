@@ -0,0 +1,69 @@
+"""流式计划生成：先推送预览，生成通过请求合并与相同请求共享，非 standard 方式直接推送 complete"""
+import asyncio
+
+import plan_stream
+from plan_stream import stream_fitness_plan
+from utils.singleflight import SingleFlight
+
+def run(coro):
+    return asyncio.run(coro)
+
+def _user(days=3):
+    return {
+        "basic_info": {"age": 30, "gender": "男", "height": 175, "weight": 70, "experience": "beginner"},
+        "goals": {"primary_goal": "muscle_gain", "target_areas": []},
+        "schedule": {"days_per_week": days, "time_per_session": 45},
+        "limitations": {"injuries": [], "restrictions": []}
+    }
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+def test_fast_mode_pushes_preview_then_complete():
+    events = run(_collect(stream_fitness_plan(_user(), mode="fast")))
+    assert [name for name, _ in events] == ["preview", "safety_notes", "complete"]
+    complete = events[-1][1]
+    assert complete["generation_info"]["generation_mode"] == "fast"
+    assert len(complete["plan"]["daily_workouts"]) == 3
+
+def test_identical_streams_share_one_generation(monkeypatch):
+    calls = []
+
+    async def fake_generate(shared, emit, hooks, deadline):
+        calls.append(shared["user_data"])
+        emit(("day", {"index": 0}))
+        await asyncio.sleep(0.05)
+        shared["final_plan"] = {"formatted_plan": {"plan_title": "LLM计划", "safety_notes": ["热身"]}}
+        return shared
+
+    monkeypatch.setattr(plan_stream, "_generate_streaming", fake_generate)
+
+    async def main():
+        flight = SingleFlight()
+        streams = [stream_fitness_plan(_user(), singleflight=flight, key="k") for _ in range(2)]
+        return flight, await asyncio.gather(*(_collect(stream) for stream in streams))
+
+    flight, (leader, follower) = run(main())
+    assert len(calls) == 1 and flight.stats()["coalesced"] == 1
+    assert [name for name, _ in leader] == ["preview", "day", "safety_notes", "complete"]
+    # 合并到进行中的生成时只收到最终结果
+    assert [name for name, _ in follower] == ["preview", "safety_notes", "complete"]
+    assert leader[-1][1]["plan"] == follower[-1][1]["plan"] == {"plan_title": "LLM计划", "safety_notes": ["热身"]}
+
+def test_stream_follows_a_non_streaming_generation_of_the_same_key():
+    async def main():
+        flight = SingleFlight()
+
+        async def run_flow():
+            await asyncio.sleep(0.05)
+            return {"final_plan": {"formatted_plan": {"plan_title": "共享计划"}}, "validation_errors": []}
+
+        other = asyncio.ensure_future(flight.do("k", run_flow))
+        await asyncio.sleep(0)
+        events = await _collect(stream_fitness_plan(_user(), singleflight=flight, key="k"))
+        await other
+        return events
+
+    events = run(main())
+    assert [name for name, _ in events] == ["preview", "safety_notes", "complete"]
+    assert events[-1][1]["plan"] == {"plan_title": "共享计划"}
@@ -0,0 +1,94 @@
+"""预计算计划表：写入/读取往返、未命中、文件格式校验和用户到键的映射"""
+import pytest
+
+from utils import plan_table
+from utils.plan_table import (
+    PLAN_TABLE_MINUTES,
+    PlanTable,
+    bucket_minutes,
+    iter_table_combinations,
+    plan_table_key,
+    table_key,
+    write_plan_table
+)
+
+PLANS = {
+    "muscle_gain|beginner|3|45": {"plan_title": "增肌", "daily_workouts": [{"day": 1, "title": "胸部 + 三头肌"}]},
+    "weight_loss|advanced|5|60": {"plan_title": "减脂", "daily_workouts": [{"day": d} for d in range(1, 6)]}
+}
+
+def _user(**overrides):
+    user = {
+        "basic_info": {"age": 30, "gender": "男", "height": 175, "weight": 70, "experience": "beginner"},
+        "goals": {"primary_goal": "muscle_gain", "target_areas": ["全身"]},
+        "schedule": {"days_per_week": 3, "time_per_session": 50},
+        "limitations": {"injuries": [], "restrictions": []}
+    }
+    for section, values in overrides.items():
+        user[section].update(values)
+    return user
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / "plan_table.bin"
+    write_plan_table(str(path), PLANS, {"engine": "rule"})
+    table = PlanTable(str(path))
+    yield table
+    table.close()
+
+def test_round_trip(table):
+    assert len(table) == 2
+    assert table.meta == {"engine": "rule"}
+    for key, plan in PLANS.items():
+        assert key in table
+        assert table.get(key) == plan
+
+def test_get_returns_fresh_copies(table):
+    key = "muscle_gain|beginner|3|45"
+    table.get(key)["plan_title"] = "已修改"
+    assert table.get(key) == PLANS[key]
+
+def test_key_miss(table):
+    assert "strength|advanced|6|120" not in table
+    assert table.get("strength|advanced|6|120") is None
+
+def test_rewrite_replaces_atomically(tmp_path):
+    path = str(tmp_path / "plan_table.bin")
+    write_plan_table(path, PLANS)
+    write_plan_table(path, {"toning|beginner|2|20": {"plan_title": "塑形"}})
+    table = PlanTable(path)
+    assert len(table) == 1 and table.get("toning|beginner|2|20") == {"plan_title": "塑形"}
+    assert not (tmp_path / "plan_table.bin.tmp").exists()
+    table.close()
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "not_a_table.bin"
+    path.write_bytes(b"JSON{}" + b"\0" * 16)
+    with pytest.raises(ValueError):
+        PlanTable(str(path))
+
+@pytest.mark.parametrize("minutes, expected", [(10, 20), (20, 20), (44, 30), (45, 45), (119, 90), (120, 120), (200, 120)])
+def test_bucket_minutes_rounds_down(minutes, expected):
+    assert bucket_minutes(minutes) == expected
+
+def test_combinations_cover_every_key_once():
+    keys = [table_key(*combination) for combination in iter_table_combinations()]
+    assert len(keys) == len(set(keys)) == 5 * 3 * 5 * len(PLAN_TABLE_MINUTES)
+
+def test_plan_table_key_for_user():
+    assert plan_table_key(_user()) == "muscle_gain|beginner|3|45"
+
+def test_users_with_limitations_or_catalog_areas_have_no_key():
+    assert plan_table_key(_user(limitations={"restrictions": ["膝盖问题"]})) is None
+    assert plan_table_key(_user(limitations={"injuries": ["腰椎间盘突出"]})) is None
+    assert plan_table_key(_user(goals={"target_areas": ["legs"]})) is None
+
+def test_find_precomputed_key_uses_loaded_table(tmp_path, monkeypatch):
+    path = tmp_path / "plan_table.bin"
+    write_plan_table(str(path), PLANS)
+    monkeypatch.setenv("PLAN_TABLE_PATH", str(path))
+    monkeypatch.setattr(plan_table, "_PLAN_TABLE", None)
+    monkeypatch.setattr(plan_table, "_PLAN_TABLE_LOADED", False)
+    assert plan_table.find_precomputed_key(_user()) == "muscle_gain|beginner|3|45"
+    assert plan_table.find_precomputed_key(_user(schedule={"days_per_week": 4})) is None
+    plan_table.get_plan_table().close()
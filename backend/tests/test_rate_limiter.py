@@ -0,0 +1,131 @@
+"""客户端限流：令牌桶补充、并发上限、实际用量修正和超时退还"""
+import asyncio
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import ProviderLimiter, RateLimitTimeout, TokenBucket, estimate_tokens
+
+class FakeClock:
+    """替代 rate_limiter 模块中的 time：sleep 只推进时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+def test_bucket_starts_full_and_refills_continuously(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    # 桶空后每秒补充1个
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.now += 3
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+def test_bucket_never_refills_above_capacity(clock):
+    bucket = TokenBucket(per_minute=60)
+    clock.now += 3600
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+def test_debt_queues_callers_fifo(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60)
+    waits = [bucket.reserve(6) for _ in range(3)]
+    assert waits == [pytest.approx(6.0), pytest.approx(12.0), pytest.approx(18.0)]
+
+def test_oversized_request_is_charged_full_capacity(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(60) == pytest.approx(60.0)
+
+def test_sync_acquire_sleeps_until_rate_allows(clock):
+    limiter = ProviderLimiter(rpm=2)
+    limiter.release(limiter.acquire(tokens=10))
+    limiter.release(limiter.acquire(tokens=10))
+    limiter.release(limiter.acquire(tokens=10))
+    assert clock.slept == [pytest.approx(30.0)]
+    assert limiter.stats()["queued"] == 1
+
+def test_release_corrects_token_estimate(clock):
+    limiter = ProviderLimiter(tpm=600)
+    limiter.release(limiter.acquire(tokens=100), actual_tokens=300)
+    # 预留100，实际用了300：桶里剩300，下一次400个token需要等待 100 / (600/60) = 10 秒
+    assert limiter._tokens.reserve(400) == pytest.approx(10.0)
+    assert limiter.stats()["actual_tokens"] == 300
+
+def test_release_refunds_overestimate(clock):
+    limiter = ProviderLimiter(tpm=600)
+    limiter.release(limiter.acquire(tokens=500), actual_tokens=100)
+    assert limiter._tokens.reserve(500) == 0.0
+
+def test_timeout_refunds_reservation(clock):
+    limiter = ProviderLimiter(tpm=600)
+    limiter.release(limiter.acquire(tokens=600))
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(tokens=300, timeout=1.0)
+    assert clock.slept == []
+    # 超时的调用没有占用额度：补满300个token只需30秒
+    assert limiter._tokens.reserve(300) == pytest.approx(30.0)
+    assert limiter.stats()["timeouts"] == 1
+
+def test_async_concurrency_cap():
+    limiter = ProviderLimiter(max_concurrency=2)
+    active = 0
+    peak = 0
+
+    async def call():
+        nonlocal active, peak
+        reservation = await limiter.acquire_async(tokens=1)
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        limiter.release(reservation)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    stats = limiter.stats()
+    assert stats["calls"] == 6 and stats["in_flight"] == 0 and stats["queued"] >= 1
+
+def test_async_slot_timeout():
+    limiter = ProviderLimiter(max_concurrency=1)
+
+    async def main():
+        held = await limiter.acquire_async(tokens=1)
+        with pytest.raises(RateLimitTimeout):
+            await limiter.acquire_async(tokens=1, timeout=0.01)
+        limiter.release(held)
+        limiter.release(await limiter.acquire_async(tokens=1, timeout=0.01))
+
+    asyncio.run(main())
+
+def test_sync_concurrency_slot_is_released(clock):
+    limiter = ProviderLimiter(max_concurrency=1)
+    reservation = limiter.acquire(tokens=1)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(tokens=1, timeout=0.01)
+    limiter.release(reservation)
+    limiter.release(limiter.acquire(tokens=1, timeout=0.01))
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("训练计划") == 4
+    assert estimate_tokens("abcdefgh") == 2
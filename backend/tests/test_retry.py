@@ -0,0 +1,164 @@
+"""重试策略：退避时长、retry_on过滤、每次运行的重试预算，以及 retry / fallback 事件"""
+import asyncio
+
+import pytest
+
+from macore import AsyncDagFlow, AsyncNode, Flow, Node, RetryBudget, RetryPolicy
+
+def run(coro):
+    return asyncio.run(coro)
+
+class Transient(Exception):
+    pass
+
+class Flaky(Node):
+    """前failures次执行失败，之后成功；执行失败且不再重试时返回fallback"""
+
+    def __init__(self, failures, error=Transient, **kwargs):
+        super().__init__(**kwargs)
+        self.failures, self.error, self.calls = failures, error, 0
+
+    def exec(self, prep_res):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("boom")
+        return "ok"
+
+    def exec_fallback(self, prep_res, exc):
+        return "fallback"
+
+    def post(self, shared, prep_res, exec_res):
+        shared.setdefault("results", []).append(exec_res)
+
+class AsyncFlaky(AsyncNode):
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures, self.calls = failures, 0
+
+    async def exec_async(self, prep_res):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Transient("boom")
+        return "ok"
+
+    async def exec_fallback_async(self, prep_res, exc):
+        return "fallback"
+
+    async def post_async(self, shared, prep_res, exec_res):
+        shared.setdefault("results", []).append(exec_res)
+
+def _recorder(events):
+    return lambda event, node, info: events.append((event, info.get("attempt")))
+
+def test_backoff_is_exponential_and_capped():
+    policy = RetryPolicy(max_attempts=5, base_delay=1, max_delay=5, multiplier=2, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(4)] == [1, 2, 4, 5]
+    jittered = RetryPolicy(max_attempts=5, base_delay=1, max_delay=5, multiplier=2)
+    assert all(0 <= jittered.delay(3) <= 5 for _ in range(50))
+
+def test_should_retry_respects_attempts_and_retry_on():
+    policy = RetryPolicy(max_attempts=3, retry_on=lambda exc: isinstance(exc, Transient))
+    assert policy.should_retry(Transient(), 0) and policy.should_retry(Transient(), 1)
+    assert not policy.should_retry(Transient(), 2)
+    assert not policy.should_retry(ValueError(), 0)
+
+def test_legacy_max_retries_maps_to_a_fixed_delay_policy():
+    node = Node(max_retries=3, wait=2)
+    assert node.retry.max_attempts == 3
+    assert [node.retry.delay(attempt) for attempt in range(3)] == [2, 2, 2]
+
+def test_retry_budget_is_exhausted():
+    budget = RetryBudget(2)
+    assert budget.try_acquire() and budget.try_acquire()
+    assert not budget.try_acquire()
+    assert budget.remaining == 0
+
+def test_node_retries_until_success_and_emits_retry_events():
+    events = []
+    node = Flaky(2, retry=RetryPolicy(max_attempts=3))
+    shared = {}
+    Flow(start=node).compile(hooks=[_recorder(events)]).run(shared)
+    assert shared["results"] == ["ok"] and node.calls == 3
+    assert events == [("retry", 1), ("retry", 2)]
+
+def test_exhausted_attempts_fall_back():
+    events = []
+    node = Flaky(5, retry=RetryPolicy(max_attempts=2))
+    shared = {}
+    Flow(start=node).compile(hooks=[_recorder(events)]).run(shared)
+    assert shared["results"] == ["fallback"] and node.calls == 2
+    assert events == [("retry", 1), ("fallback", 1)]
+
+def test_non_retryable_errors_fall_back_immediately():
+    events = []
+    node = Flaky(1, error=ValueError, retry=RetryPolicy(max_attempts=3, retry_on=lambda exc: isinstance(exc, Transient)))
+    shared = {}
+    Flow(start=node).compile(hooks=[_recorder(events)]).run(shared)
+    assert shared["results"] == ["fallback"] and node.calls == 1
+    assert events == [("fallback", 0)]
+
+def test_retry_budget_is_shared_by_all_nodes_of_one_run():
+    events = []
+    first = AsyncFlaky(5, retry=RetryPolicy(max_attempts=5))
+    second = AsyncFlaky(5, retry=RetryPolicy(max_attempts=5))
+    second.reads = second.writes = ("results",)
+    first.writes = ("results",)
+    flow = AsyncDagFlow([first, second]).compile(retry_budget=3, hooks=[_recorder(events)])
+    shared = {}
+    run(flow.run_async(shared))
+
+    assert shared["results"] == ["fallback", "fallback"]
+    assert [event for event, _ in events].count("retry") == 3
+    assert ("retry_budget_exhausted", 3) in events and ("retry_budget_exhausted", 0) in events
+    assert first.calls + second.calls == 5
+
+def test_retry_budget_is_per_run():
+    class FailsOnce(Node):
+        def exec(self, prep_res):
+            if self.retry_attempt == 0:
+                raise Transient("boom")
+            return "ok"
+
+        def exec_fallback(self, prep_res, exc):
+            return "fallback"
+
+        def post(self, shared, prep_res, exec_res):
+            shared["result"] = exec_res
+
+    flow = Flow(start=FailsOnce(retry=RetryPolicy(max_attempts=2))).compile(retry_budget=1)
+    results = []
+    for _ in range(3):
+        shared = {}
+        flow.run(shared)
+        results.append(shared["result"])
+    assert results == ["ok"] * 3
+
+def test_shared_node_keeps_its_attempt_counter_per_run():
+    attempts = []
+
+    class Recording(AsyncNode):
+        async def exec_async(self, prep_res):
+            attempts.append(self.retry_attempt)
+            await asyncio.sleep(0.01)
+            if self.retry_attempt == 0:
+                raise Transient("boom")
+            return "ok"
+
+        async def post_async(self, shared, prep_res, exec_res):
+            return exec_res
+
+    flow = AsyncDagFlow([Recording(retry=RetryPolicy(max_attempts=2))]).compile()
+
+    async def main():
+        return await asyncio.gather(*(flow.run_async({}) for _ in range(3)))
+
+    assert run(main()) == ["ok"] * 3
+    assert sorted(attempts) == [0, 0, 0, 1, 1, 1]
+
+def test_fallback_reraises_by_default():
+    class Failing(Node):
+        def exec(self, prep_res):
+            raise ValueError("bad")
+
+    with pytest.raises(ValueError, match="bad"):
+        Flow(start=Failing()).compile().run({})
@@ -0,0 +1,100 @@
+"""规则计划引擎：符合计划schema、训练时长不超过单次时长、按训练重点选部位、重复重点的训练日换用不同动作"""
+import json
+
+import pytest
+
+from utils.fitness_knowledge import get_exercise_by_id
+from utils.plan_formatter import MAX_EXERCISES_PER_DAY, _focus_areas, generate_rule_based_plan, generate_weekly_schedule
+from utils.plan_schemas import plan_schema
+from utils.structured_output import check_output
+
+def _user(days=3, minutes=45, level="beginner", goal="muscle_gain", target_areas=(), restrictions=()):
+    return {
+        "basic_info": {"age": 30, "gender": "男", "height": 175, "weight": 70, "experience": level},
+        "goals": {"primary_goal": goal, "target_areas": list(target_areas)},
+        "schedule": {"days_per_week": days, "time_per_session": minutes},
+        "limitations": {"injuries": [], "restrictions": list(restrictions)}
+    }
+
+def _area(item):
+    return get_exercise_by_id(item["id"])["area"]
+
+@pytest.mark.parametrize("days", [2, 3, 4, 5, 6])
+@pytest.mark.parametrize("level", ["beginner", "intermediate", "advanced"])
+def test_plan_matches_the_plan_schema(days, level):
+    plan = generate_rule_based_plan(_user(days=days, level=level))
+    _, errors = check_output(json.dumps(plan, ensure_ascii=False), plan_schema(days))
+    assert errors == []
+    assert len(plan["daily_workouts"]) == days
+    assert [workout["day"] for workout in plan["daily_workouts"]] == list(range(1, days + 1))
+
+@pytest.mark.parametrize("minutes", [15, 20, 30, 45, 60, 90, 120])
+@pytest.mark.parametrize("level", ["beginner", "intermediate", "advanced"])
+def test_sessions_fit_the_time_budget(minutes, level):
+    for workout in generate_rule_based_plan(_user(days=4, minutes=minutes, level=level))["daily_workouts"]:
+        # 时间富余时在动作数上限之外再加一个有氧收尾
+        assert 0 < len(workout["main_exercises"]) <= MAX_EXERCISES_PER_DAY + 1
+        assert workout["total_time"] <= minutes
+        if 45 <= minutes <= 60:
+            # 常见时长下至少用掉大部分时间（更长的训练受每天动作数上限约束）
+            assert workout["total_time"] >= minutes * 0.75
+
+def test_longer_sessions_get_more_work():
+    short = generate_rule_based_plan(_user(minutes=30))["daily_workouts"]
+    long = generate_rule_based_plan(_user(minutes=90))["daily_workouts"]
+    for a, b in zip(short, long):
+        assert sum(item["sets"] for item in b["main_exercises"]) > sum(item["sets"] for item in a["main_exercises"])
+
+def test_focus_keywords_map_to_catalog_areas():
+    assert _focus_areas("胸部 + 三头肌") == ["chest", "arms"]
+    assert _focus_areas("腿部 + 肩部") == ["legs", "shoulders"]
+    assert _focus_areas("上肢训练") == ["chest", "back", "shoulders", "arms"]
+    assert _focus_areas("拉伸") == ["legs", "chest", "back", "core"]
+
+def test_each_day_leads_with_its_focus_areas():
+    user = _user(days=5, minutes=60, level="intermediate")
+    schedule = [focus for day, focus in generate_weekly_schedule(user).items() if day != "其他"]
+    workouts = generate_rule_based_plan(user)["daily_workouts"]
+    assert [workout["focus"] for workout in workouts] == schedule
+    for workout in workouts:
+        areas = _focus_areas(workout["focus"])
+        lead = workout["main_exercises"][:2]
+        assert all(_area(item) in areas for item in lead), workout["focus"]
+
+def test_repeated_focus_days_use_different_exercises():
+    # 6天计划中"背部 + 二头肌"和"背部 + 手臂"都安排背部和手臂
+    workouts = generate_rule_based_plan(_user(days=6, minutes=45, level="intermediate"))["daily_workouts"]
+    back_days = [workout for workout in workouts if workout["focus"].startswith("背部")]
+    assert len(back_days) == 2
+    first, second = ([item["id"] for item in workout["main_exercises"] if _area(item) == "back"] for workout in back_days)
+    assert first and second and first != second
+
+def test_restrictions_exclude_contraindicated_exercises():
+    plan = generate_rule_based_plan(_user(days=3, restrictions=["膝盖问题"], goal="weight_loss"))
+    exercises = [get_exercise_by_id(item["id"]) for workout in plan["daily_workouts"] for item in workout["main_exercises"]]
+    assert exercises
+    assert not any({"knee", "high_impact"} & set(exercise["stresses"]) for exercise in exercises)
+
+def test_plan_is_deterministic():
+    user = _user(days=4, minutes=60, target_areas=["arms"])
+    assert generate_rule_based_plan(user) == generate_rule_based_plan(user)
+
+def test_repeat_penalty_spreads_exercises_across_the_week(monkeypatch):
+    from utils import exercise_scoring
+
+    def distinct_exercises():
+        workouts = generate_rule_based_plan(_user(days=6, minutes=45, level="advanced"))["daily_workouts"]
+        return len({item["id"] for workout in workouts for item in workout["main_exercises"]})
+
+    spread = distinct_exercises()
+    monkeypatch.setattr(exercise_scoring, "REPEAT_PENALTY", 0.0)
+    assert spread > distinct_exercises()
+
+@pytest.mark.parametrize("days", [3, 4, 6])
+def test_biceps_and_triceps_days_only_get_matching_arm_exercises(days):
+    for workout in generate_rule_based_plan(_user(days=days, minutes=60, level="intermediate"))["daily_workouts"]:
+        arms = [get_exercise_by_id(item["id"]) for item in workout["main_exercises"] if _area(item) == "arms"]
+        if "三头" in workout["focus"]:
+            assert arms and all("肱三头肌" in exercise["primary_muscles"] for exercise in arms)
+        elif "二头" in workout["focus"]:
+            assert arms and all("肱二头肌" in exercise["primary_muscles"] for exercise in arms)
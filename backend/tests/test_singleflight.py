@@ -0,0 +1,101 @@
+"""请求合并：并发相同请求只执行一次、结果隔离、异常传播和取消隔离"""
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight, request_key
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_request_key_normalizes_payload():
+    assert request_key({"a": " x ", "b": [1, {"c": "y"}]}) == request_key({"b": [1, {"c": "y "}], "a": "x"})
+    assert request_key({"a": 1}) != request_key({"a": 2})
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flight = SingleFlight()
+        runs = 0
+
+        async def generate():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return {"plan": {"days": [1, 2]}}
+
+        results = await asyncio.gather(*(flight.do("k", generate) for _ in range(5)))
+        return flight, runs, results
+
+    flight, runs, results = run(main())
+    assert runs == 1
+    assert all(result == {"plan": {"days": [1, 2]}} for result in results)
+    stats = flight.stats()
+    assert stats["calls"] == 5 and stats["executions"] == 1 and stats["coalesced"] == 4 and stats["inflight"] == 0
+
+def test_followers_get_isolated_copies():
+    async def main():
+        flight = SingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0.01)
+            return {"days": [1, 2]}
+
+        results = await asyncio.gather(*(flight.do("k", generate) for _ in range(3)))
+        results[0]["days"].append(3)
+        results[1]["days"].clear()
+        return results
+
+    results = run(main())
+    assert results[2] == {"days": [1, 2]}
+    assert len({id(result) for result in results}) == 3
+    assert len({id(result["days"]) for result in results}) == 3
+
+def test_errors_propagate_to_every_caller():
+    async def main():
+        flight = SingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("LLM down")
+
+        results = await asyncio.gather(*(flight.do("k", generate) for _ in range(3)), return_exceptions=True)
+        return flight, results
+
+    flight, results = run(main())
+    assert all(isinstance(result, RuntimeError) and str(result) == "LLM down" for result in results)
+    assert flight.stats()["errors"] == 1 and flight.stats()["inflight"] == 0
+
+def test_cancelled_caller_does_not_cancel_the_execution():
+    async def main():
+        flight = SingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0.05)
+            return "plan"
+
+        leader = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run(main()) == "plan"
+
+def test_different_keys_and_later_calls_execute_again():
+    async def main():
+        flight = SingleFlight()
+        runs = []
+
+        async def generate(name):
+            runs.append(name)
+            await asyncio.sleep(0.01)
+            return name
+
+        await asyncio.gather(flight.do("a", lambda: generate("a")), flight.do("b", lambda: generate("b")))
+        await flight.do("a", lambda: generate("a"))
+        return runs
+
+    assert sorted(run(main())) == ["a", "a", "b"]
@@ -0,0 +1,105 @@
+"""结构化输出：JSON解析、schema校验、修复提示词，以及 _chat 中只做一次修复调用"""
+import pytest
+
+from utils import call_llm
+from utils.structured_output import StructuredOutputError, check_output, parse_json_output, repair_messages, validate_json
+
+SCHEMA = {
+    "title": "plan",
+    "type": "object",
+    "required": ["days", "level"],
+    "properties": {
+        "days": {"type": "array", "minItems": 1, "maxItems": 2, "items": {"type": "integer", "minimum": 1, "maximum": 7}},
+        "level": {"type": "string", "enum": ["beginner", "advanced"]}
+    }
+}
+
+VALID = '{"days": [1, 3], "level": "beginner"}'
+
+def test_parse_tolerates_fences_and_leading_prose():
+    assert parse_json_output(VALID) == {"days": [1, 3], "level": "beginner"}
+    assert parse_json_output(f"```json\n{VALID}\n```") == {"days": [1, 3], "level": "beginner"}
+    assert parse_json_output(f"好的，计划如下：{VALID} 祝训练顺利") == {"days": [1, 3], "level": "beginner"}
+    with pytest.raises(ValueError):
+        parse_json_output("没有JSON")
+
+def test_validate_reports_every_problem_with_its_path():
+    errors = validate_json({"days": [0, "2", 3], "level": "expert"}, SCHEMA)
+    assert "$.days: expected at most 2 items, got 3" in errors
+    assert "$.days[0]: must be >= 1" in errors
+    assert "$.days[1]: expected integer, got str" in errors
+    assert "$.level: must be one of ['beginner', 'advanced']" in errors
+    assert validate_json({"days": [True]}, SCHEMA) == [
+        "$: missing required field 'level'",
+        "$.days[0]: expected integer, got bool"
+    ]
+    assert validate_json({"days": [7], "level": "advanced"}, SCHEMA) == []
+
+def test_check_output_returns_data_and_errors():
+    assert check_output(VALID, SCHEMA) == ({"days": [1, 3], "level": "beginner"}, [])
+    data, errors = check_output("{broken", SCHEMA)
+    assert data is None and errors[0].startswith("$: invalid JSON")
+    data, errors = check_output('{"days": []}', SCHEMA)
+    assert data == {"days": []} and len(errors) == 2
+
+def test_repair_messages_append_the_invalid_output_and_errors():
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "生成计划"}]
+    errors = [f"$.e{i}: bad" for i in range(25)]
+    repaired = repair_messages(messages, "{bad}", errors)
+    assert repaired[:2] == messages
+    assert repaired[2] == {"role": "assistant", "content": "{bad}"}
+    assert repaired[3]["role"] == "user"
+    assert "- $.e0: bad" in repaired[3]["content"] and "- $.e19: bad" in repaired[3]["content"]
+    # 错误信息最多列出20条
+    assert "$.e20" not in repaired[3]["content"]
+    assert messages == [{"role": "system", "content": "sys"}, {"role": "user", "content": "生成计划"}]
+
+@pytest.fixture
+def completions(monkeypatch):
+    """用预设的回复替换提供商调用，记录每次调用的消息"""
+    calls = []
+    replies = []
+
+    def complete(messages, provider, timeout=None, schema=None):
+        calls.append(messages)
+        return replies.pop(0)
+
+    monkeypatch.setattr(call_llm, "_cache", None)
+    monkeypatch.setattr(call_llm, "_tracked_complete", complete)
+    monkeypatch.setattr(call_llm._router, "route", lambda provider: provider)
+    monkeypatch.setattr(call_llm, "_structured_stats", {"validated": 0, "repaired": 0, "failed": 0})
+    return calls, replies
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "生成计划"}]
+
+def test_valid_output_needs_no_repair(completions):
+    calls, replies = completions
+    replies.append(VALID)
+    assert call_llm._chat(MESSAGES, "openai", schema=SCHEMA) == {"days": [1, 3], "level": "beginner"}
+    assert len(calls) == 1
+    assert call_llm.get_structured_output_stats()["repaired"] == 0
+
+def test_invalid_output_is_repaired_once(completions):
+    calls, replies = completions
+    replies.extend(['{"days": [9]}', VALID])
+    assert call_llm._chat(MESSAGES, "openai", schema=SCHEMA) == {"days": [1, 3], "level": "beginner"}
+    assert len(calls) == 2
+    assert calls[1][2] == {"role": "assistant", "content": '{"days": [9]}'}
+    assert "$.days[0]: must be <= 7" in calls[1][3]["content"]
+    stats = call_llm.get_structured_output_stats()
+    assert stats["repaired"] == 1 and stats["validated"] == 1 and stats["failed"] == 0
+
+def test_failed_repair_raises_without_a_second_repair(completions):
+    calls, replies = completions
+    replies.extend(["不是JSON", '{"days": []}', VALID])
+    with pytest.raises(StructuredOutputError) as info:
+        call_llm._chat(MESSAGES, "openai", schema=SCHEMA)
+    assert len(calls) == 2
+    assert "$: missing required field 'level'" in info.value.errors
+    assert call_llm.get_structured_output_stats()["failed"] == 1
+
+def test_plain_text_calls_skip_validation(completions):
+    calls, replies = completions
+    replies.append("不是JSON")
+    assert call_llm._chat(MESSAGES, "openai") == "不是JSON"
+    assert len(calls) == 1
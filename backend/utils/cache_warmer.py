@@ -0,0 +1,235 @@
+"""
+LLM缓存预热 - 统计线上请求的分桶画像分布，在启动时和空闲时用最常见画像的代表性用户预先生成计划
+
+直方图只保存分桶画像对应的匿名代表性用户（年龄段、BMI分类、体重段等）和请求次数，
+不保存任何精确的身体数据；填写了伤病史（自由文本）的请求不计入。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .profile_buckets import canonicalize_profile, profile_key, representative_user_data
+
+logger = logging.getLogger(__name__)
+
+class CacheWarmer:
+    """
+    基于请求分布的缓存预热器
+
+    record() 在请求路径上记录 (生成方式, 分桶画像) 的出现次数；warm() 按次数取前top_n个画像，
+    以有限的并发用代表性用户运行生成流程，使这些画像的LLM响应进入缓存。
+    预热次数受预算限制：每个预算窗口内最多发起budget次生成；预热过且未超过rewarm_after的画像不会重复生成。
+
+    Args:
+        generate: 异步函数 generate(mode, user_data)，通过现有流程生成一次计划
+        top_n (int): 每轮最多预热的画像数
+        concurrency (int): 同时进行的预热生成数
+        budget (int): 每个预算窗口内最多发起的预热生成数
+        budget_window (float): 预算窗口（秒）
+        idle_seconds (float): 距上一次请求超过该时长视为空闲，开始预热
+        interval (float): 后台检查空闲的间隔（秒）
+        rewarm_after (float): 画像预热后再次预热的间隔（秒），通常等于LLM缓存有效期
+        max_entries (int): 直方图最多保存的画像数，超出时淘汰次数最少的画像
+        state_path (str): 直方图持久化文件，为空时不持久化
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str, Dict], Awaitable[Any]],
+        top_n: int = 20,
+        concurrency: int = 2,
+        budget: int = 100,
+        budget_window: float = 86400,
+        idle_seconds: float = 30,
+        interval: float = 10,
+        rewarm_after: float = 86400,
+        max_entries: int = 1000,
+        state_path: Optional[str] = None
+    ):
+        self.generate = generate
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self.budget = budget
+        self.budget_window = budget_window
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.rewarm_after = rewarm_after
+        self.max_entries = max_entries
+        self.state_path = state_path
+
+        self._entries: Dict[str, Dict] = {}
+        # 预热完成时间只保存在内存中：重启后进程内缓存为空，需要重新预热
+        self._warmed_at: Dict[str, float] = {}
+        self._spent = deque()
+        self._last_request = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._warming = False
+        self._stats = {"recorded": 0, "skipped": 0, "warm_runs": 0, "warmed": 0, "warm_errors": 0, "budget_exhausted": 0}
+        self.load()
+
+    def record(self, mode: str, user_data: Dict):
+        """
+        记录一次请求的分桶画像
+
+        Args:
+            mode (str): 生成方式
+            user_data (Dict): 用户数据
+        """
+        self._last_request = time.monotonic()
+        if user_data.get('limitations', {}).get('injuries'):
+            self._stats["skipped"] += 1
+            return
+        key = f"{mode}:{profile_key(canonicalize_profile(user_data))}"
+        entry = self._entries.get(key)
+        if entry is None:
+            representative = representative_user_data(user_data)
+            if representative is None:
+                self._stats["skipped"] += 1
+                return
+            if len(self._entries) >= self.max_entries:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k]["count"])]
+            entry = self._entries[key] = {"mode": mode, "user_data": representative, "count": 0}
+        entry["count"] += 1
+        self._stats["recorded"] += 1
+
+    def top_entries(self, n: Optional[int] = None) -> List[Dict]:
+        """按请求次数从多到少返回前n个画像（含键）"""
+        ranked = sorted(self._entries.items(), key=lambda item: item[1]["count"], reverse=True)
+        return [{"key": key, **entry} for key, entry in ranked[:n or self.top_n]]
+
+    def remaining_budget(self) -> int:
+        """当前预算窗口内剩余的预热生成次数"""
+        now = time.monotonic()
+        while self._spent and now - self._spent[0] >= self.budget_window:
+            self._spent.popleft()
+        return max(self.budget - len(self._spent), 0)
+
+    async def warm(self) -> int:
+        """
+        预热最常见的画像
+
+        Returns:
+            int: 成功预热的画像数
+        """
+        if self._warming:
+            return 0
+        self._warming = True
+        try:
+            now = time.monotonic()
+            pending = [
+                entry for entry in self.top_entries()
+                if now - self._warmed_at.get(entry["key"], -self.rewarm_after) >= self.rewarm_after
+            ]
+            budget = self.remaining_budget()
+            if len(pending) > budget:
+                self._stats["budget_exhausted"] += 1
+                pending = pending[:budget]
+            if not pending:
+                return 0
+
+            self._stats["warm_runs"] += 1
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def warm_one(entry):
+                async with semaphore:
+                    self._spent.append(time.monotonic())
+                    try:
+                        await self.generate(entry["mode"], entry["user_data"])
+                    except Exception as e:
+                        self._stats["warm_errors"] += 1
+                        logger.warning(f"缓存预热失败 {entry['key']}: {e}")
+                        return False
+                    self._warmed_at[entry["key"]] = time.monotonic()
+                    self._stats["warmed"] += 1
+                    return True
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(warm_one(entry) for entry in pending))
+            logger.info(f"缓存预热完成：{sum(results)}/{len(pending)} 个画像，用时 {time.perf_counter() - started:.1f}s")
+            self.save()
+            return sum(results)
+        finally:
+            self._warming = False
+
+    async def run(self):
+        """后台循环：启动时预热一次，之后每当空闲超过idle_seconds时预热"""
+        await self.warm()
+        while True:
+            await asyncio.sleep(self.interval)
+            if time.monotonic() - self._last_request >= self.idle_seconds:
+                await self.warm()
+
+    def start(self):
+        """在当前事件循环中启动后台预热任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """停止后台预热任务并保存直方图"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.save()
+
+    def load(self):
+        """从持久化文件恢复直方图，文件不存在或损坏时从空直方图开始"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)["entries"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"缓存预热直方图读取失败: {e}")
+
+    def save(self):
+        """把直方图写入持久化文件（先写临时文件再替换）"""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"entries": self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"缓存预热直方图保存失败: {e}")
+
+    def stats(self) -> Dict:
+        """预热计数、直方图大小和剩余预算"""
+        return {
+            **self._stats,
+            "profiles": len(self._entries),
+            "warm_profiles": len(self._warmed_at),
+            "remaining_budget": self.remaining_budget(),
+            "warming": self._warming
+        }
+
+def warmer_from_env(generate: Callable[[str, Dict], Awaitable[Any]]) -> Optional[CacheWarmer]:
+    """
+    按环境变量创建缓存预热器
+
+    CACHE_WARMER_ENABLED（默认false）、CACHE_WARMER_TOP_N（默认20）、CACHE_WARMER_CONCURRENCY（默认2）、
+    CACHE_WARMER_BUDGET（每天最多预热生成次数，默认100）、CACHE_WARMER_IDLE_SECONDS（默认30）、
+    CACHE_WARMER_STATE（直方图持久化文件，默认不持久化）。LLM缓存关闭时预热没有意义，返回None。
+    """
+    if os.getenv("CACHE_WARMER_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        logger.warning("LLM_CACHE_ENABLED=false，缓存预热不启用")
+        return None
+    return CacheWarmer(
+        generate,
+        top_n=int(os.getenv("CACHE_WARMER_TOP_N", "20")),
+        concurrency=int(os.getenv("CACHE_WARMER_CONCURRENCY", "2")),
+        budget=int(os.getenv("CACHE_WARMER_BUDGET", "100")),
+        idle_seconds=float(os.getenv("CACHE_WARMER_IDLE_SECONDS", "30")),
+        rewarm_after=float(os.getenv("LLM_CACHE_TTL", "86400")),
+        state_path=os.getenv("CACHE_WARMER_STATE") or None
+    )
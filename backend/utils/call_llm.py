@@ -1,102 +1,575 @@
 import os
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import weakref
 from typing import Optional
 import dotenv
 
+from .llm_cache import cache_from_env, make_cache_key
+from .llm_hedging import InvalidResponse, LatencyTracker, hedger_from_env
+from .llm_router import ProviderRouter, ProviderUnavailableError
+from .rate_limiter import RateLimiterRegistry, RateLimitTimeout, estimate_request_tokens, estimate_tokens
+from .structured_output import StructuredOutputError, check_output, repair_messages, response_format
+
 dotenv.load_dotenv()
 
-def call_llm(prompt: str, provider: Optional[str] = None) -> str:
+# 提供商配置：API key、默认接口地址、默认模型和结构化输出方式（json_mode）
+# base_url 可以通过 {PROVIDER}_BASE_URL 环境变量覆盖（例如指向本地代理或测试桩）
+PROVIDERS = {
+    "openai": {
+        "api_key_env": "OPENAI_API_KEY",
+        "base_url": None,
+        "model_env": "OPENAI_MODEL",
+        "default_model": "gpt-5-mini",
+        "json_mode": "json_schema",
+    },
+    "gemini": {
+        "api_key_env": "GEMINI_API_KEY",
+        "base_url": None,
+        "model_env": "GEMINI_MODEL",
+        "default_model": "gemini-2.5-flash",
+        # Gemini SDK: response_mime_type="application/json"
+        "json_mode": "mime_type",
+    },
+    "deepseek": {
+        # DeepSeek uses OpenAI-compatible API
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "base_url": "https://api.deepseek.com/v1",
+        "model_env": "DEEPSEEK_MODEL",
+        "default_model": "deepseek-chat",
+        # DeepSeek只支持JSON mode，不支持json_schema
+        "json_mode": "json_object",
+    },
+    "openrouter": {
+        # 通用OPENROUTER接口 (统一API，当前推荐)
+        "api_key_env": "OPENROUTER_API_KEY",
+        "base_url": "https://openrouter.ai/api/v1",
+        "model_env": "OPENROUTER_MODEL",
+        "default_model": "google/gemini-2.5-flash",
+        "json_mode": "json_schema",
+    },
+}
+
+def _resolve_provider(provider: Optional[str]) -> str:
+    """Return the provider name, falling back to the LLM_PROVIDER env var"""
+    if provider is None:
+        provider = os.getenv("LLM_PROVIDER", "openai")
+    provider = provider.lower()
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unsupported provider: {provider}. Choose from: openai, gemini, deepseek, openrouter")
+    return provider
+
+def get_model(provider: str) -> str:
+    """Return the model configured for a provider"""
+    spec = PROVIDERS[provider]
+    return os.getenv(spec["model_env"], spec["default_model"])
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+def _http_settings(provider: str):
     """
-    Call LLM with support for multiple providers.
+    Build the httpx timeout and connection limits for a provider.
     
-    Args:
-        prompt: The prompt to send to the LLM
-        provider: LLM provider to use. If None, uses LLM_PROVIDER env var.
-                 Supported providers:
-                 - openai: OpenAI GPT models (直接API)
-                 - gemini: Google Gemini models (直接API，需要GEMINI_API_KEY)  
-                 - deepseek: DeepSeek models (直接API)
-                 - openrouter: 通过OpenRouter调用各种模型 (统一API，推荐用于Gemini)
+    Global defaults come from LLM_TIMEOUT, LLM_CONNECT_TIMEOUT, LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS and LLM_KEEPALIVE_EXPIRY; {PROVIDER}_TIMEOUT
+    overrides the read timeout for a single provider.
+    """
+    import httpx
     
-    Returns:
-        The LLM response as a string
+    prefix = provider.upper()
+    timeout = httpx.Timeout(
+        _env_float(f"{prefix}_TIMEOUT", _env_float("LLM_TIMEOUT", 60.0)),
+        connect=_env_float("LLM_CONNECT_TIMEOUT", 10.0)
+    )
+    limits = httpx.Limits(
+        max_connections=int(_env_float("LLM_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(_env_float("LLM_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 30.0)
+    )
+    return timeout, limits
+
+def _client_kwargs(provider: str) -> dict:
+    """Constructor arguments shared by the sync and async OpenAI-compatible clients"""
+    spec = PROVIDERS[provider]
+    api_key = os.getenv(spec["api_key_env"])
+    if not api_key:
+        raise ValueError(f"{spec['api_key_env']} not found in environment variables")
+    return {
+        "api_key": api_key,
+        "base_url": os.getenv(f"{provider.upper()}_BASE_URL", spec["base_url"]),
+    }
+
+class ClientRegistry:
     """
-    # Determine provider
-    if provider is None:
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    Process-wide registry of long-lived LLM clients.
     
-    if provider == "openai":
-        from openai import OpenAI
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-        
-        client = OpenAI(api_key=api_key)
-        model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+    Sync clients are built once per provider. Async clients are built once per
+    provider and event loop, because an httpx connection pool cannot be shared
+    between loops. Every client keeps its HTTP connections alive between calls.
+    """
     
-    elif provider == "gemini":
-        try:
-            import google.generativeai as genai
-        except ImportError:
-            raise ImportError("Please install google-generativeai: pip install google-generativeai")
-        
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
-        response = model.generate_content(prompt)
-        return response.text
-    
-    elif provider == "deepseek":
-        from openai import OpenAI
-        api_key = os.getenv("DEEPSEEK_API_KEY")
-        if not api_key:
-            raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
-        
-        # DeepSeek uses OpenAI-compatible API
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com/v1"
-        )
-        model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._gemini_models = {}
+    
+    def get_client(self, provider: str):
+        """Return the pooled sync client for an OpenAI-compatible provider"""
+        client = self._clients.get(provider)
+        if client is not None:
+            return client
+        with self._lock:
+            if provider not in self._clients:
+                import httpx
+                from openai import OpenAI
+                
+                timeout, limits = _http_settings(provider)
+                # 重试由节点的RetryPolicy负责，关闭SDK内置重试避免叠加
+                self._clients[provider] = OpenAI(
+                    timeout=timeout,
+                    max_retries=0,
+                    http_client=httpx.Client(timeout=timeout, limits=limits),
+                    **_client_kwargs(provider)
+                )
+            return self._clients[provider]
+    
+    def get_async_client(self, provider: str):
+        """Return the pooled async client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            if provider not in clients:
+                import httpx
+                from openai import AsyncOpenAI
+                
+                timeout, limits = _http_settings(provider)
+                clients[provider] = AsyncOpenAI(
+                    timeout=timeout,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(timeout=timeout, limits=limits),
+                    **_client_kwargs(provider)
+                )
+            return clients[provider]
+    
+    def get_gemini_model(self):
+        """Return the cached Gemini model, configuring the SDK only once"""
+        model_name = get_model("gemini")
+        model = self._gemini_models.get(model_name)
+        if model is not None:
+            return model
+        with self._lock:
+            if model_name not in self._gemini_models:
+                try:
+                    import google.generativeai as genai
+                except ImportError:
+                    raise ImportError("Please install google-generativeai: pip install google-generativeai")
+                
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY not found in environment variables")
+                
+                if not self._gemini_models:
+                    genai.configure(api_key=api_key)
+                self._gemini_models[model_name] = genai.GenerativeModel(model_name)
+            return self._gemini_models[model_name]
+    
+    def close(self):
+        """Close the sync clients"""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+    
+    async def aclose(self):
+        """Close the async clients owned by the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.pop(loop, {})
+        for client in clients.values():
+            await client.close()
+
+_registry = ClientRegistry()
+
+def _configured_providers() -> list:
+    """
+    Providers the router may send calls to.
     
-    elif provider == "openrouter":
-        # 通用OPENROUTER接口 - call_llm版本
-        from openai import OpenAI
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
-            raise ValueError("OPENROUTER_API_KEY not found in environment variables")
+    LLM_ROUTER_PROVIDERS (comma separated, in order of preference) overrides
+    the default of every provider whose API key is set.
+    """
+    names = os.getenv("LLM_ROUTER_PROVIDERS")
+    if names:
+        return [_resolve_provider(name.strip()) for name in names.split(",") if name.strip()]
+    return [name for name, spec in PROVIDERS.items() if os.getenv(spec["api_key_env"])]
+
+# 进程级响应缓存，LLM_CACHE_ENABLED=false 时为 None
+_cache = cache_from_env()
+
+# 每个提供商、每种调用（按system prompt区分）的延迟统计
+_latency = LatencyTracker()
+
+# 对冲请求策略，未设置 LLM_HEDGE_PROVIDER 时为 None
+_hedger = hedger_from_env(_latency)
+
+def get_llm_client(provider: Optional[str] = None):
+    """Return the shared sync client for an OpenAI-compatible provider"""
+    return _registry.get_client(_resolve_provider(provider))
+
+def get_async_llm_client(provider: Optional[str] = None):
+    """Return the shared async client for an OpenAI-compatible provider"""
+    return _registry.get_async_client(_resolve_provider(provider))
+
+def close_llm_clients():
+    """Close pooled sync clients (e.g. on process shutdown)"""
+    _registry.close()
+
+async def aclose_llm_clients():
+    """Close pooled async clients of the running event loop (e.g. on app shutdown)"""
+    await _registry.aclose()
+
+# 可重试的HTTP状态码：超时、限流和服务端临时错误
+_TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Gemini SDK (google.api_core) 的临时错误类型
+_TRANSIENT_ERROR_NAMES = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests"}
+
+def is_transient_llm_error(exc: BaseException) -> bool:
+    """
+    Whether an LLM call failure is worth retrying.
+    
+    Rate limits (429), timeouts, connection errors and 5xx responses are
+    transient; auth errors, bad requests and parse errors are not.
+    """
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        import openai
+        if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+            return True
+    except ImportError:
+        pass
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in _TRANSIENT_STATUS_CODES:
+        return True
+    return type(exc).__name__ in _TRANSIENT_ERROR_NAMES
+
+def _is_provider_failure(exc: BaseException) -> bool:
+    """Failures that say something about the provider's health: transient errors and rejected credentials"""
+    if isinstance(exc, RateLimitTimeout):
+        # 在本地限流队列中超时，与提供商健康无关
+        return False
+    if is_transient_llm_error(exc):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status in (401, 403)
+
+# 按提供商健康度路由，连续失败时熔断并切换到其他已配置的提供商
+_router = ProviderRouter(
+    _configured_providers(),
+    get_model,
+    failure_threshold=int(_env_float("LLM_BREAKER_FAILURES", 5)),
+    error_rate_threshold=_env_float("LLM_BREAKER_ERROR_RATE", 0.5),
+    cooldown=_env_float("LLM_BREAKER_COOLDOWN", 30.0),
+    is_failure=_is_provider_failure
+)
+
+# 每个提供商/模型的客户端限流：RPM、TPM和并发上限
+_limiters = RateLimiterRegistry()
+
+# 预估TPM时为回复预留的token数，调用结束后按实际用量修正
+EXPECTED_OUTPUT_TOKENS = int(_env_float("LLM_EXPECTED_OUTPUT_TOKENS", 1000))
+
+def _remaining(timeout: Optional[float], reservation) -> Optional[float]:
+    """Timeout left for the provider call after queueing in the rate limiter"""
+    return max(0.001, timeout - reservation.wait) if timeout else timeout
+
+def _queue_timeout(exc: BaseException, reservation) -> BaseException:
+    """
+    Blame a timeout on the rate limiter when queueing ate into the call's budget,
+    so the provider router does not count it against the provider.
+    """
+    if reservation.wait > 0 and is_transient_llm_error(exc) and "timeout" in type(exc).__name__.lower():
+        error = RateLimitTimeout(f"LLM call timed out after waiting {reservation.wait:.2f}s in the rate limiter")
+        error.__cause__ = exc
+        return error
+    return exc
+
+def _usage_tokens(response) -> Optional[int]:
+    """Total tokens reported by an OpenAI-compatible or Gemini response"""
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None) is not None:
+        return usage.total_tokens
+    metadata = getattr(response, "usage_metadata", None)
+    return getattr(metadata, "total_token_count", None)
+
+_GEMINI_ROLES = {"system": "System", "user": "User", "assistant": "Assistant"}
+
+def _gemini_prompt(messages: list) -> str:
+    """对于Google直接API，需要合并system和user prompts"""
+    if len(messages) == 1:
+        return messages[0]["content"]
+    return "\n\n".join(f"{_GEMINI_ROLES[m['role']]}: {m['content']}" for m in messages)
+
+def _cache_key(provider: str, messages: list, schema: Optional[dict] = None) -> str:
+    """Cache key for a chat request: provider, model, normalized prompts and the response schema"""
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    extra = {"schema": json.dumps(schema, sort_keys=True)} if schema is not None else {}
+    return make_cache_key(provider, get_model(provider), system_prompt, messages[-1]["content"], **extra)
+
+def _answer_key(key: str, provider: str, answered: str, messages: list, schema: Optional[dict] = None) -> str:
+    """Cache key for storing a response: keyed by the provider that actually answered, which
+    differs from the requested one when the router failed over or a hedged call won"""
+    return key if answered == provider else _cache_key(answered, messages, schema)
+
+def _json_options(provider: str, schema: Optional[dict]) -> dict:
+    """Request options enabling the provider's native JSON / structured-output mode"""
+    if schema is None:
+        return {}
+    mode = PROVIDERS[provider].get("json_mode")
+    if mode == "mime_type":
+        return {"generation_config": {"response_mime_type": "application/json"}}
+    return response_format(mode, schema)
+
+def _op_name(messages: list) -> str:
+    """Short name of the kind of call: a digest of the system prompt, or "prompt" without one"""
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), None)
+    if system_prompt is None:
+        return "prompt"
+    return hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:8]
+
+def _complete(messages: list, provider: str, timeout: Optional[float] = None, schema: Optional[dict] = None) -> str:
+    """Send chat messages to the provider using its pooled sync client, within its rate limits"""
+    limiter = _limiters.get(provider, get_model(provider))
+    reservation = limiter.acquire(estimate_request_tokens(messages, EXPECTED_OUTPUT_TOKENS), timeout)
+    timeout = _remaining(timeout, reservation)
+    response = None
+    try:
+        if provider == "gemini":
+            model = _registry.get_gemini_model()
+            request_options = {"timeout": timeout} if timeout else None
+            response = model.generate_content(_gemini_prompt(messages), request_options=request_options, **_json_options(provider, schema))
+            return response.text
         
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://openrouter.ai/api/v1"
+        # 单次调用的超时（例如请求剩余时间预算）覆盖客户端默认超时
+        kwargs = {"timeout": timeout} if timeout else {}
+        kwargs.update(_json_options(provider, schema))
+        response = _registry.get_client(provider).chat.completions.create(
+            model=get_model(provider),
+            messages=messages,
+            **kwargs
         )
-        model = os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash")
+        return response.choices[0].message.content
+    except Exception as e:
+        raise _queue_timeout(e, reservation)
+    finally:
+        limiter.release(reservation, _usage_tokens(response))
+
+async def _complete_async(messages: list, provider: str, timeout: Optional[float] = None, schema: Optional[dict] = None) -> str:
+    """Send chat messages to the provider using its pooled async client, within its rate limits"""
+    limiter = _limiters.get(provider, get_model(provider))
+    reservation = await limiter.acquire_async(estimate_request_tokens(messages, EXPECTED_OUTPUT_TOKENS), timeout)
+    timeout = _remaining(timeout, reservation)
+    response = None
+    try:
+        if provider == "gemini":
+            model = _registry.get_gemini_model()
+            request_options = {"timeout": timeout} if timeout else None
+            response = await model.generate_content_async(_gemini_prompt(messages), request_options=request_options, **_json_options(provider, schema))
+            return response.text
         
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            timeout=60.0
+        kwargs = {"timeout": timeout} if timeout else {}
+        kwargs.update(_json_options(provider, schema))
+        response = await _registry.get_async_client(provider).chat.completions.create(
+            model=get_model(provider),
+            messages=messages,
+            **kwargs
         )
         return response.choices[0].message.content
+    except Exception as e:
+        raise _queue_timeout(e, reservation)
+    finally:
+        limiter.release(reservation, _usage_tokens(response))
+
+def _tracked_complete(messages: list, provider: str, timeout: Optional[float] = None, schema: Optional[dict] = None) -> str:
+    """_complete, reporting the outcome to the provider router"""
+    start = time.monotonic()
+    try:
+        text = _complete(messages, provider, timeout, schema)
+    except Exception as e:
+        _router.record_failure(provider, e)
+        raise
+    _router.record_success(provider, time.monotonic() - start)
+    return text
+
+async def _tracked_complete_async(messages: list, provider: str, timeout: Optional[float] = None, schema: Optional[dict] = None) -> str:
+    """_complete_async, reporting the outcome to the provider router"""
+    start = time.monotonic()
+    try:
+        text = await _complete_async(messages, provider, timeout, schema)
+    except asyncio.CancelledError:
+        # 被取消（如对冲请求中落败）不影响健康度
+        _router.release(provider)
+        raise
+    except Exception as e:
+        _router.record_failure(provider, e)
+        raise
+    _router.record_success(provider, time.monotonic() - start)
+    return text
+
+# 结构化输出统计：通过校验、触发修复和修复后仍失败的次数
+_structured_stats = {"validated": 0, "repaired": 0, "failed": 0}
+
+def _validated(text: str, schema: dict):
+    """Parse and validate a repaired completion, raising if it still does not match the schema"""
+    data, errors = check_output(text, schema)
+    if errors:
+        _structured_stats["failed"] += 1
+        raise StructuredOutputError(f"LLM output does not match the {schema.get('title', 'response')} schema: {errors[:3]}", errors)
+    return data
+
+def _chat(messages: list, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None, schema: Optional[dict] = None):
+    """Answer from the response cache when possible, otherwise call the provider"""
+    provider = _resolve_provider(provider)
+    key = _cache_key(provider, messages, schema) if use_cache and _cache is not None else None
+    
+    if key is not None:
+        cached = _cache.get(key)
+        if cached is not None:
+            if schema is None:
+                return cached
+            data, errors = check_output(cached, schema)
+            if not errors:
+                return data
     
+    routed = _router.route(provider)
+    start = time.monotonic()
+    text = _tracked_complete(messages, routed, timeout, schema)
+    _latency.record(f"{routed}:{_op_name(messages)}", time.monotonic() - start)
+    
+    data = None
+    if schema is not None:
+        data, errors = check_output(text, schema)
+        if errors:
+            # 不符合结构时只做一次有针对性的修复调用
+            _structured_stats["repaired"] += 1
+            text = _tracked_complete(repair_messages(messages, text, errors), routed, timeout, schema)
+            data = _validated(text, schema)
+        _structured_stats["validated"] += 1
+    
+    if key is not None and text:
+        _cache.set(_answer_key(key, provider, routed, messages, schema), text)
+    return data if schema is not None else text
+
+async def _chat_async(messages: list, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None, schema: Optional[dict] = None):
+    """Async version of _chat; the SQLite tier is accessed off the event loop"""
+    provider = _resolve_provider(provider)
+    key = _cache_key(provider, messages, schema) if use_cache and _cache is not None else None
+    
+    if key is not None:
+        if _cache.has_disk_tier:
+            cached = await asyncio.to_thread(_cache.get, key)
+        else:
+            cached = _cache.get(key)
+        if cached is not None:
+            if schema is None:
+                return cached
+            data, errors = check_output(cached, schema)
+            if not errors:
+                return data
+    
+    routed = _router.route(provider)
+    if _hedger is not None and routed != _hedger.backup_provider and _router.available(_hedger.backup_provider):
+        # 主提供商响应慢时把同一提示词发给备用提供商，先返回的结果胜出
+        # 有结构要求时，不符合结构的响应不算胜出；两路都不符合时用其中一个做修复
+        try:
+            text, routed = await _hedger.call(
+                routed,
+                _op_name(messages),
+                lambda hedge_provider, call_timeout: _tracked_complete_async(messages, hedge_provider, call_timeout, schema),
+                timeout,
+                validate=(lambda response: check_output(response, schema)[1]) if schema is not None else None
+            )
+        except InvalidResponse as e:
+            text, routed = e.text, e.provider
     else:
-        raise ValueError(f"Unsupported provider: {provider}. Choose from: openai, gemini, deepseek, openrouter")
+        start = time.monotonic()
+        text = await _tracked_complete_async(messages, routed, timeout, schema)
+        _latency.record(f"{routed}:{_op_name(messages)}", time.monotonic() - start)
+    
+    data = None
+    if schema is not None:
+        data, errors = check_output(text, schema)
+        if errors:
+            # 不符合结构时只做一次有针对性的修复调用
+            _structured_stats["repaired"] += 1
+            text = await _tracked_complete_async(repair_messages(messages, text, errors), routed, timeout, schema)
+            data = _validated(text, schema)
+        _structured_stats["validated"] += 1
+    
+    if key is not None and text:
+        key = _answer_key(key, provider, routed, messages, schema)
+        if _cache.has_disk_tier:
+            await asyncio.to_thread(_cache.set, key, text)
+        else:
+            _cache.set(key, text)
+    return data if schema is not None else text
+
+def get_llm_cache_stats() -> dict:
+    """Hit/miss counters of the response cache"""
+    if _cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **_cache.stats()}
+
+def get_llm_latency_stats() -> dict:
+    """Per-provider latency percentiles and hedging counters"""
+    return {
+        "latency": _latency.stats(),
+        "hedging": _hedger.stats() if _hedger is not None else {"enabled": False}
+    }
+
+def get_structured_output_stats() -> dict:
+    """How often schema validation passed, needed a repair call or failed"""
+    return dict(_structured_stats)
+
+def get_llm_rate_limit_stats() -> dict:
+    """Queueing and token usage of every rate-limited provider/model"""
+    return _limiters.stats()
+
+def get_llm_router_status() -> dict:
+    """Circuit breaker state and health of every provider the router knows"""
+    return _router.status()
+
+def clear_llm_cache():
+    """Drop every cached LLM response"""
+    if _cache is not None:
+        _cache.clear()
+
+def call_llm(prompt: str, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None) -> str:
+    """
+    Call LLM with support for multiple providers.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        provider: LLM provider to use. If None, uses LLM_PROVIDER env var.
+                 Supported providers:
+                 - openai: OpenAI GPT models (直接API)
+                 - gemini: Google Gemini models (直接API，需要GEMINI_API_KEY)
+                 - deepseek: DeepSeek models (直接API)
+                 - openrouter: 通过OpenRouter调用各种模型 (统一API，推荐用于Gemini)
+        use_cache: Set to False to bypass the response cache
+        timeout: Per-call timeout in seconds (e.g. the remaining request budget)
+    
+    Returns:
+        The LLM response as a string
+    """
+    return _chat([{"role": "user", "content": prompt}], provider, use_cache, timeout)
 
-def call_llm_with_system(system_prompt: str, user_prompt: str, provider: Optional[str] = None) -> str:
+def call_llm_with_system(system_prompt: str, user_prompt: str, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None, response_schema: Optional[dict] = None):
     """
     Call LLM with system and user prompts.
     
@@ -108,98 +581,160 @@ def call_llm_with_system(system_prompt: str, user_prompt: str, provider: Optiona
                  - gemini: Google Gemini models (直接API，system+user会合并)
                  - deepseek: DeepSeek models (直接API)
                  - openrouter: 通过OpenRouter调用各种模型 (统一API，当前推荐)
+        use_cache: Set to False to bypass the response cache
+        timeout: Per-call timeout in seconds (e.g. the remaining request budget)
+        response_schema: JSON schema of the expected response. Enables the
+                 provider's JSON / structured-output mode; the output is
+                 validated and, if invalid, repaired with one follow-up call.
+    
+    Returns:
+        The LLM response as a string, or the parsed and validated JSON when
+        response_schema is given
+    
+    Raises:
+        StructuredOutputError: The output still did not match response_schema after the repair call
+    """
+    return _chat(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        provider,
+        use_cache,
+        timeout,
+        response_schema
+    )
+
+async def call_llm_async(prompt: str, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None) -> str:
+    """
+    Async version of call_llm, does not block the event loop.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        provider: LLM provider to use. If None, uses LLM_PROVIDER env var.
+        use_cache: Set to False to bypass the response cache
+        timeout: Per-call timeout in seconds (e.g. the remaining request budget)
     
     Returns:
         The LLM response as a string
     """
-    # Determine provider
-    if provider is None:
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    return await _chat_async([{"role": "user", "content": prompt}], provider, use_cache, timeout)
+
+async def call_llm_with_system_async(system_prompt: str, user_prompt: str, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None, response_schema: Optional[dict] = None):
+    """
+    Async version of call_llm_with_system, does not block the event loop.
     
-    if provider == "openai":
-        from openai import OpenAI
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-        
-        client = OpenAI(api_key=api_key)
-        model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        return response.choices[0].message.content
+    Args:
+        system_prompt: The system prompt to set context
+        user_prompt: The user prompt
+        provider: LLM provider to use. If None, uses LLM_PROVIDER env var.
+        use_cache: Set to False to bypass the response cache
+        timeout: Per-call timeout in seconds (e.g. the remaining request budget)
+        response_schema: JSON schema of the expected response (see call_llm_with_system)
     
-    elif provider == "gemini":
-        # 使用Google官方API直接调用GEMINI
-        try:
-            import google.generativeai as genai
-        except ImportError:
-            raise ImportError("Please install google-generativeai: pip install google-generativeai")
-        
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
-        
-        # 对于Google直接API，需要合并system和user prompts
-        combined_prompt = f"System: {system_prompt}\n\nUser: {user_prompt}"
-        response = model.generate_content(combined_prompt)
-        return response.text
-    
-    elif provider == "deepseek":
-        from openai import OpenAI
-        api_key = os.getenv("DEEPSEEK_API_KEY")
-        if not api_key:
-            raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
-        
-        # DeepSeek uses OpenAI-compatible API
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com/v1"
-        )
-        model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+    Returns:
+        The LLM response as a string, or the parsed and validated JSON when
+        response_schema is given
+    """
+    return await _chat_async(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        provider,
+        use_cache,
+        timeout,
+        response_schema
+    )
+
+async def _stream_async(messages: list, provider: str, timeout: Optional[float] = None, schema: Optional[dict] = None):
+    """Yield text deltas from the provider's streaming API, within its rate limits"""
+    limiter = _limiters.get(provider, get_model(provider))
+    prompt_tokens = estimate_request_tokens(messages)
+    reservation = await limiter.acquire_async(prompt_tokens + EXPECTED_OUTPUT_TOKENS, timeout)
+    timeout = _remaining(timeout, reservation)
+    output_tokens = 0
+    try:
+        if provider == "gemini":
+            model = _registry.get_gemini_model()
+            request_options = {"timeout": timeout} if timeout else None
+            response = await model.generate_content_async(_gemini_prompt(messages), stream=True, request_options=request_options, **_json_options(provider, schema))
+            async for chunk in response:
+                if chunk.text:
+                    output_tokens += estimate_tokens(chunk.text)
+                    yield chunk.text
+            return
         
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+        kwargs = {"timeout": timeout} if timeout else {}
+        kwargs.update(_json_options(provider, schema))
+        stream = await _registry.get_async_client(provider).chat.completions.create(
+            model=get_model(provider),
+            messages=messages,
+            stream=True,
+            **kwargs
         )
-        return response.choices[0].message.content
+        # 消费方提前退出时也要关闭响应，把连接还给连接池
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    output_tokens += estimate_tokens(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+    finally:
+        # 流式响应没有用量统计，按提示词和已输出文本估算
+        limiter.release(reservation, prompt_tokens + output_tokens)
+
+async def stream_llm_with_system_async(system_prompt: str, user_prompt: str, provider: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None, response_schema: Optional[dict] = None):
+    """
+    Stream an LLM completion as text deltas.
     
-    elif provider == "openrouter":
-        # 通用OPENROUTER接口 - call_llm_with_system版本
-        from openai import OpenAI
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
-            raise ValueError("OPENROUTER_API_KEY not found in environment variables")
-        
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://openrouter.ai/api/v1"
-        )
-        model = os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash")
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            timeout=60.0
-        )
-        return response.choices[0].message.content
+    Args:
+        system_prompt: The system prompt to set context
+        user_prompt: The user prompt
+        provider: LLM provider to use. If None, uses LLM_PROVIDER env var.
+        use_cache: Serve a cached completion as a single chunk and cache the
+                   completed stream; set to False to bypass the cache
+        timeout: Per-call timeout in seconds
+        response_schema: JSON schema of the expected response; enables the
+                 provider's JSON mode (the caller validates the completed text)
     
-    else:
-        raise ValueError(f"Unsupported provider: {provider}. Choose from: openai, gemini, deepseek, openrouter")
+    Yields:
+        Pieces of the response text as they arrive
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    provider = _resolve_provider(provider)
+    key = _cache_key(provider, messages, response_schema) if use_cache and _cache is not None else None
+    
+    if key is not None:
+        cached = await asyncio.to_thread(_cache.get, key) if _cache.has_disk_tier else _cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    routed = _router.route(provider)
+    start = time.monotonic()
+    parts = []
+    try:
+        async for delta in _stream_async(messages, routed, timeout, response_schema):
+            parts.append(delta)
+            yield delta
+    except (asyncio.CancelledError, GeneratorExit):
+        _router.release(routed)
+        raise
+    except Exception as e:
+        _router.record_failure(routed, e)
+        raise
+    _router.record_success(routed, time.monotonic() - start)
+    
+    text = "".join(parts)
+    if key is not None and text and (response_schema is None or not check_output(text, response_schema)[1]):
+        key = _answer_key(key, provider, routed, messages, response_schema)
+        if _cache.has_disk_tier:
+            await asyncio.to_thread(_cache.set, key, text)
+        else:
+            _cache.set(key, text)
 
 if __name__ == "__main__":
     # Test with different providers
@@ -223,7 +758,7 @@ if __name__ == "__main__":
         response2 = call_llm_with_system(system_prompt, user_prompt)
         print(f"Response: {response2}")
         print("-" * 50)
-        
+    
     except Exception as e:
         print(f"Error: {e}")
         print("-" * 50)
@@ -0,0 +1,188 @@
+"""
+动作目录 - 从数据文件加载一次的只读动作库，按部位、水平、难度、器械、主要肌群和禁忌标签建立索引
+"""
+import json
+import os
+from types import MappingProxyType
+from typing import Dict, Iterable, Optional, Tuple
+
+# 默认动作数据文件，可通过环境变量 EXERCISE_CATALOG_PATH 指定其他文件
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'exercises.json')
+
+# 查询参数名 -> 动作字段
+INDEXED_FIELDS = {
+    'area': 'area',
+    'level': 'level',
+    'difficulty': 'difficulty',
+    'equipment': 'equipment',
+    'muscle': 'primary_muscles',
+    'stress': 'stresses'
+}
+
+# 列表字段，每个取值分别建立索引；stresses 是动作主要受力的关节和负荷类型（禁忌标签）
+LIST_FIELDS = ('primary_muscles', 'stresses')
+
+# 组合查询结果缓存的条目上限
+QUERY_CACHE_SIZE = 4096
+
+def _as_values(value) -> Tuple:
+    """查询条件可以是单个值或多个值（取并集）"""
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+class ExerciseCatalog:
+    """
+    只读动作目录
+
+    加载时为每个索引字段建立 值 -> 动作元组 的倒排索引，单字段查询直接返回预先建好的元组；
+    多字段组合查询按位置集合求交集，再减去禁忌标签命中的动作，结果按目录顺序排列并缓存。
+    返回的动作字典由所有请求共享，调用方不要修改。
+
+    Args:
+        exercises (Iterable[Dict]): 动作列表，每个动作至少包含 id、area、level、name、difficulty、
+            equipment、primary_muscles 字段
+    """
+
+    def __init__(self, exercises: Iterable[Dict]):
+        records = []
+        positions = {}
+        for exercise in exercises:
+            record = {**exercise, **{field: tuple(exercise.get(field, ())) for field in LIST_FIELDS}}
+            if record['id'] in positions:
+                raise ValueError(f"动作ID重复: {record['id']}")
+            positions[record['id']] = len(records)
+            records.append(record)
+
+        self._records = tuple(records)
+        self._by_id = MappingProxyType({record['id']: record for record in records})
+
+        postings = {field: {} for field in INDEXED_FIELDS.values()}
+        for position, record in enumerate(records):
+            for field, index in postings.items():
+                values = record[field] if field in LIST_FIELDS else (record.get(field),)
+                for value in values:
+                    index.setdefault(value, []).append(position)
+
+        # 值 -> 动作元组（单值查询） 与 值 -> 位置集合（组合查询求交集）
+        self._index = MappingProxyType({
+            field: MappingProxyType({value: tuple(records[p] for p in plist) for value, plist in index.items()})
+            for field, index in postings.items()
+        })
+        self._postings = {
+            field: {value: frozenset(plist) for value, plist in index.items()}
+            for field, index in postings.items()
+        }
+        self._query_cache = {}
+        self._database = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    @property
+    def areas(self) -> Tuple[str, ...]:
+        """按首次出现顺序排列的训练部位"""
+        return tuple(self._index['area'])
+
+    def values(self, field: str) -> Tuple:
+        """
+        某个查询字段的全部取值
+
+        Args:
+            field (str): 查询参数名，见 INDEXED_FIELDS
+        """
+        return tuple(self._index[INDEXED_FIELDS[field]])
+
+    def get(self, exercise_id: str) -> Optional[Dict]:
+        """按ID查找动作，未找到时返回None"""
+        return self._by_id.get(exercise_id)
+
+    def find(self, avoid: Iterable[str] = (), **criteria) -> Tuple[Dict, ...]:
+        """
+        按字段查询动作，条件之间取交集，同一字段的多个值取并集
+
+        Args:
+            avoid (Iterable[str]): 禁忌标签，带有其中任一标签的动作被排除
+            **criteria: area / level / difficulty / equipment / muscle / stress，值为单个字符串或字符串列表，
+                None 表示不限
+
+        Returns:
+            Tuple[Dict, ...]: 按目录顺序排列的动作
+
+        Example:
+            catalog.find(area='chest', difficulty=['初级', '中级'], avoid={'shoulder'})
+        """
+        unknown = set(criteria) - set(INDEXED_FIELDS)
+        if unknown:
+            raise TypeError(f"不支持的查询字段: {', '.join(sorted(unknown))}")
+
+        conditions = tuple(sorted(
+            (INDEXED_FIELDS[name], _as_values(value)) for name, value in criteria.items() if value is not None
+        ))
+        avoid = tuple(sorted(set(_as_values(avoid or ()))))
+        if not conditions and not avoid:
+            return self._records
+        if len(conditions) == 1 and len(conditions[0][1]) == 1 and not avoid:
+            field, (value,) = conditions[0]
+            return self._index[field].get(value, ())
+
+        key = (conditions, avoid)
+        result = self._query_cache.get(key)
+        if result is None:
+            if len(self._query_cache) >= QUERY_CACHE_SIZE:
+                self._query_cache.clear()
+            result = self._query_cache[key] = self._select(conditions, avoid)
+        return result
+
+    def _union(self, field, values) -> frozenset:
+        empty = frozenset()
+        return empty.union(*(self._postings[field].get(value, empty) for value in values))
+
+    def _select(self, conditions, avoid) -> Tuple[Dict, ...]:
+        """按位置集合求交集（从最小的集合开始），再减去禁忌标签命中的位置"""
+        if conditions:
+            matches = sorted((self._union(field, values) for field, values in conditions), key=len)
+            positions = matches[0].intersection(*matches[1:])
+        else:
+            positions = frozenset(range(len(self._records)))
+        positions = positions - self._union('stresses', avoid)
+        return tuple(self._records[p] for p in sorted(positions))
+
+    def as_database(self) -> Dict[str, Dict[str, list]]:
+        """
+        按 部位 -> 水平 -> 动作列表 分组的嵌套结构，与旧版动作数据库格式相同
+
+        首次调用时构建并缓存，调用方不要修改。
+        """
+        if self._database is None:
+            database = {}
+            for record in self._records:
+                database.setdefault(record['area'], {}).setdefault(record['level'], []).append(record)
+            self._database = database
+        return self._database
+
+def load_catalog(path: str) -> ExerciseCatalog:
+    """
+    从JSON数据文件加载动作目录
+
+    Args:
+        path (str): 数据文件路径，格式为 {"version": 1, "exercises": [...]}
+
+    Returns:
+        ExerciseCatalog: 动作目录
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return ExerciseCatalog(data['exercises'])
+
+_CATALOG = None
+
+def get_exercise_catalog() -> ExerciseCatalog:
+    """获取进程级共享的动作目录，首次调用时从数据文件加载"""
+    global _CATALOG
+    if _CATALOG is None:
+        _CATALOG = load_catalog(os.getenv('EXERCISE_CATALOG_PATH', DEFAULT_CATALOG_PATH))
+    return _CATALOG
@@ -0,0 +1,224 @@
+"""
+动作评分引擎 - 把动作目录编码为特征矩阵，一次矩阵运算为用户（或一批用户）给全部动作打分并选出每天的前k个动作
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .exercise_catalog import ExerciseCatalog, get_exercise_catalog
+from .fitness_knowledge import get_contraindications, get_user_limitations
+
+# 难度档位，按由易到难排列
+DIFFICULTIES = ('初级', '中级', '高级')
+
+# 各训练水平可选的难度及偏好：不在表中的难度被排除
+LEVEL_DIFFICULTY_WEIGHTS = {
+    'beginner': {'初级': 0.3},
+    'intermediate': {'初级': 0.0, '中级': 0.3},
+    'advanced': {'初级': -0.1, '中级': 0.15, '高级': 0.3}
+}
+
+# 训练目标对各部位的偏好
+GOAL_AREA_AFFINITY = {
+    'weight_loss': {'cardio': 1.0, 'legs': 0.8, 'core': 0.6, 'back': 0.3, 'chest': 0.3, 'shoulders': 0.2, 'arms': 0.1},
+    'muscle_gain': {'chest': 1.0, 'back': 1.0, 'legs': 1.0, 'shoulders': 0.8, 'arms': 0.7, 'core': 0.3, 'cardio': 0.0},
+    'strength': {'legs': 1.0, 'back': 1.0, 'chest': 0.9, 'shoulders': 0.6, 'arms': 0.3, 'core': 0.4, 'cardio': 0.0},
+    'endurance': {'cardio': 1.0, 'core': 0.8, 'legs': 0.8, 'back': 0.3, 'shoulders': 0.2, 'chest': 0.2, 'arms': 0.1},
+    'toning': {'core': 1.0, 'legs': 0.9, 'arms': 0.8, 'shoulders': 0.8, 'chest': 0.4, 'back': 0.4, 'cardio': 0.3}
+}
+
+# 复合动作（主要肌群越多越复合）的偏好，按训练目标
+GOAL_COMPOUND_WEIGHT = {'strength': 0.3, 'muscle_gain': 0.2, 'weight_loss': 0.15, 'endurance': 0.1, 'toning': 0.1}
+
+# 高冲击动作的偏好，按训练水平；减脂和耐力目标额外加分
+LEVEL_IMPACT_WEIGHT = {'beginner': -0.3, 'intermediate': 0.0, 'advanced': 0.1}
+GOAL_IMPACT_BONUS = {'weight_loss': 0.2, 'endurance': 0.2}
+
+# 目标部位的额外加分、初学者对自重动作的偏好
+TARGET_AREA_BONUS = 0.5
+BODYWEIGHT_BONUS = {'beginner': 0.1}
+
+# 被排除的动作（难度不符或命中禁忌标签）的分数，远低于任何正常分数
+EXCLUDED_SCORE = -1e6
+
+# 同一周内已安排过的动作再次入选的扣分，让相同重点的训练日换用不同动作
+REPEAT_PENALTY = 0.6
+
+class ExerciseScorer:
+    """
+    基于特征矩阵的动作评分器
+
+    特征列依次为：部位（独热）、难度（独热）、器械（独热）、禁忌标签（多热）、主要肌群（多热）、
+    复合程度（主要肌群数）。用户画像编码为同样长度的权重向量，得分 = 特征矩阵 @ 权重向量；
+    难度不符或命中禁忌标签的动作通过一个很大的负权重排除。多个用户的权重向量堆叠后一次矩阵乘法完成批量评分。
+
+    Args:
+        catalog (ExerciseCatalog): 动作目录
+    """
+
+    def __init__(self, catalog: ExerciseCatalog):
+        self.catalog = catalog
+        self.exercises = tuple(catalog)
+        self.areas = catalog.areas
+        self.equipment = catalog.values('equipment')
+        self.stresses = catalog.values('stress')
+        self.muscles = catalog.values('muscle')
+
+        groups = [
+            ('area', self.areas),
+            ('difficulty', DIFFICULTIES),
+            ('equipment', self.equipment),
+            ('stress', self.stresses),
+            ('muscle', self.muscles),
+            ('compound', ('compound',))
+        ]
+        self._columns = {}
+        offset = 0
+        for name, values in groups:
+            self._columns[name] = {value: offset + i for i, value in enumerate(values)}
+            offset += len(values)
+        self.n_features = offset
+
+        features = np.zeros((len(self.exercises), self.n_features), dtype=np.float32)
+        for row, exercise in enumerate(self.exercises):
+            features[row, self._columns['area'][exercise['area']]] = 1
+            if exercise['difficulty'] in self._columns['difficulty']:
+                features[row, self._columns['difficulty'][exercise['difficulty']]] = 1
+            features[row, self._columns['equipment'][exercise['equipment']]] = 1
+            for tag in exercise['stresses']:
+                features[row, self._columns['stress'][tag]] = 1
+            for muscle in exercise['primary_muscles']:
+                features[row, self._columns['muscle'][muscle]] = 1
+            features[row, self._columns['compound']['compound']] = len(exercise['primary_muscles'])
+        self.features = features
+        self._area_codes = np.array([self.areas.index(exercise['area']) for exercise in self.exercises])
+        self._area_rows = {area: np.flatnonzero(self._area_codes == code) for code, area in enumerate(self.areas)}
+        self._positions = {exercise['id']: row for row, exercise in enumerate(self.exercises)}
+
+    def profile_vector(self, user_data: Dict) -> np.ndarray:
+        """
+        把用户画像编码为权重向量
+
+        Args:
+            user_data (Dict): 用户数据（目标、水平、目标部位、身体限制）
+
+        Returns:
+            np.ndarray: 长度为 n_features 的权重向量
+        """
+        goal = user_data['goals']['primary_goal']
+        level = user_data['basic_info']['experience']
+        target_areas = {area.lower() for area in user_data['goals'].get('target_areas', [])}
+        weights = np.zeros(self.n_features, dtype=np.float32)
+
+        affinity = GOAL_AREA_AFFINITY.get(goal, {})
+        for area, column in self._columns['area'].items():
+            weights[column] = affinity.get(area, 0.5) + (TARGET_AREA_BONUS if area in target_areas else 0.0)
+
+        difficulty_weights = LEVEL_DIFFICULTY_WEIGHTS.get(level, LEVEL_DIFFICULTY_WEIGHTS['beginner'])
+        for difficulty, column in self._columns['difficulty'].items():
+            weights[column] = difficulty_weights.get(difficulty, EXCLUDED_SCORE)
+
+        if '无器械' in self._columns['equipment']:
+            weights[self._columns['equipment']['无器械']] = BODYWEIGHT_BONUS.get(level, 0.0)
+
+        stress_columns = self._columns['stress']
+        if 'high_impact' in stress_columns:
+            weights[stress_columns['high_impact']] = LEVEL_IMPACT_WEIGHT.get(level, 0.0) + GOAL_IMPACT_BONUS.get(goal, 0.0)
+        for tag in get_contraindications(get_user_limitations(user_data)):
+            if tag in stress_columns:
+                weights[stress_columns[tag]] = EXCLUDED_SCORE
+
+        weights[self._columns['compound']['compound']] = GOAL_COMPOUND_WEIGHT.get(goal, 0.1)
+        return weights
+
+    def score(self, user_data: Dict) -> np.ndarray:
+        """为单个用户给全部动作打分，返回长度为动作数的分数向量"""
+        return self.features @ self.profile_vector(user_data)
+
+    def score_batch(self, users: Sequence[Dict]) -> np.ndarray:
+        """
+        批量评分
+
+        Args:
+            users (Sequence[Dict]): 用户数据列表
+
+        Returns:
+            np.ndarray: 形状为 (用户数, 动作数) 的分数矩阵
+        """
+        profiles = np.stack([self.profile_vector(user_data) for user_data in users])
+        return profiles @ self.features.T
+
+    def top_k(self, scores: np.ndarray, k: int, areas: Sequence[str] = None) -> np.ndarray:
+        """
+        按分数从高到低取前k个可用动作的下标，支持一维分数向量和二维批量分数矩阵
+
+        Args:
+            scores (np.ndarray): score 或 score_batch 的结果
+            k (int): 每个用户最多取的动作数
+            areas (Sequence[str]): 只在这些部位中选择，None 表示不限
+
+        Returns:
+            np.ndarray: 一维时为下标数组；二维时为每行一个下标数组的列表（被排除的动作不会入选）
+        """
+        if areas is not None:
+            scores = np.where(self.area_mask(areas), scores, EXCLUDED_SCORE)
+        k = min(k, scores.shape[-1])
+        if scores.ndim == 1:
+            if k <= 0:
+                return np.empty(0, dtype=np.intp)
+            # 先用argpartition取出前k个，再只对这k个排序
+            candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return ranked[scores[ranked] > EXCLUDED_SCORE / 2]
+        if k <= 0:
+            return [np.empty(0, dtype=np.intp) for _ in scores]
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        valid = np.take_along_axis(candidate_scores, order, axis=1) > EXCLUDED_SCORE / 2
+        return [row[mask] for row, mask in zip(candidates, valid)]
+
+    def area_mask(self, areas: Sequence[str]) -> np.ndarray:
+        """属于给定部位的动作为True的布尔向量"""
+        codes = [self.areas.index(area) for area in areas if area in self.areas]
+        return np.isin(self._area_codes, codes)
+
+    def muscle_mask(self, muscles: Sequence[str]) -> np.ndarray:
+        """主要肌群包含任一给定肌群的动作为True的布尔向量"""
+        columns = [self._columns['muscle'][muscle] for muscle in muscles if muscle in self._columns['muscle']]
+        if not columns:
+            return np.zeros(len(self.exercises), dtype=bool)
+        return self.features[:, columns].any(axis=1)
+
+    def position(self, exercise_id: str) -> int:
+        """动作在特征矩阵中的行号"""
+        return self._positions[exercise_id]
+
+    def rank_areas(self, scores: np.ndarray, areas: Sequence[str], k: int) -> Dict[str, List[Dict]]:
+        """
+        按部位分别选出分数最高的前k个动作，用于安排一个训练日
+
+        Args:
+            scores (np.ndarray): score 的结果，可先对已安排过的动作扣分
+            areas (Sequence[str]): 训练日需要安排的部位
+            k (int): 每个部位最多选出的动作数
+
+        Returns:
+            Dict[str, List[Dict]]: 部位 -> 按分数从高到低排列的动作
+        """
+        ranked = {}
+        for area in areas:
+            # 只在该部位的行上取前k个，避免每次对整张表做掩码
+            rows = self._area_rows.get(area, np.empty(0, dtype=np.intp))
+            ranked[area] = [self.exercises[i] for i in rows[self.top_k(scores[rows], k)]]
+        return ranked
+
+_SCORER = None
+
+def get_exercise_scorer() -> ExerciseScorer:
+    """获取基于共享动作目录的进程级评分器"""
+    global _SCORER
+    if _SCORER is None:
+        _SCORER = ExerciseScorer(get_exercise_catalog())
+    return _SCORER
@@ -2,99 +2,117 @@
 健身知识库工具 - 提供健身动作数据库和安全指导原则
 """
 
+from .exercise_catalog import get_exercise_catalog
+
+# 身体限制 -> 需要避开的禁忌标签（动作数据中的 stresses 字段）
+LIMITATION_CONTRAINDICATIONS = {
+    "膝盖问题": {"knee", "high_impact"},
+    "腰部问题": {"lower_back", "spinal_load"},
+    "肩部问题": {"shoulder", "overhead"},
+    "心血管疾病": {"high_intensity", "high_impact", "valsalva"},
+    "高血压": {"high_intensity", "valsalva", "isometric"},
+    "糖尿病": set()
+}
+
+# 自由填写的伤病史按关键词匹配禁忌标签
+# 关键词都是多字词：单字（如"心""背"）会误匹配"担心做错动作""背着孩子"这类描述
+LIMITATION_KEYWORDS = [
+    (("膝盖", "膝关节", "左膝", "右膝", "双膝", "膝伤", "膝痛", "半月板", "髌骨", "十字韧带"), {"knee", "high_impact"}),
+    (("腰部", "腰椎", "腰痛", "腰疼", "腰伤", "腰肌", "腰间盘", "椎间盘", "闪腰", "背部", "背痛", "背疼", "后背", "下背",
+      "脊柱", "脊椎", "坐骨神经"), {"lower_back", "spinal_load"}),
+    (("肩部", "肩膀", "肩关节", "左肩", "右肩", "双肩", "肩伤", "肩痛", "肩疼", "肩袖", "肩周炎"), {"shoulder", "overhead"}),
+    (("肘部", "肘关节", "左肘", "右肘", "肘伤", "肘痛", "网球肘", "高尔夫球肘"), {"elbow"}),
+    (("手腕", "腕部", "腕关节", "腕管", "腱鞘炎"), {"wrist"}),
+    (("脚踝", "踝关节", "踝部", "左踝", "右踝", "崴脚"), {"ankle", "high_impact"}),
+    (("颈部", "颈椎", "脖子"), {"neck", "overhead"}),
+    (("心脏", "心血管", "心律", "心肌", "心梗", "心衰", "心绞痛", "冠心病"), {"high_intensity", "high_impact", "valsalva"}),
+    (("血压",), {"high_intensity", "valsalva", "isometric"})
+]
+
+# 紧挨在关键词前面的否定词，如"没有心脏病""无膝盖问题"
+NEGATION_WORDS = ("没有", "没", "无", "否认", "不是")
+
 def get_exercise_database():
     """
     获取健身动作数据库
     
+    动作数据从 data/exercises.json 加载一次后共享，返回值不要修改。
+    
     Returns:
-        dict: 包含各类健身动作的数据库
+        dict: 按 部位 -> 水平 -> 动作列表 分组的动作数据库
     """
-    return {
-        "chest": {
-            "beginner": [
-                {"name": "俯卧撑", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["胸大肌"], "description": "经典的胸部训练动作"},
-                {"name": "上斜俯卧撑", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["胸大肌上部"], "description": "脚部抬高的俯卧撑变式"},
-                {"name": "哑铃飞鸟", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["胸大肌"], "description": "胸部孤立训练动作"}
-            ],
-            "intermediate": [
-                {"name": "杠铃卧推", "equipment": "杠铃", "difficulty": "中级", "primary_muscles": ["胸大肌", "三头肌"], "description": "胸部力量训练经典动作"},
-                {"name": "双杠臂屈伸", "equipment": "双杠", "difficulty": "中级", "primary_muscles": ["胸大肌下部", "三头肌"], "description": "上肢复合训练动作"},
-                {"name": "哑铃卧推", "equipment": "哑铃", "difficulty": "中级", "primary_muscles": ["胸大肌"], "description": "单边刺激胸部肌肉"}
-            ]
-        },
-        "back": {
-            "beginner": [
-                {"name": "引体向上", "equipment": "单杠", "difficulty": "中级", "primary_muscles": ["背阔肌"], "description": "背部训练王牌动作"},
-                {"name": "哑铃划船", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["背阔肌", "菱形肌"], "description": "背部厚度训练"},
-                {"name": "弹力带划船", "equipment": "弹力带", "difficulty": "初级", "primary_muscles": ["背阔肌"], "description": "适合初学者的背部训练"}
-            ],
-            "intermediate": [
-                {"name": "杠铃划船", "equipment": "杠铃", "difficulty": "中级", "primary_muscles": ["背阔肌", "菱形肌"], "description": "背部厚度的经典动作"},
-                {"name": "高位下拉", "equipment": "器械", "difficulty": "中级", "primary_muscles": ["背阔肌"], "description": "背部宽度训练"},
-                {"name": "T杠划船", "equipment": "T杠", "difficulty": "中级", "primary_muscles": ["背阔肌", "菱形肌"], "description": "背部中央厚度训练"}
-            ]
-        },
-        "legs": {
-            "beginner": [
-                {"name": "深蹲", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["股四头肌", "臀大肌"], "description": "下肢训练之王"},
-                {"name": "弓步蹲", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["股四头肌", "臀大肌"], "description": "单腿力量训练"},
-                {"name": "臀桥", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["臀大肌", "腘绳肌"], "description": "臀部激活训练"}
-            ],
-            "intermediate": [
-                {"name": "杠铃深蹲", "equipment": "杠铃", "difficulty": "中级", "primary_muscles": ["股四头肌", "臀大肌"], "description": "负重深蹲训练"},
-                {"name": "硬拉", "equipment": "杠铃", "difficulty": "中级", "primary_muscles": ["腘绳肌", "臀大肌", "竖脊肌"], "description": "后链力量训练"},
-                {"name": "保加利亚分腿蹲", "equipment": "无器械", "difficulty": "中级", "primary_muscles": ["股四头肌", "臀大肌"], "description": "单腿深蹲变式"}
-            ]
-        },
-        "shoulders": {
-            "beginner": [
-                {"name": "哑铃推举", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["三角肌"], "description": "肩部综合训练"},
-                {"name": "侧平举", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["三角肌中束"], "description": "肩部宽度训练"},
-                {"name": "前平举", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["三角肌前束"], "description": "肩部前束训练"}
-            ],
-            "intermediate": [
-                {"name": "杠铃推举", "equipment": "杠铃", "difficulty": "中级", "primary_muscles": ["三角肌", "三头肌"], "description": "肩部力量训练"},
-                {"name": "反向飞鸟", "equipment": "哑铃", "difficulty": "中级", "primary_muscles": ["三角肌后束"], "description": "肩部后束训练"},
-                {"name": "阿诺德推举", "equipment": "哑铃", "difficulty": "中级", "primary_muscles": ["三角肌"], "description": "全方位肩部刺激"}
-            ]
-        },
-        "arms": {
-            "beginner": [
-                {"name": "哑铃弯举", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["肱二头肌"], "description": "二头肌经典训练"},
-                {"name": "哑铃臂屈伸", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["肱三头肌"], "description": "三头肌孤立训练"},
-                {"name": "锤式弯举", "equipment": "哑铃", "difficulty": "初级", "primary_muscles": ["肱二头肌", "肱桡肌"], "description": "手臂整体训练"}
-            ],
-            "intermediate": [
-                {"name": "杠铃弯举", "equipment": "杠铃", "difficulty": "中级", "primary_muscles": ["肱二头肌"], "description": "二头肌力量训练"},
-                {"name": "窄距俯卧撑", "equipment": "无器械", "difficulty": "中级", "primary_muscles": ["肱三头肌"], "description": "三头肌复合训练"},
-                {"name": "集中弯举", "equipment": "哑铃", "difficulty": "中级", "primary_muscles": ["肱二头肌"], "description": "二头肌精准刺激"}
-            ]
-        },
-        "core": {
-            "beginner": [
-                {"name": "平板支撑", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["核心肌群"], "description": "核心稳定性训练"},
-                {"name": "卷腹", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["腹直肌"], "description": "腹部经典训练"},
-                {"name": "侧平板支撑", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["腹斜肌"], "description": "侧腹训练"}
-            ],
-            "intermediate": [
-                {"name": "悬垂举腿", "equipment": "单杠", "difficulty": "中级", "primary_muscles": ["下腹部"], "description": "下腹强化训练"},
-                {"name": "俄式转体", "equipment": "无器械", "difficulty": "中级", "primary_muscles": ["腹斜肌"], "description": "腰腹旋转训练"},
-                {"name": "死虫子", "equipment": "无器械", "difficulty": "中级", "primary_muscles": ["核心肌群"], "description": "核心控制训练"}
-            ]
-        },
-        "cardio": {
-            "beginner": [
-                {"name": "快走", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["心肺"], "description": "低冲击有氧运动"},
-                {"name": "原地踏步", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["心肺"], "description": "室内有氧训练"},
-                {"name": "爬楼梯", "equipment": "无器械", "difficulty": "初级", "primary_muscles": ["心肺", "腿部"], "description": "日常有氧训练"}
-            ],
-            "intermediate": [
-                {"name": "慢跑", "equipment": "无器械", "difficulty": "中级", "primary_muscles": ["心肺"], "description": "中等强度有氧"},
-                {"name": "跳绳", "equipment": "跳绳", "difficulty": "中级", "primary_muscles": ["心肺", "小腿"], "description": "高效有氧训练"},
-                {"name": "波比跳", "equipment": "无器械", "difficulty": "中级", "primary_muscles": ["全身", "心肺"], "description": "全身爆发力训练"}
-            ]
-        }
-    }
+    return get_exercise_catalog().as_database()
+
+def get_exercise_by_id(exercise_id: str):
+    """
+    按稳定ID查找动作（ID格式：部位_难度序号，如 chest_b1）
+
+    Args:
+        exercise_id (str): 动作ID
+
+    Returns:
+        dict: 动作信息（包含所属部位 area），未找到时返回None
+    """
+    return get_exercise_catalog().get(exercise_id)
+
+def get_user_limitations(user_data: dict) -> list:
+    """
+    合并用户填写的伤病史和身体限制
+
+    Args:
+        user_data (dict): 用户数据
+
+    Returns:
+        list: 伤病史和身体限制
+    """
+    limitations = user_data.get('limitations') or {}
+    return list(limitations.get('injuries') or []) + list(limitations.get('restrictions') or [])
+
+def _mentions(text: str, keyword: str) -> bool:
+    """text中出现了关键词，且至少有一处前面不是否定词"""
+    start = text.find(keyword)
+    while start != -1:
+        if not text[:start].endswith(NEGATION_WORDS):
+            return True
+        start = text.find(keyword, start + 1)
+    return False
+
+def get_contraindications(limitations: list) -> set:
+    """
+    把身体限制和伤病史转换为需要避开的禁忌标签
+
+    Args:
+        limitations (list): 身体限制和伤病史，如 ["膝盖问题", "右肩旧伤"]
+
+    Returns:
+        set: 禁忌标签，如 {"knee", "high_impact", "shoulder", "overhead"}
+    """
+    tags = set()
+    for limitation in limitations or []:
+        if limitation in LIMITATION_CONTRAINDICATIONS:
+            tags |= LIMITATION_CONTRAINDICATIONS[limitation]
+            continue
+        for keywords, keyword_tags in LIMITATION_KEYWORDS:
+            if any(_mentions(limitation, keyword) for keyword in keywords):
+                tags |= keyword_tags
+    return tags
+
+def format_exercise_catalog(exercises: dict, with_ids: bool = True) -> str:
+    """
+    把推荐动作整理成紧凑的动作目录，每行一个动作，供提示词引用动作ID
+
+    Args:
+        exercises (dict): get_exercises_by_goal_and_level 返回的按部位分组的动作
+        with_ids (bool): 是否在行首附带动作ID
+
+    Returns:
+        str: 形如 "chest_b1 俯卧撑 | 胸大肌 | 无器械" 的多行文本
+    """
+    return "\n".join(
+        f"{exercise['id'] + ' ' if with_ids else ''}{exercise['name']} | {'、'.join(exercise['primary_muscles'])} | {exercise['equipment']}"
+        for exercise_list in exercises.values()
+        for exercise in exercise_list
+    )
 
 def get_safety_guidelines():
     """
@@ -137,7 +155,7 @@ def get_safety_guidelines():
         ]
     }
 
-def get_exercises_by_goal_and_level(goal: str, level: str, target_areas: list = None):
+def get_exercises_by_goal_and_level(goal: str, level: str, target_areas: list = None, limitations: list = None):
     """
     根据目标和水平获取合适的训练动作
     
@@ -145,11 +163,12 @@ def get_exercises_by_goal_and_level(goal: str, level: str, target_areas: list =
         goal (str): 训练目标 ('weight_loss', 'muscle_gain', 'strength', 'endurance')
         level (str): 训练水平 ('beginner', 'intermediate', 'advanced')
         target_areas (list): 目标肌群列表
+        limitations (list): 身体限制和伤病史，与之冲突的动作会被排除
         
     Returns:
         dict: 推荐的训练动作
     """
-    exercises = get_exercise_database()
+    catalog = get_exercise_catalog()
     
     # 根据水平筛选难度
     difficulty_map = {
@@ -170,24 +189,19 @@ def get_exercises_by_goal_and_level(goal: str, level: str, target_areas: list =
     }
     
     # 如果指定了目标部位，使用目标部位；否则使用目标对应的重点部位
+    areas = catalog.areas
     if target_areas:
-        focus_areas = [area.lower() for area in target_areas if area.lower() in exercises]
+        focus_areas = [area.lower() for area in target_areas if area.lower() in areas]
     else:
-        focus_areas = goal_focus.get(goal, list(exercises.keys()))
-    
-    recommended_exercises = {}
-    
-    for area in focus_areas:
-        if area in exercises:
-            area_exercises = []
-            for difficulty_level in ['beginner', 'intermediate']:
-                if difficulty_level in exercises[area]:
-                    for exercise in exercises[area][difficulty_level]:
-                        if exercise['difficulty'] in suitable_difficulties:
-                            area_exercises.append(exercise)
-            recommended_exercises[area] = area_exercises
+        focus_areas = goal_focus.get(goal, list(areas))
     
-    return recommended_exercises
+    # 部位和难度都走索引查询，再按禁忌标签排除不安全的动作，结果按目录顺序排列
+    avoid = get_contraindications(limitations)
+    return {
+        area: list(catalog.find(area=area, difficulty=suitable_difficulties, avoid=avoid))
+        for area in focus_areas
+        if area in areas
+    }
 
 def get_disclaimer():
     """
@@ -0,0 +1,156 @@
+"""
+任务存储 - 保存异步计划生成任务的状态、节点进度和结果
+
+默认使用SQLite文件，同一台机器上的多个worker进程共享任务状态；MemoryJobStore只在单进程内有效。
+存储只保存任务状态和生成结果，不保存用户提交的原始数据。
+"""
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+class JobStore(ABC):
+    """
+    任务存储接口
+
+    任务是可JSON序列化的字典，至少包含 id、status、created_at 和 updated_at。
+    未实现全部方法的子类在实例化时即报错。
+    """
+
+    @abstractmethod
+    def create(self, job: Dict):
+        """保存新任务"""
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> Optional[Dict]:
+        """更新任务的字段并刷新 updated_at，返回更新后的任务；任务不存在时返回None"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        """读取任务，不存在或已过期时返回None"""
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """删除 updated_at 早于给定时间戳的任务，返回删除数"""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """按状态统计的任务数"""
+
+class MemoryJobStore(JobStore):
+    """进程内任务存储"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+
+    def create(self, job: Dict):
+        with self._lock:
+            self._jobs[job["id"]] = copy.deepcopy(job)
+
+    def update(self, job_id: str, **fields) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(copy.deepcopy(fields), updated_at=time.time())
+            return copy.deepcopy(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job["updated_at"] < older_than]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite任务存储，可在进程间共享
+
+    Args:
+        path (str): 数据库文件路径
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def create(self, job: Dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO plan_jobs (id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (job["id"], job["status"], json.dumps(job, ensure_ascii=False), job["updated_at"])
+            )
+
+    def update(self, job_id: str, **fields) -> Optional[Dict]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM plan_jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                job = json.loads(row[0])
+                job.update(fields, updated_at=time.time())
+                self._conn.execute(
+                    "UPDATE plan_jobs SET status = ?, data = ?, updated_at = ? WHERE id = ?",
+                    (job["status"], json.dumps(job, ensure_ascii=False), job["updated_at"], job_id)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM plan_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM plan_jobs WHERE updated_at < ?", (older_than,)).rowcount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM plan_jobs GROUP BY status").fetchall())
+
+def job_store_from_env() -> JobStore:
+    """
+    按环境变量创建任务存储
+
+    JOB_STORE=sqlite（默认）或 memory；JOB_STORE_DB 为SQLite文件路径，默认在系统临时目录下
+    （Vercel等只读文件系统上只有临时目录可写）。
+    """
+    if os.getenv("JOB_STORE", "sqlite").lower() == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(os.getenv("JOB_STORE_DB") or os.path.join(tempfile.gettempdir(), "fitcoach_jobs.sqlite3"))
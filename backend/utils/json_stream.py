@@ -0,0 +1,140 @@
+"""
+增量JSON解析工具 - 在LLM流式输出的过程中，逐个解析出已经完整的字段和数组元素
+"""
+import json
+import logging
+from typing import Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class IncrementalJSONParser:
+    """
+    增量解析一个顶层JSON对象
+    
+    每次feed新文本后返回新完成的事件：
+    - ("field", key, value): 顶层字段的值已经完整
+    - ("item", key, index, value): 被监听的顶层数组（如 daily_workouts）中第index个元素已经完整
+    
+    第一个 "{" 之前的内容（例如 ```json 前缀）会被忽略，顶层对象结束后的内容也会被忽略。
+    
+    Args:
+        watch_arrays (Iterable[str]): 需要逐元素输出的顶层数组字段
+    """
+    
+    def __init__(self, watch_arrays: Iterable[str] = ("daily_workouts",)):
+        self.watch_arrays = set(watch_arrays)
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key_string = None
+        self._key = None
+        self._value_start = None
+        self._item_start = None
+        self._item_index = 0
+        self.done = False
+    
+    @property
+    def text(self) -> str:
+        """目前收到的全部文本"""
+        return self._text
+    
+    def feed(self, chunk: str) -> List[Tuple]:
+        """
+        输入一段新文本
+        
+        Args:
+            chunk (str): LLM流式输出的增量文本
+        
+        Returns:
+            List[Tuple]: 新完成的事件列表
+        """
+        self._text += chunk
+        events = []
+        text = self._text
+        
+        while self._pos < len(text) and not self.done:
+            pos, c = self._pos, text[self._pos]
+            self._pos += 1
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key_string = (self._string_start, pos + 1)
+                continue
+            
+            if not self._stack:
+                # 等待顶层对象开始
+                if c == "{":
+                    self._stack.append(c)
+                continue
+            
+            if self._in_watched_array() and self._item_start is None and not c.isspace() and c not in ",]":
+                self._item_start = pos
+            
+            if c == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif c in "{[":
+                self._stack.append(c)
+            elif c in "}]":
+                if c == "]" and self._in_watched_array():
+                    self._flush_item(pos, events)
+                self._stack.pop()
+                if not self._stack:
+                    self._flush_field(pos, events)
+                    self.done = True
+            elif c == ",":
+                if self._in_watched_array():
+                    self._flush_item(pos, events)
+                elif len(self._stack) == 1:
+                    self._flush_field(pos, events)
+            elif c == ":" and len(self._stack) == 1 and self._last_key_string:
+                start, end = self._last_key_string
+                self._key = json.loads(text[start:end])
+                self._value_start = pos + 1
+                self._item_index = 0
+        
+        return events
+    
+    def _in_watched_array(self) -> bool:
+        return len(self._stack) == 2 and self._stack[-1] == "[" and self._key in self.watch_arrays
+    
+    def _flush_item(self, end: int, events: List[Tuple]):
+        if self._item_start is None:
+            return
+        raw = self._text[self._item_start:end]
+        self._item_start = None
+        try:
+            events.append(("item", self._key, self._item_index, json.loads(raw)))
+        except json.JSONDecodeError as e:
+            logger.warning(f"跳过无法解析的数组元素 {self._key}[{self._item_index}]: {e}")
+        self._item_index += 1
+    
+    def _flush_field(self, end: int, events: List[Tuple]):
+        if self._value_start is None:
+            return
+        raw = self._text[self._value_start:end]
+        self._value_start = None
+        try:
+            events.append(("field", self._key, json.loads(raw)))
+        except json.JSONDecodeError as e:
+            logger.warning(f"跳过无法解析的字段 {self._key}: {e}")
+
+if __name__ == "__main__":
+    # 模拟LLM分块输出
+    sample = '```json\n{"plan_title": "增肌计划", "overview": {"description": "说明, 含{括号}"}, ' \
+             '"daily_workouts": [{"day": 1, "title": "胸"}, {"day": 2, "title": "背\\"部"}], ' \
+             '"safety_reminders": ["热身"]}\n```'
+    
+    parser = IncrementalJSONParser()
+    for i in range(0, len(sample), 7):
+        for event in parser.feed(sample[i:i + 7]):
+            print(event)
@@ -0,0 +1,182 @@
+"""
+LLM response cache - content-addressed cache for LLM completions.
+
+The in-memory tier is an LRU with TTL. An optional SQLite tier (LLM_CACHE_DB)
+survives restarts and is shared by all workers on the same host.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so formatting-only differences hit the same entry"""
+    return " ".join((text or "").split())
+
+def make_cache_key(provider: str, model: str, system_prompt: str, user_prompt: str, **extra) -> str:
+    """
+    Build the cache key for an LLM call.
+    
+    Args:
+        provider: LLM provider name
+        model: Model name
+        system_prompt: System prompt ("" for single-prompt calls)
+        user_prompt: User prompt
+        extra: Any other request options that change the output
+    
+    Returns:
+        A sha256 hex digest of the normalized request
+    """
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "system": normalize_prompt(system_prompt),
+            "user": normalize_prompt(user_prompt),
+            **extra
+        },
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _SQLiteTier:
+    """SQLite-backed cache tier, safe to share between processes"""
+    
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+    
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, expires_at) of a live entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            return row[0], row[1]
+    
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+class ResponseCache:
+    """
+    Two-tier LLM response cache.
+    
+    Args:
+        max_entries: Capacity of the in-memory LRU
+        ttl: Seconds an entry stays valid
+        db_path: Optional SQLite file for the shared disk tier
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400.0, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._disk = _SQLiteTier(db_path) if db_path else None
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    
+    @property
+    def has_disk_tier(self) -> bool:
+        return self._disk is not None
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value or None; disk hits are promoted to memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+        
+        if self._disk is not None:
+            row = self._disk.get(key)
+            if row is not None:
+                # Keep the disk entry's expiry; promotion must not extend its life
+                value, expires_at = row
+                with self._lock:
+                    self._store(key, value, expires_at)
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                return value
+        
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+    
+    def set(self, key: str, value: str):
+        """Store a value in every tier"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            self._stats["writes"] += 1
+        if self._disk is not None:
+            self._disk.set(key, value, expires_at)
+    
+    def _store(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+    
+    def clear(self):
+        """Drop every entry (memory and disk)"""
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+    
+    def stats(self) -> dict:
+        """Hit/miss counters plus current size"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "disk_tier": self._disk is not None
+            }
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """
+    Build the cache from environment variables.
+    
+    LLM_CACHE_ENABLED (default true), LLM_CACHE_MAX_ENTRIES (default 1024),
+    LLM_CACHE_TTL in seconds (default 86400) and LLM_CACHE_DB (SQLite path,
+    disk tier disabled when empty).
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+        db_path=os.getenv("LLM_CACHE_DB") or None
+    )
@@ -0,0 +1,235 @@
+"""
+Hedged LLM requests - race a slow primary call against a second provider.
+
+After a delay (by default the observed p90 latency of the primary) the same
+prompt is sent to a backup provider. The first valid response wins and the
+other call is cancelled; a response that fails validation does not end the
+race, so a fast malformed reply cannot beat a slower valid one. A token
+bucket caps the extra spend: every primary call earns `max_ratio` of a
+hedge, and every hedge costs one.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+class InvalidResponse(ValueError):
+    """
+    A response that arrived but failed validation.
+    
+    Raised by Hedger.call when no call returned a valid response, so the
+    caller can still repair the text against the provider that produced it.
+    """
+    
+    def __init__(self, provider: str, text: str, errors: List[str]):
+        super().__init__(f"Invalid response from {provider}: {errors[:3]}")
+        self.provider = provider
+        self.text = text
+        self.errors = errors
+
+class LatencyTracker:
+    """
+    Sliding window of call latencies, per key.
+    
+    Successful calls record their latency; calls cancelled because the other
+    hedged call won record the time they ran as a lower bound.
+    
+    Args:
+        window: Number of recent samples kept per key
+    """
+    
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+    
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+    
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+    
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """The q-quantile (0-1) of the recorded latencies, or None without samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+    
+    def stats(self) -> dict:
+        """Sample count and p50/p90/p99 per key, in seconds"""
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: {
+                "count": self.count(key),
+                "p50": round(self.percentile(key, 0.5), 3),
+                "p90": round(self.percentile(key, 0.9), 3),
+                "p99": round(self.percentile(key, 0.99), 3)
+            }
+            for key in keys
+        }
+
+class HedgeBudget:
+    """
+    Token bucket limiting hedges to a fraction of primary calls.
+    
+    Args:
+        max_ratio: Hedges allowed per primary call (0.1 = at most 10% extra calls)
+        burst: Maximum number of hedges that can be banked
+    """
+    
+    def __init__(self, max_ratio: float = 0.1, burst: float = 5.0):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+    
+    def record_call(self):
+        """Earn credit for one primary call"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.max_ratio)
+    
+    def try_acquire(self) -> bool:
+        """Spend one hedge if the budget allows it"""
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+class Hedger:
+    """
+    Hedging policy and counters.
+    
+    Args:
+        backup_provider: Provider that receives the hedged request
+        percentile: Latency quantile of the primary used as the hedge delay
+        min_delay: Lower bound of the delay, also used until enough samples exist
+        min_samples: Samples needed before the percentile is trusted
+        budget: Spend cap for hedged requests
+        latency: Tracker shared with unhedged calls
+    """
+    
+    def __init__(self, backup_provider: str, percentile: float = 0.9, min_delay: float = 2.0,
+                 min_samples: int = 20, budget: Optional[HedgeBudget] = None,
+                 latency: Optional[LatencyTracker] = None):
+        self.backup_provider = backup_provider
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.budget = budget or HedgeBudget()
+        self.latency = latency or LatencyTracker()
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "invalid": 0}
+    
+    def delay(self, key: str) -> float:
+        """Seconds to wait for the primary before hedging"""
+        if self.latency.count(key) < self.min_samples:
+            return self.min_delay
+        return max(self.min_delay, self.latency.percentile(key, self.percentile))
+    
+    async def call(self, primary: str, op: str, send: Callable[[str, Optional[float]], Awaitable[str]],
+                   timeout: Optional[float] = None,
+                   validate: Optional[Callable[[str], List[str]]] = None) -> Tuple[str, str]:
+        """
+        Run `send(provider, timeout)` on the primary, hedging to the backup if it is slow.
+        
+        Args:
+            primary: Provider of the first request
+            op: Operation name; latencies are tracked per provider and operation
+            send: Coroutine function performing one LLM call
+            timeout: Overall timeout in seconds
+            validate: Returns the validation errors of a response (empty when valid)
+        
+        Returns:
+            (text, provider) of the first non-empty, valid response. If no call
+            returned one, InvalidResponse is raised when some response failed
+            validation (the primary's preferred), otherwise the primary's error
+        """
+        self._stats["calls"] += 1
+        self.budget.record_call()
+        start = time.monotonic()
+        primary_key = f"{primary}:{op}"
+        
+        async def timed(provider, call_timeout):
+            began = time.monotonic()
+            try:
+                text = await send(provider, call_timeout)
+            except asyncio.CancelledError:
+                # A call cancelled because the other one won took at least this
+                # long; without the lower-bound sample a slow primary would only
+                # ever record its fast replies and the hedge delay would shrink
+                self.latency.record(f"{provider}:{op}", time.monotonic() - began)
+                raise
+            if not text:
+                raise ValueError(f"Empty response from {provider}")
+            self.latency.record(f"{provider}:{op}", time.monotonic() - began)
+            errors = validate(text) if validate is not None else None
+            if errors:
+                self._stats["invalid"] += 1
+                raise InvalidResponse(provider, text, errors)
+            return text
+        
+        tasks = {asyncio.ensure_future(timed(primary, timeout)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay(primary_key))
+            remaining = timeout - (time.monotonic() - start) if timeout else None
+            if not done and (remaining is None or remaining > 0):
+                if self.budget.try_acquire():
+                    self._stats["hedged"] += 1
+                    tasks[asyncio.ensure_future(timed(self.backup_provider, remaining))] = self.backup_provider
+                else:
+                    self._stats["budget_denied"] += 1
+            
+            errors = {}
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] != primary:
+                            self._stats["hedge_wins"] += 1
+                        return task.result(), tasks[task]
+                    errors[tasks[task]] = task.exception()
+            invalid = [errors[p] for p in (primary, self.backup_provider) if isinstance(errors.get(p), InvalidResponse)]
+            raise (invalid or [errors.get(primary) or next(iter(errors.values()))])[0]
+        finally:
+            # Cancel the losing (or still running) request
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def stats(self) -> dict:
+        return {"enabled": True, **self._stats, "backup_provider": self.backup_provider}
+
+def hedger_from_env(latency: Optional[LatencyTracker] = None) -> Optional[Hedger]:
+    """
+    Build the hedging policy from environment variables.
+    
+    LLM_HEDGE_PROVIDER names the backup provider (hedging disabled when
+    empty). LLM_HEDGE_PERCENTILE (default 0.9),
+    LLM_HEDGE_MIN_DELAY in seconds (default 2), LLM_HEDGE_MAX_RATIO (default
+    0.1) and LLM_HEDGE_BURST (default 5) tune the delay and the spend cap.
+    """
+    backup = (os.getenv("LLM_HEDGE_PROVIDER") or "").lower()
+    if not backup:
+        return None
+    return Hedger(
+        backup,
+        percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9")),
+        min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "2")),
+        budget=HedgeBudget(
+            max_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1")),
+            burst=float(os.getenv("LLM_HEDGE_BURST", "5"))
+        ),
+        latency=latency
+    )
@@ -0,0 +1,176 @@
+"""
+Health-scored LLM provider routing with circuit breakers.
+
+Every provider/model keeps an EWMA of its latency and error rate. Sustained
+failures open the provider's circuit breaker: calls are routed to the
+healthiest other provider until a cool-down has passed. Then a single
+half-open probe is let through, and its outcome closes or re-opens the
+breaker.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class ProviderUnavailableError(RuntimeError):
+    """Raised when every candidate provider's circuit breaker is open"""
+
+class ProviderHealth:
+    """
+    Health statistics and breaker state of one provider/model.
+    
+    Args:
+        provider: Provider name
+        model: Model name
+        alpha: EWMA smoothing factor
+    """
+    
+    def __init__(self, provider: str, model: str, alpha: float = 0.2):
+        self.provider = provider
+        self.model = model
+        self.alpha = alpha
+        self.state = CLOSED
+        self.latency_ewma = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+    
+    def score(self) -> float:
+        """Lower is healthier: latency weighted by the error rate"""
+        return (self.latency_ewma or 0.0) * (1.0 + 4.0 * self.error_rate)
+    
+    def observe(self, ok: bool, latency: Optional[float] = None):
+        self.calls += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.consecutive_failures = 0
+            if latency is not None:
+                self.latency_ewma = latency if self.latency_ewma is None else \
+                    self.latency_ewma + self.alpha * (latency - self.latency_ewma)
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+class ProviderRouter:
+    """
+    Picks the provider for each LLM call and tracks call outcomes.
+    
+    Args:
+        providers: Candidate providers, in order of preference
+        model_for: Returns the model configured for a provider
+        failure_threshold: Consecutive failures that open the breaker
+        error_rate_threshold: EWMA error rate that opens the breaker
+        min_calls: Calls needed before the error rate is trusted
+        cooldown: Seconds an open breaker waits before a half-open probe
+        is_failure: Decides whether an exception counts against the provider's health
+    """
+    
+    def __init__(self, providers: Iterable[str], model_for: Callable[[str], str],
+                 failure_threshold: int = 5, error_rate_threshold: float = 0.5,
+                 min_calls: int = 10, cooldown: float = 30.0,
+                 is_failure: Optional[Callable[[BaseException], bool]] = None):
+        self.providers = list(dict.fromkeys(providers))
+        self.model_for = model_for
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.is_failure = is_failure or (lambda exc: True)
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {}
+    
+    def _get(self, provider: str) -> ProviderHealth:
+        model = self.model_for(provider)
+        key = f"{provider}/{model}"
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = ProviderHealth(provider, model)
+        return health
+    
+    def _available(self, health: ProviderHealth, now: float) -> bool:
+        if health.state == OPEN and now - health.opened_at >= self.cooldown:
+            health.state = HALF_OPEN
+        if health.state == HALF_OPEN:
+            return not health.probe_in_flight
+        return health.state == CLOSED
+    
+    def available(self, provider: str) -> bool:
+        """Whether a call to the provider would be let through right now"""
+        with self._lock:
+            return self._available(self._get(provider), time.monotonic())
+    
+    def route(self, requested: str) -> str:
+        """
+        Choose the provider for a call.
+        
+        The requested provider is used while its breaker lets calls through
+        (including the half-open probe); otherwise the healthiest available
+        candidate is used. A requested provider outside the candidate list is
+        only used when no candidates are configured.
+        
+        Raises:
+            ProviderUnavailableError: Every candidate's breaker is open
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [requested] if requested in self.providers or not self.providers else []
+            candidates += [p for p in self.providers if p != requested]
+            available = [self._get(p) for p in candidates if self._available(self._get(p), now)]
+            if not available:
+                raise ProviderUnavailableError(f"All LLM providers are unavailable (circuit open): {', '.join(candidates)}")
+            chosen = available[0] if available[0].provider == requested else min(available, key=ProviderHealth.score)
+            if chosen.state == HALF_OPEN:
+                chosen.probe_in_flight = True
+            return chosen.provider
+    
+    def record_success(self, provider: str, latency: float):
+        with self._lock:
+            health = self._get(provider)
+            health.observe(True, latency)
+            if health.state != CLOSED:
+                # The probe succeeded: restore the provider
+                health.state, health.opened_at, health.error_rate = CLOSED, None, 0.0
+            health.probe_in_flight = False
+    
+    def record_failure(self, provider: str, exc: BaseException):
+        with self._lock:
+            health = self._get(provider)
+            health.probe_in_flight = False
+            if not self.is_failure(exc):
+                return
+            health.observe(False)
+            tripped = health.consecutive_failures >= self.failure_threshold or (
+                health.calls >= self.min_calls and health.error_rate >= self.error_rate_threshold
+            )
+            if health.state == HALF_OPEN or (health.state == CLOSED and tripped):
+                health.state, health.opened_at = OPEN, time.monotonic()
+    
+    def release(self, provider: str):
+        """Forget a call that was cancelled before it finished"""
+        with self._lock:
+            self._get(provider).probe_in_flight = False
+    
+    def status(self) -> Dict:
+        """Breaker state and health statistics per provider/model"""
+        now = time.monotonic()
+        with self._lock:
+            for provider in self.providers:
+                self._get(provider)
+            return {
+                key: {
+                    "provider": h.provider,
+                    "model": h.model,
+                    "state": h.state,
+                    "latency_ewma": round(h.latency_ewma, 3) if h.latency_ewma is not None else None,
+                    "error_rate": round(h.error_rate, 4),
+                    "consecutive_failures": h.consecutive_failures,
+                    "calls": h.calls,
+                    "failures": h.failures,
+                    "retry_in": round(max(0.0, self.cooldown - (now - h.opened_at)), 1) if h.state == OPEN else None
+                }
+                for key, h in self._health.items()
+            }
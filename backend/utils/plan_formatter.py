@@ -4,10 +4,19 @@
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union
 
 logger = logging.getLogger(__name__)
 
+# 标准热身和放松环节（基础计划和紧凑计划展开时使用）
+DEFAULT_WARM_UP = ["动态热身 - 5分钟", "关节活动操", "轻量级预备动作"]
+DEFAULT_COOL_DOWN = ["静态拉伸 - 5分钟", "深呼吸放松", "目标肌群拉伸"]
+
+# 规则生成计划时每组动作的平均做功时间（秒），以及每天安排的动作数上限（约每8分钟一个动作）
+WORK_SECONDS_PER_SET = 40
+MIN_EXERCISES_PER_DAY = 4
+MAX_EXERCISES_PER_DAY = 8
+
 def format_weekly_plan(raw_plan: Dict, user_data: Dict) -> Dict:
     """
     格式化周训练计划
@@ -37,18 +46,34 @@ def format_weekly_plan(raw_plan: Dict, user_data: Dict) -> Dict:
     
     return formatted_plan
 
-def create_daily_workout(day: int, focus_area: str, exercises: List[Dict], user_level: str) -> Dict:
+def _workout_item(exercise: Dict, sets: int, reps: str, rest: str, user_level: str) -> Dict:
+    """动作库中的动作转换为计划中的训练动作"""
+    return {
+        "id": exercise.get('id'),
+        "name": exercise.get('name', '未知动作'),
+        "target_muscles": list(exercise.get('primary_muscles', [])),
+        "equipment": exercise.get('equipment', '无器械'),
+        "sets": sets,
+        "reps": reps,
+        "rest": rest,
+        "description": exercise.get('description', ''),
+        "tips": generate_exercise_tips(exercise.get('name', ''), user_level)
+    }
+
+def create_daily_workout(day: int, focus_area: str, exercises: List[Dict], user_level: str,
+                         session_minutes: int = 45) -> Dict:
     """
-    创建单日训练计划
+    创建单日训练计划，按单次训练时长安排动作数量和组数
     
     Args:
-        day (int): 训练日（1-7）
-        focus_area (str): 训练重点部位
-        exercises (List[Dict]): 训练动作列表
+        day (int): 训练日序号（从1开始）
+        focus_area (str): 训练重点
+        exercises (List[Dict]): 按优先级排列的候选动作，时间不够时只使用靠前的动作
         user_level (str): 用户水平
+        session_minutes (int): 单次训练时长（分钟）
         
     Returns:
-        Dict: 单日训练计划
+        Dict: 单日训练计划，结构与LLM生成计划的 daily_workouts 项相同，另含预计时长 total_time
     """
     # 根据用户水平调整训练参数
     level_params = {
@@ -58,53 +83,60 @@ def create_daily_workout(day: int, focus_area: str, exercises: List[Dict], user_
     }
     
     params = level_params.get(user_level, level_params['beginner'])
+    minutes_per_set = (WORK_SECONDS_PER_SET + params['rest']) / 60
     
-    daily_plan = {
-        "day": f"第{day}天",
-        "focus": focus_area,
-        "warm_up": {
-            "duration": 5,
-            "exercises": [
-                "动态热身 - 5分钟",
-                "关节活动操",
-                "轻量级预备动作"
-            ]
-        },
-        "main_workout": [],
-        "cool_down": {
-            "duration": 5,
-            "exercises": [
-                "静态拉伸 - 5分钟",
-                "深呼吸放松",
-                "目标肌群拉伸"
-            ]
-        },
-        "total_time": 0
-    }
+    # 热身和放松各5分钟，短时训练各3分钟，其余时间安排主训练
+    phase_minutes = 5 if session_minutes >= 30 else 3
+    budget = session_minutes - 2 * phase_minutes
+    used = 0.0
+    max_exercises = max(MIN_EXERCISES_PER_DAY, min(MAX_EXERCISES_PER_DAY, session_minutes // 8))
     
-    # 添加主要训练动作
-    for i, exercise in enumerate(exercises):
-        if i >= 5:  # 限制每天最多5个动作
+    main_exercises = []
+    for exercise in exercises:
+        if len(main_exercises) >= max_exercises:
             break
-            
-        workout_item = {
-            "order": i + 1,
-            "name": exercise.get('name', '未知动作'),
-            "sets": params['sets'][1] if i < 2 else params['sets'][0],  # 前两个动作多做一组
-            "reps": f"{params['reps'][0]}-{params['reps'][1]}",
-            "rest": f"{params['rest']}秒",
-            "equipment": exercise.get('equipment', '无器械'),
-            "target_muscles": exercise.get('primary_muscles', []),
-            "description": exercise.get('description', ''),
-            "tips": generate_exercise_tips(exercise.get('name', ''), user_level)
-        }
-        daily_plan["main_workout"].append(workout_item)
-    
-    # 计算总时间
-    main_time = len(daily_plan["main_workout"]) * 3  # 每个动作约3分钟
-    daily_plan["total_time"] = daily_plan["warm_up"]["duration"] + main_time + daily_plan["cool_down"]["duration"]
+        if "心肺" in exercise.get('primary_muscles', []):
+            # 有氧动作按时长安排：5-15分钟，不超过剩余时间的一半
+            minutes = int(min(15, (budget - used) / 2))
+            if minutes < 5:
+                continue
+            sets, reps, rest, cost = 1, f"{minutes}分钟", "-", minutes
+        else:
+            sets = params['sets'][1] if len(main_exercises) < 2 else params['sets'][0]  # 前两个动作多做一组
+            reps, rest, cost = f"{params['reps'][0]}-{params['reps'][1]}", f"{params['rest']}秒", sets * minutes_per_set
+            if used + cost > budget:
+                continue
+        main_exercises.append(_workout_item(exercise, sets, reps, rest, user_level))
+        used += cost
+    
+    # 时间还有富余时给组数较少的力量动作轮流加组，不超过该水平的组数上限
+    strength_exercises = [item for item in main_exercises if item['rest'] != "-"]
+    while strength_exercises and used + minutes_per_set <= budget:
+        candidates = [item for item in strength_exercises if item['sets'] < params['sets'][1]]
+        if not candidates:
+            break
+        min(candidates, key=lambda item: item['sets'])['sets'] += 1
+        used += minutes_per_set
+    
+    # 仍有5分钟以上富余时用有氧动作收尾
+    if budget - used >= 5:
+        scheduled = {item['name'] for item in main_exercises}
+        finisher = next((exercise for exercise in exercises
+                         if "心肺" in exercise.get('primary_muscles', []) and exercise.get('name') not in scheduled), None)
+        if finisher is not None:
+            minutes = int(min(20, budget - used))
+            main_exercises.append(_workout_item(finisher, 1, f"{minutes}分钟", "-", user_level))
+            used += minutes
     
-    return daily_plan
+    return {
+        "day": day,
+        "title": focus_area,
+        "focus": focus_area,
+        "warm_up": {"duration": phase_minutes, "exercises": list(DEFAULT_WARM_UP)},
+        "main_exercises": main_exercises,
+        "cool_down": {"duration": phase_minutes, "exercises": list(DEFAULT_COOL_DOWN)},
+        "total_time": round(2 * phase_minutes + used)
+    }
 
 def generate_exercise_tips(exercise_name: str, level: str) -> List[str]:
     """
@@ -142,6 +174,65 @@ def generate_exercise_tips(exercise_name: str, level: str) -> List[str]:
     
     return tips
 
+def expand_compact_workout(workout: Dict, level: str) -> Dict:
+    """
+    把紧凑格式的单日训练展开为完整结构
+    
+    紧凑格式的动作只有ID、组数、次数和休息时间，动作名称、目标肌群和说明从动作库读取，
+    技巧由 generate_exercise_tips 生成，热身和放松使用标准环节
+    
+    Args:
+        workout (Dict): 紧凑格式的单日训练（day / title / focus / exercises）
+        level (str): 用户水平
+        
+    Returns:
+        Dict: 与完整计划 daily_workouts 相同结构的单日训练
+    """
+    from .fitness_knowledge import get_exercise_by_id
+    
+    main_exercises = []
+    for item in workout.get('exercises', []):
+        exercise = get_exercise_by_id(item.get('id', ''))
+        if exercise is None:
+            logger.warning(f"忽略未知动作ID: {item.get('id')}")
+            continue
+        main_exercises.append({
+            "id": exercise['id'],
+            "name": exercise['name'],
+            "target_muscles": list(exercise['primary_muscles']),
+            "equipment": exercise['equipment'],
+            "sets": item.get('sets', 3),
+            "reps": item.get('reps', '8-12'),
+            "rest": item.get('rest', '60秒'),
+            "description": exercise['description'],
+            "tips": generate_exercise_tips(exercise['name'], level)
+        })
+    
+    return {
+        "day": workout.get('day'),
+        "title": workout.get('title', ''),
+        "focus": workout.get('focus', ''),
+        "warm_up": {"duration": 5, "exercises": list(DEFAULT_WARM_UP)},
+        "main_exercises": main_exercises,
+        "cool_down": {"duration": 5, "exercises": list(DEFAULT_COOL_DOWN)}
+    }
+
+def expand_compact_plan(compact_plan: Dict, level: str) -> Dict:
+    """
+    把紧凑格式的计划展开为完整计划结构（只替换 daily_workouts，其余字段原样保留）
+    
+    Args:
+        compact_plan (Dict): 符合 compact_plan_schema 的计划数据
+        level (str): 用户水平
+        
+    Returns:
+        Dict: 符合 plan_schema 结构的计划数据
+    """
+    return {
+        **compact_plan,
+        "daily_workouts": [expand_compact_workout(workout, level) for workout in compact_plan.get('daily_workouts', [])]
+    }
+
 def create_progression_plan(weeks: int = 4) -> Dict:
     """
     创建进阶计划
@@ -209,20 +300,8 @@ def add_safety_reminders(plan: Dict, user_limitations: List[str]) -> List[str]:
     
     return safety_notes
 
-def format_complete_plan(raw_plan_data: str, user_data: Dict) -> Dict:
-    """
-    完整格式化训练计划
-    
-    Args:
-        raw_plan_data (str): LLM生成的原始计划文本
-        user_data (Dict): 用户数据
-        
-    Returns:
-        Dict: 完整格式化的训练计划
-    """
-    from .fitness_knowledge import get_disclaimer
-    
-    # 解析LLM返回的JSON格式训练计划
+def _parse_plan_text(raw_plan_data: str, user_data: Dict) -> Dict:
+    """从LLM返回的文本中提取JSON计划（未使用结构化输出时），失败时返回备用计划结构"""
     try:
         # 清理可能的额外文本，只保留JSON部分
         json_start = raw_plan_data.find('{')
@@ -232,13 +311,13 @@ def format_complete_plan(raw_plan_data: str, user_data: Dict) -> Dict:
             clean_json = raw_plan_data[json_start:json_end]
             parsed_plan = json.loads(clean_json)
             logger.info("成功解析LLM返回的JSON格式训练计划")
-        else:
-            raise ValueError("未找到有效的JSON格式")
+            return parsed_plan
+        raise ValueError("未找到有效的JSON格式")
             
     except Exception as e:
         logger.error(f"解析LLM返回的JSON失败: {e}")
         # 创建备用计划结构
-        parsed_plan = {
+        return {
             "plan_title": "备用训练计划",
             "overview": {"description": raw_plan_data[:500] + "..."},
             "daily_workouts": [],
@@ -247,6 +326,25 @@ def format_complete_plan(raw_plan_data: str, user_data: Dict) -> Dict:
                 "session_duration": user_data['schedule']['time_per_session']
             }
         }
+
+def format_complete_plan(raw_plan_data: Union[str, Dict], user_data: Dict) -> Dict:
+    """
+    完整格式化训练计划
+    
+    Args:
+        raw_plan_data (Union[str, Dict]): 结构化输出已校验的计划数据，或LLM生成的原始计划文本
+        user_data (Dict): 用户数据
+        
+    Returns:
+        Dict: 完整格式化的训练计划
+    """
+    from .fitness_knowledge import get_disclaimer
+    
+    # 解析LLM返回的JSON格式训练计划
+    if isinstance(raw_plan_data, dict):
+        parsed_plan = raw_plan_data
+    else:
+        parsed_plan = _parse_plan_text(raw_plan_data, user_data)
     
     # 创建完整的格式化计划，使用LLM解析后的JSON数据
     formatted_plan = {
@@ -302,7 +400,20 @@ def generate_weekly_schedule(user_data: Dict) -> Dict:
     goal = user_data['goals']['primary_goal']
     
     # 根据训练频率和目标安排训练内容
-    if days_per_week == 3:
+    if days_per_week == 2:
+        if goal in ['muscle_gain', 'strength']:
+            schedule = {
+                "周二": "上肢训练",
+                "周五": "下肢 + 核心训练",
+                "其他": "休息日（可进行轻度有氧）"
+            }
+        else:
+            schedule = {
+                "周二": "全身力量训练",
+                "周五": "有氧 + 核心训练",
+                "其他": "休息日（建议散步等轻度活动）"
+            }
+    elif days_per_week == 3:
         if goal in ['muscle_gain', 'strength']:
             schedule = {
                 "周一": "胸部 + 三头肌",
@@ -334,6 +445,16 @@ def generate_weekly_schedule(user_data: Dict) -> Dict:
             "周六": "核心 + 有氧",
             "其他": "休息日"
         }
+    elif days_per_week == 6:
+        schedule = {
+            "周一": "胸部 + 肩部 + 三头肌",
+            "周二": "背部 + 二头肌",
+            "周三": "腿部训练",
+            "周四": "胸部 + 肩部",
+            "周五": "背部 + 手臂",
+            "周六": "腿部 + 核心",
+            "其他": "休息日"
+        }
     else:  # 默认3天
         schedule = {
             "周一": "上肢训练",
@@ -344,24 +465,65 @@ def generate_weekly_schedule(user_data: Dict) -> Dict:
     
     return schedule
 
+# 训练重点中的关键词对应的动作库部位，按关键词在训练重点中出现的顺序选取
+_FOCUS_AREAS = [
+    ("胸", ["chest"]),
+    ("背", ["back"]),
+    ("腿", ["legs"]),
+    ("下肢", ["legs"]),
+    ("臀", ["legs"]),
+    ("肩", ["shoulders"]),
+    ("手臂", ["arms"]),
+    ("二头", ["arms"]),
+    ("三头", ["arms"]),
+    ("核心", ["core"]),
+    ("有氧", ["cardio"]),
+    ("上肢", ["chest", "back", "shoulders", "arms"]),
+    ("全身", ["legs", "chest", "back", "core"])
+]
+
+# 训练重点只写了二头肌或三头肌时，手臂部位只选主要肌群对应的动作
+_FOCUS_ARM_MUSCLES = [("二头", "肱二头肌"), ("三头", "肱三头肌")]
+
+def _focus_areas(focus: str) -> List[str]:
+    """训练重点对应的动作库部位，没有匹配的关键词时按全身训练处理"""
+    matches = sorted((focus.find(keyword), areas) for keyword, areas in _FOCUS_AREAS if keyword in focus)
+    areas = [area for _, match_areas in matches for area in match_areas]
+    return list(dict.fromkeys(areas)) or ["legs", "chest", "back", "core"]
+
+def _interleave(lists: List[List[Dict]], offset: int = 0) -> List[Dict]:
+    """轮流从各部位取动作；offset 使同一部位在不同训练日从不同动作开始"""
+    rotated = [items[offset % len(items):] + items[:offset % len(items)] for items in lists if items]
+    result = []
+    for i in range(max((len(items) for items in rotated), default=0)):
+        result.extend(items[i] for items in rotated if i < len(items))
+    return result
+
 def generate_daily_plans(user_data: Dict) -> List[Dict]:
     """
     生成每日训练计划
     
+    动作评分引擎一次为全部动作打分，每天按部位取分数最高的动作：先安排训练重点对应部位，
+    再用目标部位和核心动作补足，动作数量和组数按单次训练时长安排。
+    已安排过的动作会被扣分，相同重点的训练日因此换用不同动作。
+    
     Args:
         user_data (Dict): 用户数据
         
     Returns:
         List[Dict]: 每日训练计划列表
     """
-    from .fitness_knowledge import get_exercises_by_goal_and_level
+    import numpy as np
+    from .exercise_scoring import get_exercise_scorer, EXCLUDED_SCORE, REPEAT_PENALTY
     
-    goal = user_data['goals']['primary_goal']
     level = user_data['basic_info']['experience']
-    target_areas = user_data['goals'].get('target_areas', [])
+    session_minutes = user_data['schedule']['time_per_session']
+    target_areas = [area.lower() for area in user_data['goals'].get('target_areas', [])]
     
-    # 获取适合的训练动作
-    exercises = get_exercises_by_goal_and_level(goal, level, target_areas)
+    # 难度不符或与身体限制冲突的动作在评分时已被排除
+    scorer = get_exercise_scorer()
+    scores = scorer.score(user_data)
+    arm_rows = scorer.area_mask(["arms"])
     
     daily_plans = []
     schedule = generate_weekly_schedule(user_data)
@@ -369,37 +531,107 @@ def generate_daily_plans(user_data: Dict) -> List[Dict]:
     day_counter = 1
     for day, focus in schedule.items():
         if day != "其他":
-            # 根据focus确定主要训练部位
-            if "胸部" in focus:
-                main_exercises = exercises.get('chest', [])
-            elif "背部" in focus:
-                main_exercises = exercises.get('back', [])
-            elif "腿部" in focus:
-                main_exercises = exercises.get('legs', [])
-            elif "肩部" in focus:
-                main_exercises = exercises.get('shoulders', [])
-            elif "手臂" in focus:
-                main_exercises = exercises.get('arms', [])
-            elif "核心" in focus:
-                main_exercises = exercises.get('core', [])
-            elif "有氧" in focus:
-                main_exercises = exercises.get('cardio', [])
-            else:
-                # 全身训练，混合各部位
-                main_exercises = []
-                for area in ['legs', 'chest', 'back', 'core']:
-                    main_exercises.extend(exercises.get(area, [])[:1])
+            areas = _focus_areas(focus)
+            # 目标部位和核心动作补足，有氧动作放在最后，只在时间富余时用于收尾
+            filler_areas = [area for area in target_areas + ["core", "cardio"] if area in scorer.areas and area not in areas]
+            day_scores = scores
+            arm_muscles = [muscle for keyword, muscle in _FOCUS_ARM_MUSCLES if keyword in focus]
+            if arm_muscles:
+                # 如"胸部 + 三头肌"：排除其他肌群（如二头肌弯举）的手臂动作
+                day_scores = np.where(arm_rows & ~scorer.muscle_mask(arm_muscles), EXCLUDED_SCORE, scores)
+            ranked = scorer.rank_areas(day_scores, areas + filler_areas, MAX_EXERCISES_PER_DAY)
             
-            daily_plan = create_daily_workout(day_counter, focus, main_exercises[:5], level)
+            main_exercises = _interleave([ranked[area] for area in areas])
+            candidates = main_exercises + _interleave([ranked[area] for area in filler_areas])
+            
+            daily_plan = create_daily_workout(day_counter, focus, candidates, level, session_minutes)
             daily_plan["scheduled_day"] = day
             daily_plans.append(daily_plan)
+            scores[[scorer.position(item['id']) for item in daily_plan['main_exercises']]] -= REPEAT_PENALTY
             day_counter += 1
     
     return daily_plans
 
+GOAL_NAMES = {
+    'weight_loss': '减脂塑形',
+    'muscle_gain': '增肌塑体',
+    'strength': '力量提升',
+    'endurance': '耐力增强',
+    'toning': '身体塑形'
+}
+
+LEVEL_NAMES = {
+    'beginner': '初级',
+    'intermediate': '中级',
+    'advanced': '高级'
+}
+
+def generate_rule_based_plan(user_data: Dict) -> Dict:
+    """
+    不调用LLM，用动作库和规则生成完整训练计划
+    
+    结果与LLM结构化输出的计划结构相同，可直接交给 format_complete_plan；
+    支持每周2-6次训练，动作按单次训练时长安排，耗时在毫秒级
+    
+    Args:
+        user_data (Dict): 验证后的用户数据
+        
+    Returns:
+        Dict: 符合 plan_schema 结构的计划数据
+    """
+    from .fitness_knowledge import get_safety_guidelines
+    
+    goal = user_data['goals']['primary_goal']
+    level = user_data['basic_info']['experience']
+    days = user_data['schedule']['days_per_week']
+    minutes = user_data['schedule']['time_per_session']
+    goal_name = GOAL_NAMES.get(goal, '健身')
+    
+    schedule = generate_weekly_schedule(user_data)
+    guidelines = get_safety_guidelines()
+    
+    # 只保留与当前目标相关的饮食建议
+    skipped_tip = {'weight_loss': "增肌期", 'muscle_gain': "减脂期"}.get(goal)
+    nutrition_tips = [
+        tip for tip in guidelines['nutrition']
+        if not tip.startswith(("减脂期", "增肌期")) or (skipped_tip and not tip.startswith(skipped_tip))
+    ]
+    
+    safety_reminders = list(guidelines['general'])
+    if level == 'beginner':
+        safety_reminders += guidelines['beginner'][:2]
+    
+    return {
+        "plan_title": f"{goal_name}训练计划 - 每周{days}练",
+        "overview": {
+            "description": f"这是一份为{LEVEL_NAMES.get(level, level)}水平制定的{goal_name}计划，"
+                           f"每周训练{days}次，每次约{minutes}分钟，动作均来自内置动作库。",
+            "principles": [
+                "循序渐进，重视动作质量",
+                "合理安排休息，避免过度训练",
+                "注意饮食和睡眠配合",
+                "有问题及时调整"
+            ]
+        },
+        "weekly_plan": {
+            "total_days": days,
+            "session_duration": minutes,
+            "rest_days": schedule.get("其他", "休息日")
+        },
+        "daily_workouts": generate_daily_plans(user_data),
+        "progression": {
+            f"week{index}": f"{week['focus']}（强度{week['intensity']}）：{week['notes']}"
+            for index, week in enumerate(create_progression_plan().values(), 1)
+        },
+        "nutrition_tips": nutrition_tips,
+        "safety_reminders": safety_reminders
+    }
+
 if __name__ == "__main__":
-    # 测试格式化功能
-    print("=== 训练计划格式化测试 ===")
+    import time
+    
+    # 测试规则计划生成和格式化
+    print("=== 规则训练计划测试 ===")
     
     # 模拟用户数据
     test_user_data = {
@@ -409,20 +641,15 @@ if __name__ == "__main__":
         "limitations": {"restrictions": ["膝盖问题"]}
     }
     
-    # 模拟LLM生成的原始计划
-    raw_plan = "针对初学者的增肌计划，重点训练胸部和手臂"
-    
-    # 格式化计划
-    formatted = format_complete_plan(raw_plan, test_user_data)
-    
-    print("计划概述：")
-    print(f"  标题: {formatted['overview']['title']}")
-    print(f"  频率: {formatted['overview']['frequency']}")
-    print(f"  时长: {formatted['overview']['session_time']}")
-    
-    print("\n周训练安排：")
-    for day, content in formatted['weekly_schedule'].items():
-        print(f"  {day}: {content}")
+    for days in range(2, 7):
+        test_user_data["schedule"]["days_per_week"] = days
+        start = time.perf_counter()
+        formatted = format_complete_plan(generate_rule_based_plan(test_user_data), test_user_data)
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        print(f"\n{formatted['overview']['title']}（{elapsed:.2f} ms）")
+        for workout in formatted['daily_workouts']:
+            names = "、".join(f"{item['name']}×{item['sets']}" for item in workout['main_exercises'])
+            print(f"  {workout['scheduled_day']} {workout['focus']}（约{workout['total_time']}分钟）: {names}")
     
-    print(f"\n每日计划数量: {len(formatted['daily_plans'])}")
-    print(f"安全提醒数量: {len(formatted['safety_notes'])}")
+    print(f"\n安全提醒数量: {len(formatted['safety_notes'])}")
@@ -0,0 +1,200 @@
+"""
+计划数据结构 - 目标分析和训练计划的JSON Schema，用于LLM结构化输出和结果校验
+"""
+from typing import Dict, List
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# 目标分析结果
+ANALYSIS_SCHEMA = {
+    "title": "goal_analysis",
+    "type": "object",
+    "properties": {
+        "fitness_level": {"type": "string"},
+        "recommended_intensity": {"type": "string"},
+        "suitable_exercise_types": _STRING_LIST,
+        "risk_factors": _STRING_LIST,
+        "training_focus": {"type": "string"},
+        "weekly_structure": {"type": "string"}
+    },
+    "required": ["fitness_level", "recommended_intensity", "suitable_exercise_types", "risk_factors"]
+}
+
+# 单个训练动作
+EXERCISE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "target_muscles": _STRING_LIST,
+        "sets": {"type": "integer", "minimum": 1},
+        "reps": {"type": "string"},
+        "rest": {"type": "string"},
+        "description": {"type": "string"},
+        "tips": _STRING_LIST
+    },
+    "required": ["name", "sets", "reps"]
+}
+
+# 热身 / 放松环节
+_PHASE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "duration": {"type": "integer", "minimum": 0},
+        "exercises": _STRING_LIST
+    },
+    "required": ["exercises"]
+}
+
+# 单日训练（完整格式）
+WORKOUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "day": {"type": "integer", "minimum": 1},
+        "title": {"type": "string"},
+        "focus": {"type": "string"},
+        "warm_up": _PHASE_SCHEMA,
+        "main_exercises": {"type": "array", "minItems": 1, "items": EXERCISE_SCHEMA},
+        "cool_down": _PHASE_SCHEMA
+    },
+    "required": ["day", "title", "main_exercises"]
+}
+
+# 计划骨架中的单日训练：只有标题和训练重点，动作由逐日生成补全
+_SKELETON_DAY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "day": {"type": "integer", "minimum": 1},
+        "title": {"type": "string"},
+        "focus": {"type": "string"}
+    },
+    "required": ["day", "title", "focus"]
+}
+
+def _plan_schema(days_per_week: int, workout_schema: Dict, title: str = "fitness_plan") -> Dict:
+    """计划整体结构，daily_workouts 中每天的结构由 workout_schema 给出"""
+    return {
+        "title": title,
+        "type": "object",
+        "properties": {
+            "plan_title": {"type": "string"},
+            "overview": {
+                "type": "object",
+                "properties": {
+                    "description": {"type": "string"},
+                    "principles": _STRING_LIST
+                },
+                "required": ["description"]
+            },
+            "weekly_plan": {
+                "type": "object",
+                "properties": {
+                    "total_days": {"type": "integer"},
+                    "session_duration": {"type": "integer"},
+                    "rest_days": {"type": "string"}
+                }
+            },
+            "daily_workouts": {
+                "type": "array",
+                "minItems": days_per_week,
+                "maxItems": days_per_week,
+                "items": workout_schema
+            },
+            "progression": {"type": "object"},
+            "nutrition_tips": _STRING_LIST,
+            "safety_reminders": _STRING_LIST
+        },
+        "required": ["plan_title", "overview", "daily_workouts", "safety_reminders"]
+    }
+
+def plan_schema(days_per_week: int) -> Dict:
+    """
+    训练计划的JSON Schema
+    
+    Args:
+        days_per_week (int): 每周训练天数，daily_workouts 必须正好包含这么多天
+    
+    Returns:
+        Dict: JSON Schema
+    """
+    return _plan_schema(days_per_week, WORKOUT_SCHEMA)
+
+def compact_workout_schema(exercise_ids: List[str]) -> Dict:
+    """
+    紧凑格式单日训练的JSON Schema - 动作只引用动作目录中的ID和训练参数
+    
+    Args:
+        exercise_ids (List[str]): 提示词动作目录中的动作ID
+    
+    Returns:
+        Dict: JSON Schema
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "day": {"type": "integer", "minimum": 1},
+            "title": {"type": "string"},
+            "focus": {"type": "string"},
+            "exercises": {
+                "type": "array",
+                "minItems": 1,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string", "enum": exercise_ids},
+                        "sets": {"type": "integer", "minimum": 1},
+                        "reps": {"type": "string"},
+                        "rest": {"type": "string"}
+                    },
+                    "required": ["id", "sets", "reps"]
+                }
+            }
+        },
+        "required": ["day", "title", "exercises"]
+    }
+
+def compact_plan_schema(days_per_week: int, exercise_ids: List[str]) -> Dict:
+    """
+    紧凑训练计划的JSON Schema - 动作只引用动作目录中的ID，不输出名称、说明和技巧
+    
+    热身、放松和动作详情由服务端展开（plan_formatter.expand_compact_plan），大幅减少LLM输出token
+    
+    Args:
+        days_per_week (int): 每周训练天数
+        exercise_ids (List[str]): 提示词动作目录中的动作ID
+    
+    Returns:
+        Dict: JSON Schema
+    """
+    return _plan_schema(days_per_week, compact_workout_schema(exercise_ids))
+
+def plan_skeleton_schema(days_per_week: int) -> Dict:
+    """
+    计划骨架的JSON Schema - 与完整计划相同，但每天只有标题和训练重点
+    
+    Args:
+        days_per_week (int): 每周训练天数
+    
+    Returns:
+        Dict: JSON Schema
+    """
+    return _plan_schema(days_per_week, _SKELETON_DAY_SCHEMA, title="plan_skeleton")
+
+def fused_plan_schema(plan: Dict) -> Dict:
+    """
+    单次调用同时返回目标分析和训练计划的JSON Schema，analysis 在前，模型先分析再制定计划
+
+    Args:
+        plan (Dict): 训练计划部分的Schema（plan_schema 或 compact_plan_schema）
+
+    Returns:
+        Dict: JSON Schema
+    """
+    return {
+        "title": "fused_plan",
+        "type": "object",
+        "properties": {
+            "analysis": ANALYSIS_SCHEMA,
+            "plan": plan
+        },
+        "required": ["analysis", "plan"]
+    }
@@ -0,0 +1,169 @@
+"""
+预计算计划表 - 离线为每个 (目标, 水平, 每周天数, 时长分段) 组合生成计划，存为紧凑的二进制文件并在启动时内存映射
+
+文件格式：4字节魔数 + 4字节头部长度（小端） + JSON头部（元信息和 键 -> [偏移, 长度] 索引） + 逐条zlib压缩的计划JSON。
+查询只读取索引指向的那一段并解压，不会把整个文件读入内存。
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FPT1"
+
+# 默认计划表文件，可通过环境变量 PLAN_TABLE_PATH 指定其他文件
+DEFAULT_PLAN_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'plan_table.bin')
+
+# 计划表覆盖的输入空间
+PLAN_TABLE_GOALS = ('weight_loss', 'muscle_gain', 'strength', 'endurance', 'toning')
+PLAN_TABLE_LEVELS = ('beginner', 'intermediate', 'advanced')
+PLAN_TABLE_DAYS = (2, 3, 4, 5, 6)
+# 单次训练时长分段（分钟），用户时长向下取到最近的分段，计划不会超出用户的时间
+PLAN_TABLE_MINUTES = (20, 30, 45, 60, 75, 90, 120)
+
+def bucket_minutes(minutes: int) -> int:
+    """把单次训练时长向下取到最近的分段，短于最小分段时取最小分段"""
+    return max((bucket for bucket in PLAN_TABLE_MINUTES if bucket <= minutes), default=PLAN_TABLE_MINUTES[0])
+
+def table_key(goal: str, level: str, days: int, minutes: int) -> str:
+    """计划表的键，形如 muscle_gain|beginner|3|45"""
+    return f"{goal}|{level}|{days}|{bucket_minutes(minutes)}"
+
+def iter_table_combinations() -> Iterator[Tuple[str, str, int, int]]:
+    """遍历计划表覆盖的全部 (目标, 水平, 每周天数, 时长分段) 组合"""
+    for goal in PLAN_TABLE_GOALS:
+        for level in PLAN_TABLE_LEVELS:
+            for days in PLAN_TABLE_DAYS:
+                for minutes in PLAN_TABLE_MINUTES:
+                    yield goal, level, days, minutes
+
+def plan_table_key(user_data: Dict) -> Optional[str]:
+    """
+    用户对应的计划表键
+
+    预计算计划按训练目标的重点部位选择动作，不考虑身体限制。填写了伤病史或身体限制、
+    或者指定了动作库中的具体部位时返回None，由LLM或规则按用户情况生成。
+
+    Args:
+        user_data (Dict): 用户数据
+
+    Returns:
+        Optional[str]: 计划表键，不适用计划表时返回None
+    """
+    from .exercise_catalog import get_exercise_catalog
+    from .fitness_knowledge import get_user_limitations
+
+    if get_user_limitations(user_data):
+        return None
+    areas = get_exercise_catalog().areas
+    if any(str(area).lower() in areas for area in user_data['goals'].get('target_areas') or []):
+        return None
+    return table_key(
+        user_data['goals']['primary_goal'],
+        user_data['basic_info']['experience'],
+        user_data['schedule']['days_per_week'],
+        user_data['schedule']['time_per_session']
+    )
+
+def write_plan_table(path: str, plans: Dict[str, Dict], meta: Optional[Dict] = None):
+    """
+    把计划写入计划表文件（先写临时文件再替换，运行中的进程仍可读取旧文件）
+
+    Args:
+        path (str): 输出路径
+        plans (Dict[str, Dict]): 计划表键 -> 计划数据
+        meta (Dict): 元信息，如生成方式和生成时间
+    """
+    index = {}
+    blobs = []
+    offset = 0
+    for key in sorted(plans):
+        blob = zlib.compress(json.dumps(plans[key], ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+        index[key] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({"meta": meta or {}, "index": index}, ensure_ascii=False).encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+class PlanTable:
+    """
+    内存映射的只读计划表
+
+    Args:
+        path (str): 计划表文件路径
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"不是有效的计划表文件: {path}")
+        (header_length,) = struct.unpack('<I', self._mmap[4:8])
+        header = json.loads(self._mmap[8:8 + header_length])
+        self.meta = header['meta']
+        self._index = header['index']
+        self._data_offset = 8 + header_length
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def get(self, key: str) -> Optional[Dict]:
+        """读取并解压一条计划，每次返回新的字典；未命中时返回None"""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        start = self._data_offset + entry[0]
+        return json.loads(zlib.decompress(self._mmap[start:start + entry[1]]))
+
+    def close(self):
+        self._mmap.close()
+
+_PLAN_TABLE = None
+_PLAN_TABLE_LOADED = False
+
+def get_plan_table() -> Optional[PlanTable]:
+    """
+    获取进程级共享的计划表，首次调用时内存映射计划表文件
+
+    Returns:
+        Optional[PlanTable]: 计划表，文件不存在或无法读取时返回None
+    """
+    global _PLAN_TABLE, _PLAN_TABLE_LOADED
+    if not _PLAN_TABLE_LOADED:
+        _PLAN_TABLE_LOADED = True
+        path = os.getenv('PLAN_TABLE_PATH', DEFAULT_PLAN_TABLE_PATH)
+        if os.path.exists(path):
+            try:
+                _PLAN_TABLE = PlanTable(path)
+                logger.info(f"已加载预计算计划表: {path}，共{len(_PLAN_TABLE)}条计划，{_PLAN_TABLE.meta}")
+            except (OSError, ValueError) as e:
+                logger.error(f"预计算计划表加载失败: {e}")
+        else:
+            logger.info(f"未找到预计算计划表 {path}，计划全部实时生成")
+    return _PLAN_TABLE
+
+def find_precomputed_key(user_data: Dict) -> Optional[str]:
+    """用户在计划表中有对应计划时返回计划表键，否则返回None"""
+    table = get_plan_table()
+    key = plan_table_key(user_data)
+    if table is None or key is None or key not in table:
+        return None
+    return key
@@ -0,0 +1,211 @@
+"""
+用户画像分桶工具 - 把精确的身体数据量化为分桶画像，让相近的用户共享同一份LLM计划
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+# 默认分桶配置，可通过环境变量覆盖
+DEFAULT_BUCKET_CONFIG = {
+    # 年龄段边界（左闭右开）
+    'age_bands': [16, 18, 30, 40, 50, 60, 81],
+    # 体重分段步长（kg）
+    'weight_step': 10,
+    # BMI分类上界（中国成人标准）
+    'bmi_classes': [(18.5, '偏瘦'), (24.0, '正常'), (28.0, '超重'), (float('inf'), '肥胖')]
+}
+
+# 各BMI分类的代表值，用于构造匿名的代表性用户
+BMI_REPRESENTATIVES = {'偏瘦': 17.5, '正常': 21.5, '超重': 26.0, '肥胖': 30.0}
+
+def get_bucket_config() -> Dict:
+    """
+    读取分桶配置
+    
+    环境变量 PROFILE_AGE_BANDS（逗号分隔的年龄段边界）和 PROFILE_WEIGHT_STEP（体重步长）
+    可覆盖默认值。
+    
+    Returns:
+        Dict: 分桶配置
+    """
+    config = dict(DEFAULT_BUCKET_CONFIG)
+    
+    age_bands = os.getenv('PROFILE_AGE_BANDS')
+    if age_bands:
+        config['age_bands'] = sorted(int(edge) for edge in age_bands.split(','))
+    
+    weight_step = os.getenv('PROFILE_WEIGHT_STEP')
+    if weight_step:
+        config['weight_step'] = int(weight_step)
+    
+    return config
+
+def bucket_age(age: float, age_bands: List[int]) -> str:
+    """
+    把年龄量化为年龄段
+    
+    Args:
+        age (float): 年龄
+        age_bands (List[int]): 年龄段边界
+    
+    Returns:
+        str: 年龄段标签，如 "30-39岁"
+    """
+    for lower, upper in zip(age_bands, age_bands[1:]):
+        if lower <= age < upper:
+            return f"{lower}-{upper - 1}岁"
+    if age < age_bands[0]:
+        return f"{age_bands[0]}岁以下"
+    return f"{age_bands[-1]}岁以上"
+
+def bucket_weight(weight: float, step: int) -> str:
+    """
+    把体重量化为体重段
+    
+    Args:
+        weight (float): 体重（kg）
+        step (int): 分段步长（kg）
+    
+    Returns:
+        str: 体重段标签，如 "60-69kg"
+    """
+    lower = int(weight // step * step)
+    return f"{lower}-{lower + step - 1}kg"
+
+def classify_bmi(height: float, weight: float, bmi_classes=None) -> str:
+    """
+    计算BMI并返回分类
+    
+    Args:
+        height (float): 身高（cm）
+        weight (float): 体重（kg）
+        bmi_classes: BMI分类上界列表
+    
+    Returns:
+        str: BMI分类，如 "正常"
+    """
+    bmi_classes = bmi_classes or DEFAULT_BUCKET_CONFIG['bmi_classes']
+    height_m = height / 100
+    bmi = weight / (height_m ** 2)
+    for upper, label in bmi_classes:
+        if bmi < upper:
+            return label
+    return bmi_classes[-1][1]
+
+def canonicalize_profile(user_data: Dict, config: Optional[Dict] = None) -> Dict:
+    """
+    把验证后的用户数据规范化为分桶画像
+    
+    精确的年龄、身高、体重被年龄段、BMI分类和体重段取代，列表字段去重排序，
+    因此相近用户得到完全相同的画像（和相同的LLM提示词）。
+    
+    Args:
+        user_data (Dict): 验证后的用户数据
+        config (Dict): 分桶配置，默认读取 get_bucket_config()
+    
+    Returns:
+        Dict: 分桶画像
+    """
+    config = config or get_bucket_config()
+    basic_info = user_data['basic_info']
+    goals = user_data['goals']
+    schedule = user_data['schedule']
+    limitations = user_data.get('limitations', {})
+    
+    return {
+        'age_band': bucket_age(basic_info['age'], config['age_bands']),
+        'gender': basic_info['gender'],
+        'bmi_class': classify_bmi(basic_info['height'], basic_info['weight'], config['bmi_classes']),
+        'weight_band': bucket_weight(basic_info['weight'], config['weight_step']),
+        'experience': basic_info['experience'],
+        'primary_goal': goals['primary_goal'],
+        'target_areas': sorted(set(goals.get('target_areas') or [])),
+        'days_per_week': schedule['days_per_week'],
+        'time_per_session': schedule['time_per_session'],
+        'restrictions': sorted(set(limitations.get('restrictions') or [])),
+        'injuries': sorted(set(limitations.get('injuries') or []))
+    }
+
+def profile_key(profile: Dict) -> str:
+    """
+    分桶画像的稳定标识
+    
+    Args:
+        profile (Dict): canonicalize_profile 返回的分桶画像
+    
+    Returns:
+        str: 画像的sha1摘要
+    """
+    payload = json.dumps(profile, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def representative_user_data(user_data: Dict, config: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    构造与用户分桶画像相同的匿名代表性用户
+    
+    年龄取所在年龄段的下界，体重取体重段的中值，身高按BMI分类的代表值反推；
+    目标、时间安排和身体限制原样保留。代表性用户的提示词与原用户完全相同，
+    可用于预热LLM缓存而不保存任何精确的个人数据。
+    
+    Args:
+        user_data (Dict): 验证后的用户数据
+        config (Dict): 分桶配置，默认读取 get_bucket_config()
+    
+    Returns:
+        Optional[Dict]: 代表性用户数据；代表值超出输入范围、无法得到相同画像时返回None
+    """
+    config = config or get_bucket_config()
+    profile = canonicalize_profile(user_data, config)
+    basic_info = user_data['basic_info']
+    
+    age_bands = config['age_bands']
+    age = next((lower for lower, upper in zip(age_bands, age_bands[1:]) if lower <= basic_info['age'] < upper), basic_info['age'])
+    step = config['weight_step']
+    weight = basic_info['weight'] // step * step + step / 2
+    height = round((weight / BMI_REPRESENTATIVES.get(profile['bmi_class'], 21.5)) ** 0.5 * 100, 1)
+    
+    representative = {
+        "basic_info": {
+            "age": age,
+            "gender": basic_info['gender'],
+            "height": height,
+            "weight": weight,
+            "experience": basic_info['experience']
+        },
+        "goals": {
+            "primary_goal": profile['primary_goal'],
+            "target_areas": profile['target_areas']
+        },
+        "schedule": {
+            "days_per_week": profile['days_per_week'],
+            "time_per_session": profile['time_per_session']
+        },
+        "limitations": {
+            "injuries": profile['injuries'],
+            "restrictions": profile['restrictions']
+        }
+    }
+    # 与数据验证节点的取值范围一致，超出范围会被替换为默认值而改变提示词
+    if not (16 <= age <= 80 and 140 <= height <= 220 and 40 <= weight <= 200):
+        return None
+    if canonicalize_profile(representative, config) != profile:
+        return None
+    return representative
+
+if __name__ == "__main__":
+    # 测试分桶功能
+    print("=== 用户画像分桶测试 ===")
+    
+    base = {
+        "basic_info": {"age": 25, "gender": "男", "height": 175, "weight": 70, "experience": "beginner"},
+        "goals": {"primary_goal": "muscle_gain", "target_areas": ["chest", "arms"]},
+        "schedule": {"days_per_week": 3, "time_per_session": 45},
+        "limitations": {"injuries": [], "restrictions": []}
+    }
+    similar = json.loads(json.dumps(base))
+    similar["basic_info"].update({"age": 27, "height": 176, "weight": 70.5})
+    
+    for name, data in [("用户A", base), ("用户B", similar)]:
+        profile = canonicalize_profile(data)
+        print(f"{name}: {profile['age_band']} {profile['bmi_class']} {profile['weight_band']} -> {profile_key(profile)[:12]}")
@@ -0,0 +1,253 @@
+"""
+Client-side rate limiting for LLM providers.
+
+Each provider/model gets a requests-per-minute bucket, a tokens-per-minute
+bucket and a cap on concurrent calls. Buckets are allowed to go negative:
+a caller reserves its tokens immediately and sleeps until the bucket has
+refilled to cover them, so later callers queue behind earlier ones (FIFO)
+instead of failing. Token reservations are estimated from the prompt and
+corrected with the provider's reported usage once the call returns.
+"""
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+import weakref
+from typing import Optional
+
+# CJK text is roughly one token per character, other text roughly four characters per token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a call cannot get through the rate limiter within its timeout"""
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a piece of text"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def estimate_request_tokens(messages: list, expected_output: int = 0) -> int:
+    """Estimated tokens of a chat request: prompt tokens, per-message overhead and the expected completion"""
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages) + expected_output
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute.
+    
+    Args:
+        per_minute: Refill rate, also the bucket capacity
+    """
+    
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return the seconds to wait until they are covered"""
+        with self._lock:
+            self._refill(time.monotonic())
+            # A request larger than the bucket is charged the full capacity, otherwise it could never run
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+    
+    def adjust(self, amount: float):
+        """Take (or give back, if negative) tokens after the fact"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+class Reservation:
+    """Tokens and concurrency slot held by one call"""
+    
+    def __init__(self, tokens: int, wait: float, release_slot):
+        self.tokens = tokens
+        self.wait = wait
+        self._release_slot = release_slot
+
+class ProviderLimiter:
+    """
+    Rate limits and concurrency cap of one provider/model.
+    
+    Args:
+        rpm: Requests per minute (None = unlimited)
+        tpm: Tokens per minute (None = unlimited)
+        max_concurrency: Concurrent calls (None = unlimited); the cap applies
+            per event loop for async calls and across threads for sync calls
+    """
+    
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self._thread_slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._loop_slots = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "queued": 0, "wait_seconds": 0.0, "timeouts": 0, "in_flight": 0,
+                       "estimated_tokens": 0, "actual_tokens": 0}
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm or self.max_concurrency)
+    
+    def _reserve_rate(self, tokens: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.reserve(tokens))
+        return wait
+    
+    def _refund_rate(self, tokens: int):
+        if self._requests is not None:
+            self._requests.adjust(-1)
+        if self._tokens is not None:
+            self._tokens.adjust(-tokens)
+    
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+    
+    def _timeout(self, tokens: int, slot_release):
+        self._refund_rate(tokens)
+        slot_release()
+        self._count(timeouts=1)
+        return RateLimitTimeout("LLM call could not be scheduled within its timeout (client-side rate limit)")
+    
+    async def acquire_async(self, tokens: int, timeout: Optional[float] = None) -> Reservation:
+        """
+        Wait for a concurrency slot and rate budget.
+        
+        Raises:
+            RateLimitTimeout: The call would have to wait longer than `timeout`
+        """
+        start = time.monotonic()
+        release_slot = lambda: None
+        if self.max_concurrency:
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                slots = self._loop_slots.get(loop)
+                if slots is None:
+                    slots = self._loop_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+            if slots.locked():
+                self._count(queued=1)
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self._count(timeouts=1)
+                raise RateLimitTimeout("No free LLM concurrency slot within the call timeout")
+            release_slot = slots.release
+        
+        wait = self._reserve_rate(tokens)
+        if timeout is not None and time.monotonic() - start + wait > timeout:
+            raise self._timeout(tokens, release_slot)
+        if wait > 0:
+            self._count(queued=1)
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                self._refund_rate(tokens)
+                release_slot()
+                raise
+        
+        waited = time.monotonic() - start
+        self._count(calls=1, in_flight=1, wait_seconds=waited, estimated_tokens=tokens)
+        return Reservation(tokens, waited, release_slot)
+    
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> Reservation:
+        """Blocking version of acquire_async"""
+        start = time.monotonic()
+        release_slot = lambda: None
+        if self._thread_slots is not None:
+            if not self._thread_slots.acquire(blocking=False):
+                self._count(queued=1)
+                if not self._thread_slots.acquire(timeout=timeout):
+                    self._count(timeouts=1)
+                    raise RateLimitTimeout("No free LLM concurrency slot within the call timeout")
+            release_slot = self._thread_slots.release
+        
+        wait = self._reserve_rate(tokens)
+        if timeout is not None and time.monotonic() - start + wait > timeout:
+            raise self._timeout(tokens, release_slot)
+        if wait > 0:
+            self._count(queued=1)
+            time.sleep(wait)
+        
+        waited = time.monotonic() - start
+        self._count(calls=1, in_flight=1, wait_seconds=waited, estimated_tokens=tokens)
+        return Reservation(tokens, waited, release_slot)
+    
+    def release(self, reservation: Reservation, actual_tokens: Optional[int] = None):
+        """Free the concurrency slot and correct the token bucket with the real usage"""
+        reservation._release_slot()
+        if actual_tokens is not None and self._tokens is not None:
+            self._tokens.adjust(actual_tokens - reservation.tokens)
+        self._count(in_flight=-1, actual_tokens=actual_tokens or 0)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "max_concurrency": self.max_concurrency,
+                **self._stats,
+                "wait_seconds": round(self._stats["wait_seconds"], 3)
+            }
+
+def _env_number(name: str):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+def limiter_from_env(provider: str) -> ProviderLimiter:
+    """
+    Build a provider's limiter from environment variables.
+    
+    {PROVIDER}_RPM, {PROVIDER}_TPM and {PROVIDER}_MAX_CONCURRENCY, falling back
+    to LLM_RPM, LLM_TPM and LLM_MAX_CONCURRENCY; unset means unlimited.
+    """
+    prefix = provider.upper()
+    
+    def setting(name):
+        value = _env_number(f"{prefix}_{name}")
+        return value if value is not None else _env_number(f"LLM_{name}")
+    
+    concurrency = setting("MAX_CONCURRENCY")
+    return ProviderLimiter(
+        rpm=setting("RPM"),
+        tpm=setting("TPM"),
+        max_concurrency=int(concurrency) if concurrency else None
+    )
+
+class RateLimiterRegistry:
+    """Lazily created limiter per provider/model"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters = {}
+    
+    def get(self, provider: str, model: str) -> ProviderLimiter:
+        key = f"{provider}/{model}"
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = self._limiters[key] = limiter_from_env(provider)
+        return limiter
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {key: limiter.stats() for key, limiter in self._limiters.items() if limiter.enabled}
@@ -0,0 +1,102 @@
+"""
+请求合并工具 - 相同参数的并发请求共享同一次进行中的执行，避免重复调用LLM
+"""
+import asyncio
+import copy
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+def request_key(payload: Any) -> str:
+    """
+    请求参数的规范化标识
+    
+    字典键排序、字符串去掉首尾空白，格式不同但内容相同的请求得到相同的标识。
+    
+    Args:
+        payload: 可JSON序列化的请求参数
+    
+    Returns:
+        str: 规范化JSON的sha256摘要
+    """
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, str):
+            return value.strip()
+        return value
+    
+    data = json.dumps(normalize(payload), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+class SingleFlight:
+    """
+    异步请求合并
+    
+    同一个key同时只有一次执行，执行期间到达的相同请求等待这次执行的结果。
+    执行在独立的任务中进行，单个调用方被取消不会影响其他等待者。
+    结果对后来的等待者做深拷贝，调用方可以放心修改。
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行fn，或等待相同key正在进行的执行
+        
+        Args:
+            key (str): 请求标识，通常来自 request_key()
+            fn: 无参数的异步函数
+        
+        Returns:
+            fn的返回值；fn抛出的异常会传给所有等待者
+        """
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result)
+        
+        self._stats["executions"] += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            self._stats["errors"] += 1
+    
+    def stats(self) -> Dict:
+        """合并计数：总调用、实际执行、被合并的调用和正在进行的执行数"""
+        return {
+            **self._stats,
+            "inflight": len(self._inflight),
+            "coalesced_rate": round(self._stats["coalesced"] / self._stats["calls"], 4) if self._stats["calls"] else 0.0
+        }
+
+if __name__ == "__main__":
+    # 测试请求合并
+    async def main():
+        flight = SingleFlight()
+        runs = 0
+        
+        async def generate():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.1)
+            return {"plan": "计划"}
+        
+        key = request_key({"goal": "muscle_gain", "days": 3})
+        results = await asyncio.gather(*(flight.do(key, generate) for _ in range(5)))
+        print(f"5个并发请求，实际执行{runs}次，结果一致: {all(r == results[0] for r in results)}")
+        print(flight.stats())
+    
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Structured LLM output - JSON extraction, schema validation and repair prompts.
+
+The validator covers the subset of JSON Schema used by utils/plan_schemas.py:
+type, properties, required, items, enum, minItems/maxItems and
+minimum/maximum.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+class StructuredOutputError(ValueError):
+    """The LLM output still did not match the schema after the repair call"""
+    
+    def __init__(self, message: str, errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None)
+}
+
+def _is_type(value: Any, expected: str) -> bool:
+    if expected == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if expected == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, _JSON_TYPES.get(expected, object))
+
+def validate_json(data: Any, schema: Dict, path: str = "$") -> List[str]:
+    """
+    Validate data against a JSON schema.
+    
+    Args:
+        data: Parsed JSON value
+        schema: JSON schema (supported subset, see module docstring)
+        path: JSON path of `data`, used in error messages
+    
+    Returns:
+        A list of "path: problem" messages, empty when the data is valid
+    """
+    errors = []
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_is_type(data, t) for t in types):
+            return [f"{path}: expected {' or '.join(types)}, got {type(data).__name__}"]
+    
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: must be one of {schema['enum']}")
+    
+    if isinstance(data, dict):
+        for field in schema.get("required", []):
+            if field not in data:
+                errors.append(f"{path}: missing required field '{field}'")
+        for field, sub_schema in schema.get("properties", {}).items():
+            if field in data:
+                errors.extend(validate_json(data[field], sub_schema, f"{path}.{field}"))
+    
+    elif isinstance(data, list):
+        if "minItems" in schema and len(data) < schema["minItems"]:
+            errors.append(f"{path}: expected at least {schema['minItems']} items, got {len(data)}")
+        if "maxItems" in schema and len(data) > schema["maxItems"]:
+            errors.append(f"{path}: expected at most {schema['maxItems']} items, got {len(data)}")
+        if "items" in schema:
+            for index, item in enumerate(data):
+                errors.extend(validate_json(item, schema["items"], f"{path}[{index}]"))
+    
+    elif _is_type(data, "number"):
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path}: must be >= {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path}: must be <= {schema['maximum']}")
+    
+    return errors
+
+def parse_json_output(text: str) -> Any:
+    """
+    Parse a JSON completion.
+    
+    Native JSON modes return bare JSON; for other output a ```json fence or
+    leading prose before the first "{" is tolerated.
+    
+    Raises:
+        ValueError: No JSON value could be decoded
+    """
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0].strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start = text.find("{")
+        if start == -1:
+            raise ValueError("No JSON object found in LLM output")
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+        return value
+
+def check_output(text: str, schema: Dict) -> Tuple[Any, List[str]]:
+    """Parse and validate a completion, returning (data, errors)"""
+    try:
+        data = parse_json_output(text)
+    except ValueError as e:
+        return None, [f"$: invalid JSON ({e})"]
+    return data, validate_json(data, schema)
+
+def response_format(mode: Optional[str], schema: Dict) -> Dict:
+    """
+    Request options that enable a provider's JSON mode.
+    
+    Args:
+        mode: "json_schema" (structured outputs), "json_object" (JSON mode) or None
+        schema: JSON schema of the expected response
+    
+    Returns:
+        Keyword arguments for chat.completions.create
+    """
+    if mode == "json_schema":
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": schema.get("title", "response"), "schema": schema}
+        }}
+    if mode == "json_object":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+def repair_messages(messages: List[Dict], output: str, errors: List[str]) -> List[Dict]:
+    """
+    Messages for a single targeted repair call: the original conversation,
+    the invalid output as the assistant turn, then the validation errors.
+    """
+    problems = "\n".join(f"- {error}" for error in errors[:20])
+    return [
+        *messages,
+        {"role": "assistant", "content": output},
+        {"role": "user", "content": f"上面的JSON没有通过校验：\n{problems}\n\n"
+                                    "请只修正这些问题，保留其余内容，只返回修正后的完整JSON，不要任何其他文字。"}
+    ]
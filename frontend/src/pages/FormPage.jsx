@@ -3,6 +3,30 @@ import { useNavigate } from 'react-router-dom'
 import { useUserData } from '../context/UserDataContext'
 import UserDataForm from '../components/UserDataForm'
 
+// 逐个读取 Server-Sent Events，按事件名和JSON数据回调
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
 const FormPage = () => {
   const navigate = useNavigate()
   const { setUserData, setGeneratedPlan, setLoading } = useUserData()
@@ -14,13 +38,14 @@ const FormPage = () => {
     setUserData(formData)
     navigate('/plan') // 立即跳转到加载页面
     
+    let hasPlan = false
     try {
       // 调试：打印提交的表单数据
       console.log('提交的表单数据:', JSON.stringify(formData, null, 2))
       console.log('用户选择的训练时间安排:', formData.schedule)
       
-      // 调用API生成训练计划
-      const response = await fetch(`${import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'}/api/generate-plan`, {
+      // 调用流式API生成训练计划：先收到按规则生成的预览计划，LLM个性化计划完成后替换
+      const response = await fetch(`${import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'}/api/generate-plan/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -28,20 +53,30 @@ const FormPage = () => {
         body: JSON.stringify(formData),
       })
 
-      const result = await response.json()
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`)
+      }
 
-      if (result.success) {
-        setGeneratedPlan(result.data.plan)
-        // 已经在plan页面了，不需要再跳转
-      } else {
-        // 出错时跳回表单页面
-        alert('生成训练计划失败：' + (result.error || '未知错误'))
-        navigate('/form')
+      await readEventStream(response, (event, data) => {
+        if (event === 'preview' || event === 'complete') {
+          setGeneratedPlan(data.plan)
+          setLoading(false)
+          hasPlan = true
+        } else if (event === 'error') {
+          throw new Error(data.error || '未知错误')
+        }
+      })
+
+      if (!hasPlan) {
+        throw new Error('未收到训练计划')
       }
     } catch (error) {
       console.error('API调用失败:', error)
-      alert('网络错误，请检查后端服务是否运行')
-      navigate('/form') // 出错时跳回表单页面
+      // 已经展示了预览计划时保留预览，否则跳回表单页面
+      if (!hasPlan) {
+        alert('生成训练计划失败：' + error.message)
+        navigate('/form')
+      }
     } finally {
       setLoading(false)
     }